@@ -10,19 +10,32 @@ from typing import Sequence, Union
 import random
 
 from alembic import op
-from sqlalchemy import orm
+import sqlalchemy as sa
 import bcrypt
 
-from src.users.models import User
-from src.payments.models import Score, Payment
-
-
 # revision identifiers, used by Alembic.
 revision: str = "6f183404c79a"
 down_revision: Union[str, Sequence[str], None] = "83b47dc5bf7f"
 branch_labels: Union[str, Sequence[str], None] = None
 depends_on: Union[str, Sequence[str], None] = None
 
+# Таблицы в виде, созданном ревизией 83b47dc5bf7f: модели приложения
+# описывают текущую схему, в которой есть столбцы более поздних ревизий
+users_table = sa.table(
+    "users",
+    sa.column("id", sa.Integer),
+    sa.column("full_name", sa.String),
+    sa.column("email", sa.String),
+    sa.column("hashed_password", sa.String),
+    sa.column("is_superuser", sa.Boolean),
+)
+scores_table = sa.table(
+    "scores",
+    sa.column("account_id", sa.Integer),
+    sa.column("account_number", sa.String),
+    sa.column("user_id", sa.Integer),
+)
+
 
 def create_hash_password(password: str) -> bytes:
     salt = bcrypt.gensalt()
@@ -42,31 +55,36 @@ def generate_bank_account(prefix: str = "40817", length: int = 20) -> str:
 
 def upgrade() -> None:
     """Upgrade schema."""
-    bind = op.get_bind()
-    session = orm.Session(bind=bind)
-
-    password_for_user1: str = create_hash_password("1qaz!QAZ").decode()
-    user1: User = User(
-        full_name="Sergey Petrov",
-        email="admin@corp.com",
-        hashed_password=password_for_user1,
-        is_superuser=True,
+    op.bulk_insert(
+        users_table,
+        [
+            {
+                "full_name": "Sergey Petrov",
+                "email": "admin@corp.com",
+                "hashed_password": create_hash_password("1qaz!QAZ").decode(),
+                "is_superuser": True,
+            },
+            {
+                "full_name": "Elene Ivanova",
+                "email": "elene@corp.com",
+                "hashed_password": create_hash_password("2wsx@WSX").decode(),
+                "is_superuser": False,
+            },
+        ],
     )
-    session.add(user1)
 
-    password_for_user2: str = create_hash_password("2wsx@WSX").decode()
-    user2: User = User(
-        full_name="Elene Ivanova",
-        email="elene@corp.com",
-        hashed_password=password_for_user2,
+    user2_id = (
+        sa.select(users_table.c.id)
+        .where(users_table.c.email == "elene@corp.com")
+        .scalar_subquery()
+    )
+    op.execute(
+        scores_table.insert().values(
+            account_number=generate_bank_account(),
+            account_id=1,
+            user_id=user2_id,
+        )
     )
-    session.add(user2)
-
-    account_number = generate_bank_account()
-    score_user2: Score = Score(account_number=account_number, account_id=1, user=user2)
-    session.add(score_user2)
-
-    session.commit()
 
 
 def downgrade() -> None:
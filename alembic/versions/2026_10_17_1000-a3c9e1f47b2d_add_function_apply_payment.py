@@ -0,0 +1,91 @@
+"""add function apply_payment
+
+Revision ID: a3c9e1f47b2d
+Revises: 6f183404c79a
+Create Date: 2026-10-17 10:00:12.318204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c9e1f47b2d"
+down_revision: Union[str, Sequence[str], None] = "6f183404c79a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Коды возврата: 0 - платеж проведен, 1 - платеж уже обработан,
+# 2 - пользователь не найден, 3 - недостаточно средств
+APPLY_PAYMENT = """
+CREATE OR REPLACE FUNCTION apply_payment(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM payments WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    LOOP
+        SELECT id INTO v_score_id
+          FROM scores
+         WHERE account_id = p_account_id AND user_id = p_user_id;
+        EXIT WHEN FOUND;
+        BEGIN
+            INSERT INTO scores (account_id, user_id, account_number)
+            VALUES (
+                p_account_id,
+                p_user_id,
+                '40817' || lpad(floor(random() * 1e15)::bigint::text, 15, '0')
+            )
+            ON CONFLICT (account_id, user_id) DO NOTHING;
+        EXCEPTION WHEN unique_violation THEN
+            -- совпал номер счета, генерируем новый
+            NULL;
+        END;
+    END LOOP;
+
+    UPDATE scores
+       SET balance = balance + p_amount
+     WHERE id = v_score_id
+       AND (p_amount >= 0 OR balance + p_amount >= 0);
+    IF NOT FOUND THEN
+        RETURN 3;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, откатываем изменение баланса
+        UPDATE scores SET balance = balance - p_amount WHERE id = v_score_id;
+        RETURN 1;
+    END IF;
+
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(APPLY_PAYMENT)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP FUNCTION IF EXISTS apply_payment(uuid, integer, integer, numeric)")
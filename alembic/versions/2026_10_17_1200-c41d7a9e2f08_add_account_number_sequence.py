@@ -0,0 +1,162 @@
+"""add account number sequence
+
+Revision ID: c41d7a9e2f08
+Revises: a3c9e1f47b2d
+Create Date: 2026-10-17 12:00:41.902517
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c41d7a9e2f08"
+down_revision: Union[str, Sequence[str], None] = "a3c9e1f47b2d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Номер счета для нового счета передает приложение (из блока номеров,
+# зарезервированного в account_number_seq). Если счета нет и номер не передан,
+# функция возвращает 4 - приложение повторяет вызов с номером счета.
+# Коды возврата: 0 - платеж проведен, 1 - платеж уже обработан,
+# 2 - пользователь не найден, 3 - недостаточно средств, 4 - нужен номер счета
+APPLY_PAYMENT = """
+CREATE OR REPLACE FUNCTION apply_payment(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM payments WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            RETURN 4;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    UPDATE scores
+       SET balance = balance + p_amount
+     WHERE id = v_score_id
+       AND (p_amount >= 0 OR balance + p_amount >= 0);
+    IF NOT FOUND THEN
+        RETURN 3;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, откатываем изменение баланса
+        UPDATE scores SET balance = balance - p_amount WHERE id = v_score_id;
+        RETURN 1;
+    END IF;
+
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Прежняя версия функции (номер счета генерируется случайно) для downgrade
+APPLY_PAYMENT_RANDOM_NUMBER = """
+CREATE OR REPLACE FUNCTION apply_payment(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM payments WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    LOOP
+        SELECT id INTO v_score_id
+          FROM scores
+         WHERE account_id = p_account_id AND user_id = p_user_id;
+        EXIT WHEN FOUND;
+        BEGIN
+            INSERT INTO scores (account_id, user_id, account_number)
+            VALUES (
+                p_account_id,
+                p_user_id,
+                '40817' || lpad(floor(random() * 1e15)::bigint::text, 15, '0')
+            )
+            ON CONFLICT (account_id, user_id) DO NOTHING;
+        EXCEPTION WHEN unique_violation THEN
+            -- совпал номер счета, генерируем новый
+            NULL;
+        END;
+    END LOOP;
+
+    UPDATE scores
+       SET balance = balance + p_amount
+     WHERE id = v_score_id
+       AND (p_amount >= 0 OR balance + p_amount >= 0);
+    IF NOT FOUND THEN
+        RETURN 3;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, откатываем изменение баланса
+        UPDATE scores SET balance = balance - p_amount WHERE id = v_score_id;
+        RETURN 1;
+    END IF;
+
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE SEQUENCE IF NOT EXISTS account_number_seq START WITH 1")
+    op.execute("DROP FUNCTION IF EXISTS apply_payment(uuid, integer, integer, numeric)")
+    op.execute(APPLY_PAYMENT)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "DROP FUNCTION IF EXISTS apply_payment(uuid, integer, integer, numeric, varchar)"
+    )
+    op.execute(APPLY_PAYMENT_RANDOM_NUMBER)
+    op.execute("DROP SEQUENCE IF EXISTS account_number_seq")
@@ -0,0 +1,32 @@
+"""add index payments user date
+
+Revision ID: 5b8e2d6c1a47
+Revises: c41d7a9e2f08
+Create Date: 2026-10-17 14:00:07.554120
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5b8e2d6c1a47"
+down_revision: Union[str, Sequence[str], None] = "c41d7a9e2f08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(
+        "idx_payments_user_date_transaction",
+        "payments",
+        ["user_id", "date_creation", "transaction_id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("idx_payments_user_date_transaction", table_name="payments")
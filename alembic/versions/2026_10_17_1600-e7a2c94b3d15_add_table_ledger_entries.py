@@ -0,0 +1,173 @@
+"""add table ledger_entries
+
+Revision ID: e7a2c94b3d15
+Revises: 5b8e2d6c1a47
+Create Date: 2026-10-17 16:00:22.170893
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e7a2c94b3d15"
+down_revision: Union[str, Sequence[str], None] = "5b8e2d6c1a47"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Проведение платежа в режиме журнала проводок: баланс счета не изменяется,
+# платеж записывается в ledger_entries. Списание резервирует сумму в
+# scores.reserved (доступно balance + reserved), пополнение не блокирует
+# строку счета. Коды возврата совпадают с apply_payment
+APPLY_PAYMENT_LEDGER = """
+CREATE OR REPLACE FUNCTION apply_payment_ledger(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM payments WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            RETURN 4;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    IF p_amount < 0 THEN
+        UPDATE scores
+           SET reserved = reserved + p_amount
+         WHERE id = v_score_id
+           AND balance + reserved + p_amount >= 0;
+        IF NOT FOUND THEN
+            RETURN 3;
+        END IF;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, снимаем резерв
+        IF p_amount < 0 THEN
+            UPDATE scores SET reserved = reserved - p_amount WHERE id = v_score_id;
+        END IF;
+        RETURN 1;
+    END IF;
+
+    INSERT INTO ledger_entries (score_id, amount) VALUES (v_score_id, p_amount);
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Перенос до p_limit проводок в scores.balance (с освобождением резерва
+# списаний), возвращает количество перенесенных проводок. Строки, занятые
+# параллельным вызовом, пропускаются
+COMPACT_LEDGER = """
+CREATE OR REPLACE FUNCTION compact_ledger(p_limit integer) RETURNS integer AS $$
+DECLARE
+    v_moved integer;
+BEGIN
+    WITH moved AS (
+        DELETE FROM ledger_entries
+         WHERE id IN (
+             SELECT id FROM ledger_entries
+              ORDER BY id
+              LIMIT p_limit
+                FOR UPDATE SKIP LOCKED
+         )
+        RETURNING score_id, amount
+    ), deltas AS (
+        SELECT score_id,
+               sum(amount) AS delta,
+               sum(least(amount, 0)) AS debits,
+               count(*) AS entries
+          FROM moved
+         GROUP BY score_id
+    ), updated AS (
+        UPDATE scores
+           SET balance = scores.balance + deltas.delta,
+               reserved = scores.reserved - deltas.debits
+          FROM deltas
+         WHERE scores.id = deltas.score_id
+        RETURNING deltas.entries
+    )
+    SELECT coalesce(sum(entries), 0) INTO v_moved FROM updated;
+    RETURN v_moved;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "scores",
+        sa.Column(
+            "reserved",
+            sa.NUMERIC(precision=15, scale=2),
+            server_default=sa.text("0.00"),
+            nullable=False,
+        ),
+    )
+    op.create_table(
+        "ledger_entries",
+        sa.Column("id", sa.BigInteger(), nullable=False),
+        sa.Column("score_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.NUMERIC(precision=15, scale=2), nullable=False),
+        sa.Column(
+            "date_creation",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.ForeignKeyConstraint(["score_id"], ["scores.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        "idx_ledger_entries_score", "ledger_entries", ["score_id"], unique=False
+    )
+    op.execute(APPLY_PAYMENT_LEDGER)
+    op.execute(COMPACT_LEDGER)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("SELECT compact_ledger(2147483647)")
+    op.execute("DROP FUNCTION IF EXISTS compact_ledger(integer)")
+    op.execute(
+        "DROP FUNCTION IF EXISTS "
+        "apply_payment_ledger(uuid, integer, integer, numeric, varchar)"
+    )
+    op.drop_index("idx_ledger_entries_score", table_name="ledger_entries")
+    op.drop_table("ledger_entries")
+    op.drop_column("scores", "reserved")
@@ -0,0 +1,186 @@
+"""partition payments by month
+
+Revision ID: 9d4f1b7c2a60
+Revises: e7a2c94b3d15
+Create Date: 2026-10-17 18:00:12.583104
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9d4f1b7c2a60"
+down_revision: Union[str, Sequence[str], None] = "e7a2c94b3d15"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Количество месяцев, на которые секции создаются заранее
+PARTITIONS_AHEAD = 3
+
+# Создание месячных секций payments_YYYY_MM (границы месяцев по UTC) от месяца
+# p_from до текущего месяца + p_months_ahead, возвращает количество созданных.
+# Существующие и отсоединенные секции не пересоздаются
+CREATE_PAYMENTS_PARTITIONS = """
+CREATE OR REPLACE FUNCTION create_payments_partitions(
+    p_from timestamptz,
+    p_months_ahead integer
+) RETURNS integer AS $$
+DECLARE
+    v_month timestamp := date_trunc('month', p_from AT TIME ZONE 'UTC');
+    v_last timestamp := date_trunc('month', now() AT TIME ZONE 'UTC')
+                        + make_interval(months => p_months_ahead);
+    v_name text;
+    v_created integer := 0;
+BEGIN
+    -- секции создают все воркеры при запуске, выполняем по очереди
+    PERFORM pg_advisory_xact_lock(hashtext('create_payments_partitions'));
+    WHILE v_month <= v_last LOOP
+        v_name := 'payments_' || to_char(v_month, 'YYYY_MM');
+        IF to_regclass(v_name) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF payments FOR VALUES FROM (%L) TO (%L)',
+                v_name,
+                v_month AT TIME ZONE 'UTC',
+                (v_month + interval '1 month') AT TIME ZONE 'UTC'
+            );
+            v_created := v_created + 1;
+        END IF;
+        v_month := v_month + interval '1 month';
+    END LOOP;
+    RETURN v_created;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Первичный ключ секционированной таблицы включает date_creation, поэтому
+# уникальность transaction_id во всех секциях проверяется по
+# processed_transactions: повторный платеж пропускается, как при
+# INSERT ... ON CONFLICT DO NOTHING
+REGISTER_TRANSACTION = """
+CREATE OR REPLACE FUNCTION payments_register_transaction() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO processed_transactions (transaction_id)
+    VALUES (NEW.transaction_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def create_payments_table(name: str, partitioned: bool) -> None:
+    op.create_table(
+        name,
+        sa.Column("transaction_id", sa.UUID(), nullable=False),
+        sa.Column("amount", sa.NUMERIC(precision=15, scale=2), nullable=False),
+        sa.Column(
+            "date_creation",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("account_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["account_id"], ["scores.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        (
+            sa.PrimaryKeyConstraint(
+                "transaction_id", "date_creation", name="payments_pkey"
+            )
+            if partitioned
+            else sa.PrimaryKeyConstraint("transaction_id", name="payments_pkey")
+        ),
+        postgresql_partition_by="RANGE (date_creation)" if partitioned else None,
+    )
+
+
+def create_payments_indexes(partitioned: bool) -> None:
+    if not partitioned:
+        op.create_unique_constraint(
+            "idx_unique_transaction_user", "payments", ["transaction_id", "user_id"]
+        )
+    op.create_index(
+        "idx_payments_user_date_transaction",
+        "payments",
+        ["user_id", "date_creation", "transaction_id"],
+        unique=False,
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "processed_transactions",
+        sa.Column("transaction_id", sa.UUID(), nullable=False),
+        sa.PrimaryKeyConstraint("transaction_id"),
+    )
+    op.execute(
+        "INSERT INTO processed_transactions (transaction_id) "
+        "SELECT transaction_id FROM payments"
+    )
+
+    op.rename_table("payments", "payments_unpartitioned")
+    op.execute(
+        "ALTER TABLE payments_unpartitioned "
+        "RENAME CONSTRAINT payments_pkey TO payments_unpartitioned_pkey"
+    )
+    op.drop_index(
+        "idx_payments_user_date_transaction", table_name="payments_unpartitioned"
+    )
+
+    create_payments_table("payments", partitioned=True)
+    op.execute(CREATE_PAYMENTS_PARTITIONS)
+    op.execute(
+        "SELECT create_payments_partitions("
+        "coalesce((SELECT min(date_creation) FROM payments_unpartitioned), now()), "
+        f"{PARTITIONS_AHEAD})"
+    )
+    op.execute(
+        "INSERT INTO payments "
+        "(transaction_id, amount, date_creation, user_id, account_id) "
+        "SELECT transaction_id, amount, date_creation, user_id, account_id "
+        "FROM payments_unpartitioned"
+    )
+    op.drop_table("payments_unpartitioned")
+    create_payments_indexes(partitioned=True)
+
+    op.execute(REGISTER_TRANSACTION)
+    op.execute(
+        "CREATE TRIGGER payments_register_transaction "
+        "BEFORE INSERT ON payments "
+        "FOR EACH ROW EXECUTE FUNCTION payments_register_transaction()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS payments_register_transaction ON payments")
+    op.execute("DROP FUNCTION IF EXISTS payments_register_transaction()")
+    op.execute(
+        "DROP FUNCTION IF EXISTS create_payments_partitions(timestamptz, integer)"
+    )
+
+    op.drop_index("idx_payments_user_date_transaction", table_name="payments")
+    op.rename_table("payments", "payments_partitioned")
+    op.execute(
+        "ALTER TABLE payments_partitioned "
+        "RENAME CONSTRAINT payments_pkey TO payments_partitioned_pkey"
+    )
+
+    create_payments_table("payments", partitioned=False)
+    op.execute(
+        "INSERT INTO payments "
+        "(transaction_id, amount, date_creation, user_id, account_id) "
+        "SELECT transaction_id, amount, date_creation, user_id, account_id "
+        "FROM payments_partitioned"
+    )
+    op.execute("DROP TABLE payments_partitioned CASCADE")
+    create_payments_indexes(partitioned=False)
+    op.drop_table("processed_transactions")
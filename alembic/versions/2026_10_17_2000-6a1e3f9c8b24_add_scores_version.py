@@ -0,0 +1,55 @@
+"""add scores version
+
+Revision ID: 6a1e3f9c8b24
+Revises: 9d4f1b7c2a60
+Create Date: 2026-10-17 20:00:27.318846
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "6a1e3f9c8b24"
+down_revision: Union[str, Sequence[str], None] = "9d4f1b7c2a60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Версия счета увеличивается при каждом изменении balance или reserved,
+# в том числе функциями apply_payment, apply_payment_ledger и compact_ledger:
+# пакетное проведение изменяет баланс, только если версия не изменилась
+# с момента чтения счета
+BUMP_SCORE_VERSION = """
+CREATE OR REPLACE FUNCTION scores_bump_version() RETURNS trigger AS $$
+BEGIN
+    NEW.version := OLD.version + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "scores",
+        sa.Column("version", sa.Integer(), server_default=sa.text("0"), nullable=False),
+    )
+    op.execute(BUMP_SCORE_VERSION)
+    op.execute(
+        "CREATE TRIGGER scores_bump_version "
+        "BEFORE UPDATE OF balance, reserved ON scores FOR EACH ROW "
+        "WHEN (OLD.balance IS DISTINCT FROM NEW.balance "
+        "OR OLD.reserved IS DISTINCT FROM NEW.reserved) "
+        "EXECUTE FUNCTION scores_bump_version()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS scores_bump_version ON scores")
+    op.execute("DROP FUNCTION IF EXISTS scores_bump_version()")
+    op.drop_column("scores", "version")
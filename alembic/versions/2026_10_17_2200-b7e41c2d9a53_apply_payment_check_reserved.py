@@ -0,0 +1,155 @@
+"""apply_payment checks reserved
+
+Revision ID: b7e41c2d9a53
+Revises: 6a1e3f9c8b24
+Create Date: 2026-10-17 22:00:18.504127
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e41c2d9a53"
+down_revision: Union[str, Sequence[str], None] = "6a1e3f9c8b24"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Списание проверяет доступный баланс с учетом резерва списаний журнала
+# проводок (balance + reserved), как apply_payment_ledger и пакетное
+# проведение: после отключения режима журнала зарезервированные суммы
+# не списываются повторно до переноса проводок
+APPLY_PAYMENT = """
+CREATE OR REPLACE FUNCTION apply_payment(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM payments WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            RETURN 4;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    UPDATE scores
+       SET balance = balance + p_amount
+     WHERE id = v_score_id
+       AND (p_amount >= 0 OR balance + reserved + p_amount >= 0);
+    IF NOT FOUND THEN
+        RETURN 3;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, откатываем изменение баланса
+        UPDATE scores SET balance = balance - p_amount WHERE id = v_score_id;
+        RETURN 1;
+    END IF;
+
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Прежняя версия функции (без учета резерва) для downgrade
+APPLY_PAYMENT_WITHOUT_RESERVED = """
+CREATE OR REPLACE FUNCTION apply_payment(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM payments WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            RETURN 4;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    UPDATE scores
+       SET balance = balance + p_amount
+     WHERE id = v_score_id
+       AND (p_amount >= 0 OR balance + p_amount >= 0);
+    IF NOT FOUND THEN
+        RETURN 3;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, откатываем изменение баланса
+        UPDATE scores SET balance = balance - p_amount WHERE id = v_score_id;
+        RETURN 1;
+    END IF;
+
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(APPLY_PAYMENT)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(APPLY_PAYMENT_WITHOUT_RESERVED)
@@ -0,0 +1,288 @@
+"""apply_payment checks processed_transactions
+
+Revision ID: d2f8a6b1c904
+Revises: b7e41c2d9a53
+Create Date: 2026-10-17 22:30:44.081236
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d2f8a6b1c904"
+down_revision: Union[str, Sequence[str], None] = "b7e41c2d9a53"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Проверка повтора платежа по processed_transactions (первичный ключ
+# transaction_id) вместо payments: секционированная по date_creation таблица
+# payments не может найти transaction_id без просмотра всех секций
+APPLY_PAYMENT = """
+CREATE OR REPLACE FUNCTION apply_payment(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM processed_transactions WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            RETURN 4;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    UPDATE scores
+       SET balance = balance + p_amount
+     WHERE id = v_score_id
+       AND (p_amount >= 0 OR balance + reserved + p_amount >= 0);
+    IF NOT FOUND THEN
+        RETURN 3;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, откатываем изменение баланса
+        UPDATE scores SET balance = balance - p_amount WHERE id = v_score_id;
+        RETURN 1;
+    END IF;
+
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+APPLY_PAYMENT_LEDGER = """
+CREATE OR REPLACE FUNCTION apply_payment_ledger(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM processed_transactions WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            RETURN 4;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    IF p_amount < 0 THEN
+        UPDATE scores
+           SET reserved = reserved + p_amount
+         WHERE id = v_score_id
+           AND balance + reserved + p_amount >= 0;
+        IF NOT FOUND THEN
+            RETURN 3;
+        END IF;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, снимаем резерв
+        IF p_amount < 0 THEN
+            UPDATE scores SET reserved = reserved - p_amount WHERE id = v_score_id;
+        END IF;
+        RETURN 1;
+    END IF;
+
+    INSERT INTO ledger_entries (score_id, amount) VALUES (v_score_id, p_amount);
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Прежние версии функций (проверка по payments) для downgrade
+APPLY_PAYMENT_CHECK_PAYMENTS = """
+CREATE OR REPLACE FUNCTION apply_payment(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM payments WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            RETURN 4;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    UPDATE scores
+       SET balance = balance + p_amount
+     WHERE id = v_score_id
+       AND (p_amount >= 0 OR balance + reserved + p_amount >= 0);
+    IF NOT FOUND THEN
+        RETURN 3;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, откатываем изменение баланса
+        UPDATE scores SET balance = balance - p_amount WHERE id = v_score_id;
+        RETURN 1;
+    END IF;
+
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+APPLY_PAYMENT_LEDGER_CHECK_PAYMENTS = """
+CREATE OR REPLACE FUNCTION apply_payment_ledger(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM payments WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            RETURN 4;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    IF p_amount < 0 THEN
+        UPDATE scores
+           SET reserved = reserved + p_amount
+         WHERE id = v_score_id
+           AND balance + reserved + p_amount >= 0;
+        IF NOT FOUND THEN
+            RETURN 3;
+        END IF;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, снимаем резерв
+        IF p_amount < 0 THEN
+            UPDATE scores SET reserved = reserved - p_amount WHERE id = v_score_id;
+        END IF;
+        RETURN 1;
+    END IF;
+
+    INSERT INTO ledger_entries (score_id, amount) VALUES (v_score_id, p_amount);
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(APPLY_PAYMENT)
+    op.execute(APPLY_PAYMENT_LEDGER)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(APPLY_PAYMENT_CHECK_PAYMENTS)
+    op.execute(APPLY_PAYMENT_LEDGER_CHECK_PAYMENTS)
@@ -0,0 +1,189 @@
+"""apply_payment returns score
+
+Revision ID: f3a9d5e7b210
+Revises: d2f8a6b1c904
+Create Date: 2026-10-17 23:00:07.652913
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a9d5e7b210"
+down_revision: Union[str, Sequence[str], None] = "d2f8a6b1c904"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DROP_APPLY_PAYMENT = (
+    "DROP FUNCTION IF EXISTS apply_payment(uuid, integer, integer, numeric, varchar)"
+)
+
+# Кроме кода возврата функция возвращает счет после изменения баланса
+# (и новый счет, созданный при недостатке средств): приложение записывает
+# его в кеш балансов без отдельного запроса. Для остальных кодов поля
+# счета - NULL
+APPLY_PAYMENT = """
+CREATE FUNCTION apply_payment(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL,
+    OUT status integer,
+    OUT account_id integer,
+    OUT account_number varchar,
+    OUT balance numeric,
+    OUT version integer,
+    OUT date_creation timestamptz
+) AS $$
+#variable_conflict use_column
+DECLARE
+    v_score_id integer;
+    v_created boolean := false;
+BEGIN
+    PERFORM 1 FROM processed_transactions WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        status := 1;
+        RETURN;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        status := 2;
+        RETURN;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            status := 4;
+            RETURN;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        v_created := FOUND;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    UPDATE scores
+       SET balance = balance + p_amount
+     WHERE id = v_score_id
+       AND (p_amount >= 0 OR balance + reserved + p_amount >= 0)
+    RETURNING account_id, account_number, balance, version, date_creation
+         INTO account_id, account_number, balance, version, date_creation;
+    IF NOT FOUND THEN
+        status := 3;
+        IF v_created THEN
+            -- новый счет создан с нулевым балансом
+            SELECT s.account_id, s.account_number, s.balance, s.version,
+                   s.date_creation
+              INTO account_id, account_number, balance, version, date_creation
+              FROM scores s
+             WHERE s.id = v_score_id;
+        END IF;
+        RETURN;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, откатываем изменение баланса
+        UPDATE scores SET balance = balance - p_amount WHERE id = v_score_id;
+        SELECT 1, NULL, NULL, NULL, NULL, NULL
+          INTO status, account_id, account_number, balance, version, date_creation;
+        RETURN;
+    END IF;
+
+    -- баланс для /payments/score учитывает проводки журнала, ожидающие переноса
+    balance := balance + coalesce(
+        (SELECT sum(amount) FROM ledger_entries WHERE score_id = v_score_id), 0
+    );
+    status := 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Прежняя версия функции (только код возврата) для downgrade
+APPLY_PAYMENT_STATUS = """
+CREATE OR REPLACE FUNCTION apply_payment(
+    p_transaction_id uuid,
+    p_user_id integer,
+    p_account_id integer,
+    p_amount numeric,
+    p_account_number varchar DEFAULT NULL
+) RETURNS integer AS $$
+DECLARE
+    v_score_id integer;
+BEGIN
+    PERFORM 1 FROM processed_transactions WHERE transaction_id = p_transaction_id;
+    IF FOUND THEN
+        RETURN 1;
+    END IF;
+
+    PERFORM 1 FROM users WHERE id = p_user_id;
+    IF NOT FOUND THEN
+        RETURN 2;
+    END IF;
+
+    SELECT id INTO v_score_id
+      FROM scores
+     WHERE account_id = p_account_id AND user_id = p_user_id;
+    IF NOT FOUND THEN
+        IF p_account_number IS NULL THEN
+            RETURN 4;
+        END IF;
+        INSERT INTO scores (account_id, user_id, account_number)
+        VALUES (p_account_id, p_user_id, p_account_number)
+        ON CONFLICT (account_id, user_id) DO NOTHING
+        RETURNING id INTO v_score_id;
+        IF NOT FOUND THEN
+            SELECT id INTO v_score_id
+              FROM scores
+             WHERE account_id = p_account_id AND user_id = p_user_id;
+        END IF;
+    END IF;
+
+    UPDATE scores
+       SET balance = balance + p_amount
+     WHERE id = v_score_id
+       AND (p_amount >= 0 OR balance + reserved + p_amount >= 0);
+    IF NOT FOUND THEN
+        RETURN 3;
+    END IF;
+
+    INSERT INTO payments (transaction_id, amount, user_id, account_id)
+    VALUES (p_transaction_id, p_amount, p_user_id, p_account_id)
+    ON CONFLICT DO NOTHING;
+    IF NOT FOUND THEN
+        -- параллельно проведен тот же платеж, откатываем изменение баланса
+        UPDATE scores SET balance = balance - p_amount WHERE id = v_score_id;
+        RETURN 1;
+    END IF;
+
+    RETURN 0;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(DROP_APPLY_PAYMENT)
+    op.execute(APPLY_PAYMENT)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(DROP_APPLY_PAYMENT)
+    op.execute(APPLY_PAYMENT_STATUS)
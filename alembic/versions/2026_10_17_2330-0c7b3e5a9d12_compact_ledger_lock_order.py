@@ -0,0 +1,118 @@
+"""compact_ledger locks scores in id order
+
+Revision ID: 0c7b3e5a9d12
+Revises: f3a9d5e7b210
+Create Date: 2026-10-17 23:30:11.284617
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0c7b3e5a9d12"
+down_revision: Union[str, Sequence[str], None] = "f3a9d5e7b210"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Перенос до p_limit проводок в scores.balance (с освобождением резерва
+# списаний), возвращает количество перенесенных проводок. Строки, занятые
+# параллельным вызовом, пропускаются; счета блокируются до изменения
+# балансов в порядке id
+COMPACT_LEDGER = """
+CREATE OR REPLACE FUNCTION compact_ledger(p_limit integer) RETURNS integer AS $$
+DECLARE
+    v_ids bigint[];
+    v_moved integer;
+BEGIN
+    SELECT array_agg(id) INTO v_ids
+      FROM (
+          SELECT id FROM ledger_entries
+           ORDER BY id
+           LIMIT p_limit
+             FOR UPDATE SKIP LOCKED
+      ) AS entries;
+    IF v_ids IS NULL THEN
+        RETURN 0;
+    END IF;
+
+    -- счета блокируются в порядке id: параллельные переносы в других
+    -- воркерах и пакеты платежей не блокируют друг друга взаимно
+    PERFORM 1
+       FROM scores
+      WHERE id IN (SELECT score_id FROM ledger_entries WHERE id = ANY (v_ids))
+      ORDER BY id
+        FOR UPDATE;
+
+    WITH moved AS (
+        DELETE FROM ledger_entries
+         WHERE id = ANY (v_ids)
+        RETURNING score_id, amount
+    ), deltas AS (
+        SELECT score_id,
+               sum(amount) AS delta,
+               sum(least(amount, 0)) AS debits,
+               count(*) AS entries
+          FROM moved
+         GROUP BY score_id
+    ), updated AS (
+        UPDATE scores
+           SET balance = scores.balance + deltas.delta,
+               reserved = scores.reserved - deltas.debits
+          FROM deltas
+         WHERE scores.id = deltas.score_id
+        RETURNING deltas.entries
+    )
+    SELECT coalesce(sum(entries), 0) INTO v_moved FROM updated;
+    RETURN v_moved;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Прежняя версия функции (изменение балансов без упорядоченной блокировки)
+# для downgrade
+COMPACT_LEDGER_UNORDERED = """
+CREATE OR REPLACE FUNCTION compact_ledger(p_limit integer) RETURNS integer AS $$
+DECLARE
+    v_moved integer;
+BEGIN
+    WITH moved AS (
+        DELETE FROM ledger_entries
+         WHERE id IN (
+             SELECT id FROM ledger_entries
+              ORDER BY id
+              LIMIT p_limit
+                FOR UPDATE SKIP LOCKED
+         )
+        RETURNING score_id, amount
+    ), deltas AS (
+        SELECT score_id,
+               sum(amount) AS delta,
+               sum(least(amount, 0)) AS debits,
+               count(*) AS entries
+          FROM moved
+         GROUP BY score_id
+    ), updated AS (
+        UPDATE scores
+           SET balance = scores.balance + deltas.delta,
+               reserved = scores.reserved - deltas.debits
+          FROM deltas
+         WHERE scores.id = deltas.score_id
+        RETURNING deltas.entries
+    )
+    SELECT coalesce(sum(entries), 0) INTO v_moved FROM updated;
+    RETURN v_moved;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(COMPACT_LEDGER)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(COMPACT_LEDGER_UNORDERED)
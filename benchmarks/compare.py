@@ -0,0 +1,108 @@
+"""
+Сравнение результатов нагрузочного тестирования двух веток:
+
+    python -m benchmarks.compare base.json new.json --threshold 0.1
+
+Код возврата 1, если в новых результатах есть регрессия: пропускная способность
+ниже или задержка p50/p95/p99 выше базовой более чем на threshold, либо
+появились ошибки
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Optional
+
+# Метрика -> True, если большее значение лучше
+METRICS: dict[str, bool] = {
+    "throughput": True,
+    "latency_ms.p50": False,
+    "latency_ms.p95": False,
+    "latency_ms.p99": False,
+}
+
+
+def metric_value(result: dict[str, Any], metric: str) -> float:
+    value: Any = result
+    for key in metric.split("."):
+        value = value[key]
+    return value
+
+
+def compare(
+    base: dict[str, Any], new: dict[str, Any], threshold: float
+) -> list[dict[str, Any]]:
+    """
+    Изменение метрик сценариев, присутствующих в обоих результатах
+    """
+    rows: list[dict[str, Any]] = list()
+    for name, new_result in new["scenarios"].items():
+        base_result = base["scenarios"].get(name)
+        if base_result is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before = metric_value(base_result, metric)
+            after = metric_value(new_result, metric)
+            change = (after - before) / before if before else 0.0
+            regression = -change > threshold if higher_is_better else change > threshold
+            rows.append(
+                {
+                    "scenario": name,
+                    "metric": metric,
+                    "base": before,
+                    "new": after,
+                    "change": change,
+                    "regression": regression,
+                }
+            )
+        rows.append(
+            {
+                "scenario": name,
+                "metric": "errors",
+                "base": base_result["errors"],
+                "new": new_result["errors"],
+                "change": 0.0,
+                "regression": new_result["errors"] > base_result["errors"],
+            }
+        )
+    return rows
+
+
+def format_rows(rows: list[dict[str, Any]]) -> str:
+    lines = [
+        "%-10s %-15s %12s %12s %8s" % ("scenario", "metric", "base", "new", "change")
+    ]
+    for row in rows:
+        lines.append(
+            "%-10s %-15s %12.2f %12.2f %+7.1f%%%s"
+            % (
+                row["scenario"],
+                row["metric"],
+                row["base"],
+                row["new"],
+                row["change"] * 100,
+                "  REGRESSION" if row["regression"] else "",
+            )
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.compare", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("base", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args(argv)
+
+    base = json.loads(args.base.read_text())
+    new = json.loads(args.new.read_text())
+    rows = compare(base, new, args.threshold)
+    print(format_rows(rows))
+    return 1 if any(row["regression"] for row in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+import asyncio
+import math
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable
+
+import httpx
+
+# Запрос сценария: (клиент, порядковый номер запроса) -> ответ
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+# Код ответа для запросов, завершившихся ошибкой соединения или таймаутом
+STATUS_CONNECTION_ERROR = 0
+
+
+def percentile(ordered: list[float], q: float) -> float:
+    """
+    Перцентиль q (0-100) отсортированного списка по ближайшему рангу
+    """
+    if not ordered:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(
+    latencies: list[float], statuses: Counter, elapsed: float
+) -> dict[str, Any]:
+    """
+    Пропускная способность и задержки (мс) сценария
+    """
+    ordered = sorted(latencies)
+    count = len(ordered)
+    errors = sum(
+        number for status, number in statuses.items() if not 200 <= status < 300
+    )
+    return {
+        "requests": count,
+        "errors": errors,
+        "statuses": {
+            str(status): number for status, number in sorted(statuses.items())
+        },
+        "elapsed": round(elapsed, 3),
+        "throughput": round(count / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": round(sum(ordered) / count * 1000, 3) if count else 0.0,
+            "p50": round(percentile(ordered, 50) * 1000, 3),
+            "p95": round(percentile(ordered, 95) * 1000, 3),
+            "p99": round(percentile(ordered, 99) * 1000, 3),
+            "max": round(ordered[-1] * 1000, 3) if count else 0.0,
+        },
+    }
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    request: Request,
+    total: int,
+    concurrency: int,
+    offset: int = 0,
+) -> dict[str, Any]:
+    """
+    Нагрузка замкнутым циклом: concurrency исполнителей отправляют запросы
+    с номерами offset..offset + total - 1, каждый следующий после ответа на предыдущий
+    """
+    latencies: list[float] = list()
+    statuses: Counter = Counter()
+    indexes = iter(range(offset, offset + total))
+
+    async def worker() -> None:
+        for index in indexes:
+            start = time.perf_counter()
+            try:
+                response = await request(client, index)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = STATUS_CONNECTION_ERROR
+            latencies.append(time.perf_counter() - start)
+            statuses[status] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+def format_summary(scenarios: dict[str, dict[str, Any]]) -> str:
+    """
+    Таблица результатов сценариев
+    """
+    lines = [
+        "%-10s %8s %7s %10s %9s %9s %9s %9s"
+        % (
+            "scenario",
+            "requests",
+            "errors",
+            "req/s",
+            "p50 ms",
+            "p95 ms",
+            "p99 ms",
+            "max ms",
+        )
+    ]
+    for name, result in scenarios.items():
+        latency = result["latency_ms"]
+        lines.append(
+            "%-10s %8d %7d %10.1f %9.2f %9.2f %9.2f %9.2f"
+            % (
+                name,
+                result["requests"],
+                result["errors"],
+                result["throughput"],
+                latency["p50"],
+                latency["p95"],
+                latency["p99"],
+                latency["max"],
+            )
+        )
+    return "\n".join(lines)
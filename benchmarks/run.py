@@ -0,0 +1,287 @@
+"""
+Нагрузочное тестирование webhook и эндпоинтов чтения.
+
+Запускает WebhookApp (python -m sanic src.main:app) с БД из .env / переменных
+POSTGRES_*, подает нагрузку на выбранные сценарии и записывает пропускную
+способность и задержки p50/p95/p99 в JSON:
+
+    python -m benchmarks.run --concurrency 32 --requests 2000
+    python -m benchmarks.compare base.json new.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import signal
+import subprocess
+import sys
+import time
+from contextlib import suppress
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
+
+from benchmarks.load import Request, format_summary, run_load
+from src.core.config import BASE_DIR, COOKIE_NAME, configure_logging
+from src.payments.schemas import PaymentGenerateBaseSchemas
+from src.utils.processing import generate_payments
+
+configure_logging()
+logger = logging.getLogger(__name__)
+# журнал каждого запроса искажает замер на стороне клиента
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+SCENARIOS = ("webhook", "score", "payments", "user_list")
+RESULTS_DIR = BASE_DIR / "benchmarks" / "results"
+
+# Нагрузка идет с одного адреса по одному токену: ограничение частоты запросов
+# отключено, если не задано через --env
+SERVER_ENV = {"SANIC_ADMISSION_IP_RATE": "0", "SANIC_ADMISSION_TOKEN_RATE": "0"}
+
+
+def git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", *args], cwd=BASE_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_server(host: str, port: int, workers: int, env: dict[str, str]):
+    """
+    Запуск приложения в отдельном процессе, чтобы генератор нагрузки
+    не разделял с ним цикл событий
+    """
+    command = [
+        sys.executable,
+        "-m",
+        "sanic",
+        "src.main:app",
+        f"--host={host}",
+        f"--port={port}",
+        f"--workers={workers}",
+    ]
+    logger.info("Start server: %s", " ".join(command))
+    return subprocess.Popen(
+        command,
+        cwd=BASE_DIR,
+        env={**os.environ, **SERVER_ENV, **env},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+
+
+def stop_server(process: subprocess.Popen) -> None:
+    """
+    Остановка группы процессов сервера: воркеры, запущенные до получения
+    сигнала главным процессом, иначе продолжают занимать порт
+    """
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        pass
+    with suppress(ProcessLookupError):
+        os.killpg(process.pid, signal.SIGKILL)
+    process.wait()
+
+
+async def wait_ready(url: str, timeout: float, interval: float = 0.25) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(interval)
+    raise RuntimeError(f"Server {url} is not ready after {timeout} s")
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> dict:
+    """
+    Заголовки с токеном авторизации пользователя
+    """
+    response = await client.post(
+        "/user/login", json={"email": email, "password": password}
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Login {email} failed: {response.status_code}")
+    return {"Cookie": f"{COOKIE_NAME}={response.json()['access_token']}"}
+
+
+async def webhook_payloads(args: argparse.Namespace, count: int) -> list[dict]:
+    """
+    Подписанные платежи с уникальными transaction_id (до начала замера)
+    """
+    payloads: list[dict] = list()
+    for _ in range(count):
+        payment = await generate_payments(
+            PaymentGenerateBaseSchemas(
+                account_id=args.account_id,
+                user_id=args.user_id,
+                amount=Decimal(args.amount),
+            )
+        )
+        payloads.append(payment.model_dump())
+    return payloads
+
+
+async def build_requests(
+    client: httpx.AsyncClient, args: argparse.Namespace
+) -> dict[str, Request]:
+    requests: dict[str, Request] = dict()
+    if "webhook" in args.scenarios:
+        payloads = await webhook_payloads(args, args.warmup + args.requests)
+        requests["webhook"] = lambda c, index: c.post("/webhook", json=payloads[index])
+
+    if {"score", "payments"} & set(args.scenarios):
+        user = await login(client, args.user_email, args.user_password)
+        params = {"limit": args.page_size}
+        requests["score"] = lambda c, index: c.get("/payments/score", headers=user)
+        requests["payments"] = lambda c, index: c.get(
+            "/payments/payments", params=params, headers=user
+        )
+
+    if "user_list" in args.scenarios:
+        admin = await login(client, args.admin_email, args.admin_password)
+        requests["user_list"] = lambda c, index: c.get("/user/list", headers=admin)
+    return requests
+
+
+async def benchmark(url: str, args: argparse.Namespace) -> dict[str, dict[str, Any]]:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(
+        base_url=url, timeout=args.timeout, limits=limits
+    ) as client:
+        requests = await build_requests(client, args)
+        results: dict[str, dict[str, Any]] = dict()
+        for name in args.scenarios:
+            if args.warmup:
+                await run_load(client, requests[name], args.warmup, args.concurrency)
+            results[name] = await run_load(
+                client,
+                requests[name],
+                total=args.requests,
+                concurrency=args.concurrency,
+                offset=args.warmup,
+            )
+            logger.info(
+                "Scenario %s: %.1f req/s, p99 %.2f ms, %d errors",
+                name,
+                results[name]["throughput"],
+                results[name]["latency_ms"]["p99"],
+                results[name]["errors"],
+            )
+    return results
+
+
+def collect_meta(args: argparse.Namespace, url: str) -> dict[str, Any]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git("rev-parse", "HEAD"),
+        "git_branch": git("rev-parse", "--abbrev-ref", "HEAD"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "url": url,
+        "workers": None if args.url else args.workers,
+        "concurrency": args.concurrency,
+        "requests": args.requests,
+        "warmup": args.warmup,
+        "env": args.env,
+    }
+
+
+def parse_env(values: list[str]) -> dict[str, str]:
+    env: dict[str, str] = dict()
+    for value in values:
+        name, separator, setting = value.partition("=")
+        if not separator:
+            raise argparse.ArgumentTypeError(f"Expected KEY=VALUE, got {value}")
+        env[name] = setting
+    return env
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.run", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument(
+        "--url", help="адрес запущенного сервера (сервер не запускается)"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="переменная окружения сервера, например SANIC_FAST_JSON_CODEC=True",
+    )
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--user-id", type=int, default=2)
+    parser.add_argument("--account-id", type=int, default=1)
+    parser.add_argument("--amount", default="1.00")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--user-email", default="elene@corp.com")
+    parser.add_argument("--user-password", default="2wsx@WSX")
+    parser.add_argument("--admin-email", default="admin@corp.com")
+    parser.add_argument("--admin-password", default="1qaz!QAZ")
+    parser.add_argument("--output", type=Path, help="файл результатов JSON")
+    args = parser.parse_args(argv)
+
+    args.scenarios = [name for name in args.scenarios.split(",") if name]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    try:
+        args.env = parse_env(args.env)
+    except argparse.ArgumentTypeError as exc:
+        parser.error(str(exc))
+    return args
+
+
+def default_output(meta: dict[str, Any]) -> Path:
+    branch = (meta["git_branch"] or "unknown").replace("/", "-")
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return RESULTS_DIR / f"{branch}-{stamp}.json"
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    url = args.url or f"http://{args.host}:{args.port}"
+    process = None
+    if not args.url:
+        process = start_server(args.host, args.port, args.workers, args.env)
+    try:
+        asyncio.run(wait_ready(url, args.startup_timeout))
+        scenarios = asyncio.run(benchmark(url, args))
+    finally:
+        if process is not None:
+            stop_server(process)
+
+    report = {"meta": collect_meta(args, url), "scenarios": scenarios}
+    output: Path = args.output or default_output(report["meta"])
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    print(format_summary(scenarios))
+    logger.info("Results written to %s", output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Замер времени запуска: импорт src.main и запуск сервера до первого ответа.
+
+Импорт замеряется в отдельном процессе для каждого повтора, запуск сервера -
+от старта процесса python -m sanic до ответа 200 на "/":
+
+    python -m benchmarks.startup --repeat 5 --workers 2
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+
+from benchmarks.run import (
+    RESULTS_DIR,
+    git,
+    parse_env,
+    start_server,
+    stop_server,
+    wait_ready,
+)
+from src.core.config import BASE_DIR, configure_logging
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+IMPORT_SCRIPT = (
+    "import time; started = time.perf_counter(); import src.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def measure_import(env: dict[str, str]) -> float:
+    """
+    Время импорта src.main в новом процессе, сек
+    """
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SCRIPT],
+        cwd=BASE_DIR,
+        env={**os.environ, **env},
+        text=True,
+        stderr=subprocess.DEVNULL,
+    )
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_boot(args: argparse.Namespace) -> float:
+    """
+    Время от запуска сервера до первого успешного ответа, сек
+    """
+    url = f"http://{args.host}:{args.port}"
+    started = time.perf_counter()
+    process = start_server(args.host, args.port, args.workers, args.env)
+    try:
+        asyncio.run(wait_ready(url, args.startup_timeout, interval=0.01))
+        return time.perf_counter() - started
+    finally:
+        stop_server(process)
+
+
+def summarize(values: list[float]) -> dict[str, float]:
+    return {
+        "min_ms": min(values) * 1000,
+        "median_ms": statistics.median(values) * 1000,
+        "max_ms": max(values) * 1000,
+    }
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks.startup", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--env",
+        action="append",
+        default=[],
+        metavar="KEY=VALUE",
+        help="переменная окружения сервера, например SANIC_OAS_CUSTOM_FILE=openapi.json",
+    )
+    parser.add_argument("--startup-timeout", type=float, default=30.0)
+    parser.add_argument("--skip-boot", action="store_true", help="только импорт")
+    parser.add_argument("--output", type=Path, help="файл результатов JSON")
+    args = parser.parse_args(argv)
+    try:
+        args.env = parse_env(args.env)
+    except argparse.ArgumentTypeError as exc:
+        parser.error(str(exc))
+    return args
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    results: dict[str, Any] = dict()
+
+    imports = [measure_import(args.env) for _ in range(args.repeat)]
+    results["import"] = summarize(imports)
+    logger.info("Import src.main: %.0f ms (median)", results["import"]["median_ms"])
+
+    if not args.skip_boot:
+        boots = [measure_boot(args) for _ in range(args.repeat)]
+        results["boot"] = summarize(boots)
+        logger.info(
+            "Server boot, %d workers: %.0f ms (median)",
+            args.workers,
+            results["boot"]["median_ms"],
+        )
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git("rev-parse", "HEAD"),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "workers": args.workers,
+            "repeat": args.repeat,
+            "env": args.env,
+        },
+        "startup": results,
+    }
+    output: Path = args.output or RESULTS_DIR / "startup-{}.json".format(
+        datetime.now().strftime("%Y%m%d-%H%M%S")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, ensure_ascii=False))
+    logger.info("Results written to %s", output)
+
+
+if __name__ == "__main__":
+    main()
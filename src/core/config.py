@@ -1,19 +1,24 @@
-import logging
 from pathlib import Path
 
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from src.core.log import setup_logging
+
 BASE_DIR = Path(__file__).parent.parent.parent
 
 COOKIE_NAME = "bonds_score"
 
 
-def configure_logging(level=logging.INFO):
-    logging.basicConfig(
-        level=level,
-        datefmt="%Y-%m-%d %H:%M:%S",
-        format="[%(asctime)s.%(msecs)03d] %(module)10s:%(lineno)-3d %(levelname)-7s - %(message)s",
+def configure_logging(level=None):
+    """
+    Настройка журнала процесса (выполняется один раз, в точке входа):
+    уровень, уровни и доли записи INFO отдельных логгеров - из .env
+    """
+    setup_logging(
+        level=level or setting_conn.LOG_LEVEL,
+        levels=setting_conn.LOG_LEVELS,
+        sample_rates=setting_conn.LOG_SAMPLE_RATES,
     )
 
 
@@ -25,6 +30,26 @@ class SettingConn(BaseSettings):
     postgres_port: int
 
     SECRET_KEY: str
+    # Прежние ключи подписи платежей, принимаемые при проверке (смена ключа)
+    SIGNATURE_PREVIOUS_KEYS: list[str] = []
+    # Прием подписей прежнего формата sha256(реквизиты + SECRET_KEY)
+    SIGNATURE_ACCEPT_LEGACY: bool = True
+
+    # Номера счетов резервируются в последовательности БД блоками в каждом воркере
+    ACCOUNT_NUMBER_BLOCK_SIZE: int = 100
+    # Контрольный разряд (алгоритм Луна) в конце номера счета
+    ACCOUNT_NUMBER_CHECK_DIGIT: bool = False
+
+    # Пул потоков bcrypt в каждом воркере: размер, лимит очереди и стоимость хеша
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 64
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+
+    # Журнал: уровень, уровни отдельных логгеров ({"src.users.crud": "WARNING"})
+    # и доля записываемых INFO-записей логгеров ({"src.utils.processing": 0.01})
+    LOG_LEVEL: str = "INFO"
+    LOG_LEVELS: dict[str, str] = {}
+    LOG_SAMPLE_RATES: dict[str, float] = {}
 
     model_config = SettingsConfigDict(env_file=BASE_DIR / ".env")
 
@@ -40,8 +65,117 @@ class ConnectionsConfig:
     DB_PORT = setting_conn.postgres_port
     DB_NAME = setting_conn.postgres_db
 
-
-class DbSetting(BaseSettings):
+    # Пул соединений создается отдельно в каждом воркере Sanic
+    DB_POOL_SIZE = 10
+    DB_MAX_OVERFLOW = 20
+    DB_POOL_TIMEOUT = 30
+    DB_POOL_RECYCLE = 1800
+    DB_POOL_PRE_PING = True
+
+    # Реплики для чтения: адреса через запятую (postgresql+asyncpg://...).
+    # Реплика, недоступная или отстающая более DB_REPLICA_MAX_LAG сек,
+    # исключается до следующей проверки; без реплик чтение идет с основного сервера
+    DB_REPLICA_URLS = ""
+    DB_REPLICA_MAX_LAG = 5.0
+    DB_REPLICA_CHECK_INTERVAL = 2.0
+    DB_REPLICA_CHECK_TIMEOUT = 1.0
+
+
+class WebhookConfig:
+    # Максимальное количество платежей в одном запросе /webhook/batch
+    WEBHOOK_BATCH_MAX_SIZE = 5000
+
+    # Фильтр повторов в памяти воркера: размер LRU (0 - отключен)
+    WEBHOOK_IDEMPOTENCY_LRU_SIZE = 100_000
+    # Время хранения проведенных платежей в общем кеше хоста, сек
+    WEBHOOK_IDEMPOTENCY_SHARED_TTL = 86400.0
+
+    # Асинхронный прием: платеж записывается в журнал, ответ 202,
+    # проведение в БД выполняет фоновая задача пакетами
+    WEBHOOK_ASYNC_INGEST = False
+    WEBHOOK_JOURNAL_DIR = str(BASE_DIR / "journal")
+    WEBHOOK_JOURNAL_FSYNC_INTERVAL = 0.005
+    WEBHOOK_JOURNAL_BATCH_SIZE = 500
+    WEBHOOK_JOURNAL_POLL_INTERVAL = 0.05
+    # Попытки проведения пакета, после которых пакет проводится частями,
+    # а не проведенные записи переносятся в файл <воркер>.dead
+    WEBHOOK_JOURNAL_MAX_ATTEMPTS = 3
+
+    # Журнал проводок: платеж записывается в ledger_entries без изменения
+    # баланса, фоновая задача переносит проводки в scores.balance
+    WEBHOOK_LEDGER_MODE = False
+    WEBHOOK_LEDGER_COMPACT_INTERVAL = 1.0
+    WEBHOOK_LEDGER_COMPACT_BATCH_SIZE = 5000
+
+
+class ServerConfig:
+    # Быстрый JSON: валидация запросов из байтов тела и сериализация ответов orjson
+    FAST_JSON_CODEC = False
+
+    # Метрики /metrics: каждый воркер записывает снимок своих метрик в METRICS_DIR
+    # раз в METRICS_WRITE_INTERVAL сек, эндпоинт суммирует снимки всех воркеров
+    METRICS_ENABLED = True
+    METRICS_DIR = str(BASE_DIR / "metrics")
+    METRICS_WRITE_INTERVAL = 1.0
+
+    # Профилирование запросов к БД: сводка в заголовке X-SQL-Profile, подробный
+    # отчет в журнал для доли SQL_PROFILE_LOG_SAMPLE_RATE HTTP-запросов.
+    # Запрос одной формы, выполненный SQL_PROFILE_REPEAT_THRESHOLD раз, - признак N+1
+    SQL_PROFILE_ENABLED = False
+    SQL_PROFILE_LOG_SAMPLE_RATE = 0.01
+    SQL_PROFILE_REPEAT_THRESHOLD = 2
+
+    # Общие для воркеров хоста кеши в разделяемой памяти (пользователи, платежи):
+    # таблицы по SHARED_CACHE_SLOTS ячеек размером SHARED_CACHE_SLOT_SIZE байт.
+    # 0 - отключены, у каждого воркера собственные кеши
+    SHARED_CACHE_SLOTS = 16_384
+    SHARED_CACHE_SLOT_SIZE = 512
+    # Ячейки отметок времени сброса кеша пользователей (без вытеснения): пользователи
+    # с одинаковым остатком id от деления на их количество сбрасываются вместе
+    SHARED_STAMP_SLOTS = 4096
+
+    # Контроль нагрузки воркера: не более ADMISSION_MAX_IN_FLIGHT запросов одновременно
+    # (0 - без ограничения), остальные ждут в очереди по приоритету классов маршрутов
+    # (платежи, чтение, администрирование, вход): платежи - до ADMISSION_WEBHOOK_MAX_WAIT
+    # сек, прочие - до ADMISSION_MAX_WAIT сек, затем 503 с Retry-After
+    ADMISSION_MAX_IN_FLIGHT = 64
+    ADMISSION_WEBHOOK_MAX_WAIT = 10.0
+    ADMISSION_MAX_WAIT = 1.0
+    ADMISSION_RETRY_AFTER = 1
+    # Частота запросов (кроме платежей) с одного IP и по одному токену: запросов
+    # в секунду и запас; при превышении - 429. 0 - без ограничения
+    ADMISSION_IP_RATE = 50.0
+    ADMISSION_IP_BURST = 100
+    ADMISSION_TOKEN_RATE = 20.0
+    ADMISSION_TOKEN_BURST = 40
+
+
+class AuthConfig:
+    # Кеш авторизованных пользователей в воркере: размер (0 - отключен) и время жизни, сек.
+    # С общими кешами хоста (SHARED_CACHE_SLOTS) размер ограничен таблицей общего кеша
+    AUTH_PRINCIPAL_CACHE_SIZE = 10_000
+    AUTH_PRINCIPAL_CACHE_TTL = 60.0
+
+
+class PaymentsConfig:
+    # Месячные секции payments создаются заранее на PAYMENTS_PARTITIONS_AHEAD
+    # месяцев, проверка выполняется раз в PAYMENTS_PARTITIONS_CHECK_INTERVAL сек
+    PAYMENTS_PARTITIONS_AHEAD = 3
+    PAYMENTS_PARTITIONS_CHECK_INTERVAL = 3600.0
+
+    # Кеш счетов для /payments/score (в общем кеше хоста, SHARED_CACHE_SLOTS):
+    # обновляется сразу после проведения платежей, записи живут не дольше
+    # PAYMENTS_BALANCE_CACHE_TTL сек. 0 - отключен
+    PAYMENTS_BALANCE_CACHE_TTL = 10.0
+
+
+class UsersConfig:
+    # Количество пользователей в одной части потокового ответа /user/list
+    USER_LIST_CHUNK_SIZE = 500
+
+
+# Производные настройки: значения из setting_conn, .env читается один раз
+class DbSetting(BaseModel):
     url: str = (
         f"postgresql+asyncpg://{setting_conn.postgres_user}:{setting_conn.postgres_password}@{setting_conn.postgres_host}:{setting_conn.postgres_port}/{setting_conn.postgres_db}"
     )
@@ -53,7 +187,7 @@ class AuthJWT(BaseModel):
     access_token_expire_minutes: int = 30
 
 
-class Setting(BaseSettings):
+class Setting(BaseModel):
     db: DbSetting = DbSetting()
     auth_jwt: AuthJWT = AuthJWT()
 
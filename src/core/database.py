@@ -1,5 +1,11 @@
+import asyncio
+import logging
+from typing import Callable, Optional, Union
+
+import asyncpg
 from sanic.config import Config
-from sqlalchemy import URL
+from sqlalchemy import URL, text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, SQLAlchemyError
 from sqlalchemy.ext.asyncio import (
     AsyncEngine,
     AsyncSession,
@@ -9,22 +15,101 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import DeclarativeBase
 
 from src.core.config import setting
+from src.utils.metrics import TimedQueuePool, instrument_engine
+from src.utils.sql_profile import profile_engine
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики, сек: 0 для основного сервера и реплики, применившей
+# все полученные изменения (время последней транзакции на простаивающем
+# основном сервере не считается отставанием). NULL - реплика не получает
+# изменения (приемник WAL не в состоянии streaming): примененные изменения
+# совпадают с полученными, но отставание неизвестно. Состояние приемника
+# видно роли с правами pg_read_all_stats
+REPLICA_LAG_QUERY = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN NOT EXISTS ("
+    "SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming'"
+    ") THEN NULL"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE coalesce(extract(epoch FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+# Классы SQLSTATE временных ошибок: соединение, откат транзакции (deadlock,
+# serialization failure), нехватка ресурсов, вмешательство администратора
+TRANSIENT_SQLSTATE_CLASSES = ("08", "40", "53", "57")
+
+
+def db_error_code(exc: BaseException) -> Optional[str]:
+    """
+    SQLSTATE ошибки PostgreSQL (None - ошибка не от сервера БД)
+    """
+    return getattr(getattr(exc, "orig", exc), "sqlstate", None)
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """
+    Ошибка, не зависящая от данных запроса: повтор может быть успешным
+    """
+    if isinstance(exc, (OSError, asyncio.TimeoutError, InterfaceError)):
+        return True
+    if isinstance(exc, DBAPIError) and exc.connection_invalidated:
+        return True
+    code = db_error_code(exc)
+    if code is None:
+        return isinstance(exc, OperationalError)
+    return code[:2] in TRANSIENT_SQLSTATE_CLASSES
 
 
 class Base(DeclarativeBase):
     pass
 
 
-engine = create_async_engine(
-    url=setting.db.url,
-    echo=setting.db.echo,
-)
-async_session_maker = async_sessionmaker(engine, expire_on_commit=False)
+class ReadOnlySession(AsyncSession):
+    """
+    Сессия для чтения: на реплике или на основном сервере, если доступных
+    реплик нет
+    """
+
+
+class Replica:
+    """
+    Реплика БД и результат ее последней проверки
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+        self.session_factory: async_sessionmaker[ReadOnlySession] = async_sessionmaker(
+            engine, class_=ReadOnlySession, expire_on_commit=False
+        )
+        self.lag: Optional[float] = None
+        # None - реплика еще не проверялась
+        self.available: Optional[bool] = None
+
+    @property
+    def name(self) -> str:
+        return self.engine.url.render_as_string(hide_password=True)
+
+
+def parse_urls(urls: Union[str, list[str]]) -> list[str]:
+    """
+    Список адресов из настройки: список или строка через запятую
+    """
+    if isinstance(urls, str):
+        urls = urls.split(",")
+    return [url.strip() for url in urls if url.strip()]
 
 
 class DatabaseConnection:
 
-    def __init__(self, config: Config) -> None:
+    def __init__(
+        self, config: Config, instrument: bool = False, profile: bool = False
+    ) -> None:
+        self._config = config
+        self._instrument = instrument
+        self._profile = profile
         self._url: URL = URL.create(
             config.DB_DRIVER,
             config.DB_USER,
@@ -33,13 +118,130 @@ class DatabaseConnection:
             config.DB_PORT,
             config.DB_NAME,
         )
-        self._connection: AsyncEngine = create_async_engine(
-            url=self._url, echo=setting.db.echo
-        )
+        self._connection: AsyncEngine = self._create_engine(self._url)
         self._session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
             self._connection,
             expire_on_commit=False,
         )
+        self._read_session_factory: async_sessionmaker[ReadOnlySession] = (
+            async_sessionmaker(
+                self._connection, class_=ReadOnlySession, expire_on_commit=False
+            )
+        )
+        self._replicas: list[Replica] = [
+            Replica(self._create_engine(url))
+            for url in parse_urls(config.DB_REPLICA_URLS)
+        ]
+        self._available: list[Replica] = list()
+        self._turn = 0
+
+    def _create_engine(self, url: Union[URL, str]) -> AsyncEngine:
+        config = self._config
+        engine: AsyncEngine = create_async_engine(
+            url=url,
+            echo=setting.db.echo,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            pool_pre_ping=config.DB_POOL_PRE_PING,
+            **({"poolclass": TimedQueuePool} if self._instrument else {}),
+        )
+        if self._instrument:
+            instrument_engine(engine.sync_engine)
+        if self._profile:
+            profile_engine(engine.sync_engine)
+        return engine
+
+    @property
+    def engine(self) -> AsyncEngine:
+        return self._connection
+
+    @property
+    def replicas(self) -> list[Replica]:
+        return self._replicas
 
     def create_session(self) -> AsyncSession:
         return self._session_factory()
+
+    def create_read_session(self) -> ReadOnlySession:
+        """
+        Сессия чтения на доступных репликах по очереди, без них - на основном сервере
+        """
+        available = self._available
+        if not available:
+            return self._read_session_factory()
+        self._turn = (self._turn + 1) % len(available)
+        return available[self._turn].session_factory()
+
+    async def _replica_lag(self, replica: Replica) -> Optional[float]:
+        """
+        Отставание реплики, сек; None - реплика не получает изменения
+        """
+        async with replica.engine.connect() as connection:
+            lag = await connection.scalar(REPLICA_LAG_QUERY)
+        return None if lag is None else float(lag)
+
+    async def check_replicas(self, max_lag: float, timeout: float) -> None:
+        """
+        Проверка доступности и отставания реплик: чтение направляется
+        на реплики, отстающие не более чем на max_lag сек
+        """
+        available: list[Replica] = list()
+        for replica in self._replicas:
+            try:
+                replica.lag = await asyncio.wait_for(
+                    self._replica_lag(replica), timeout
+                )
+            except (SQLAlchemyError, OSError, asyncio.TimeoutError) as exc:
+                if replica.available is not False:
+                    logger.warning("Replica %s is unavailable: %r", replica.name, exc)
+                replica.lag = None
+                replica.available = False
+                continue
+            if replica.lag is not None and replica.lag <= max_lag:
+                available.append(replica)
+                replica.available = True
+                continue
+            if replica.available is not False:
+                if replica.lag is None:
+                    logger.warning(
+                        "Replica %s is not streaming WAL, reads go elsewhere",
+                        replica.name,
+                    )
+                else:
+                    logger.warning(
+                        "Replica %s lags %.1f s, reads go elsewhere",
+                        replica.name,
+                        replica.lag,
+                    )
+            replica.available = False
+        if available != self._available:
+            logger.info(
+                "Read replicas available: %d of %d",
+                len(available),
+                len(self._replicas),
+            )
+        self._available = available
+
+    async def dispose(self) -> None:
+        """
+        Закрытие всех соединений пула
+        """
+        await self._connection.dispose()
+        for replica in self._replicas:
+            await replica.engine.dispose()
+
+    async def listen(self, channel: str, callback: Callable) -> asyncpg.Connection:
+        """
+        Отдельное (вне пула) соединение, подписанное на канал PostgreSQL NOTIFY
+        """
+        connection: asyncpg.Connection = await asyncpg.connect(
+            user=self._url.username,
+            password=self._url.password,
+            host=self._url.host,
+            port=self._url.port,
+            database=self._url.database,
+        )
+        await connection.add_listener(channel, callback)
+        return connection
@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional
 
 import jwt
@@ -6,13 +7,90 @@ from sanic.exceptions import SanicException
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.config import COOKIE_NAME
-from src.users.crud import get_user_by_id
-from src.users.models import User
+from src.core.database import ReadOnlySession
+from src.users.crud import get_principal
 from src.users.schemas import UserProtectedSchemas, UserSuperSchemas
 from src.utils.jwt_utils import decode_jwt
+from src.utils.principal_cache import PrincipalCache
 
+# Сессии, закрываемые после разрыва соединения (ссылки на задачи закрытия)
+_closing: set[asyncio.Task] = set()
 
-async def validate_token(token: str, session: AsyncSession) -> Optional[User]:
+
+def close_on_task_done(request: Request, name: str) -> None:
+    """
+    Закрытие сессии по завершении задачи соединения: при разрыве соединения
+    во время обработки сигнал http.lifecycle.response не отправляется
+    """
+    task = asyncio.current_task()
+
+    def close(_=None) -> None:
+        task.remove_done_callback(close)
+        session: Optional[AsyncSession] = getattr(request.ctx, name, None)
+        if session is not None:
+            setattr(request.ctx, name, None)
+            closing = asyncio.get_running_loop().create_task(session.close())
+            _closing.add(closing)
+            closing.add_done_callback(_closing.discard)
+
+    task.add_done_callback(close)
+    setattr(request.ctx, f"{name}_close", close)
+
+
+async def get_db_session(request: Request) -> AsyncSession:
+    """
+    Сессия БД из пула воркера, одна на весь запрос
+    """
+    session: Optional[AsyncSession] = getattr(request.ctx, "db_session", None)
+    if session is None:
+        session = request.app.ctx.db.create_session()
+        request.ctx.db_session = session
+        close_on_task_done(request, "db_session")
+    return session
+
+
+async def get_read_session(request: Request) -> ReadOnlySession:
+    """
+    Сессия БД для чтения (реплика или основной сервер), одна на весь запрос
+    """
+    session: Optional[ReadOnlySession] = getattr(request.ctx, "db_read_session", None)
+    if session is None:
+        session = request.app.ctx.db.create_read_session()
+        request.ctx.db_read_session = session
+        close_on_task_done(request, "db_read_session")
+    return session
+
+
+async def close_db_session(request: Request, **_) -> None:
+    """
+    Возврат соединений в пулы по окончании обработки запроса
+    """
+    for name in ("db_session", "db_read_session"):
+        session: Optional[AsyncSession] = getattr(request.ctx, name, None)
+        if session is not None:
+            setattr(request.ctx, name, None)
+            await session.close()
+        close = getattr(request.ctx, f"{name}_close", None)
+        if close is not None:
+            setattr(request.ctx, f"{name}_close", None)
+            close()
+
+
+def invalidate_principal(request: Request, id_user: int) -> None:
+    """
+    Сброс кеша авторизации пользователя в текущем воркере
+    (остальные воркеры получают уведомление из БД)
+    """
+    cache: Optional[PrincipalCache] = request.app.ctx.principal_cache
+    if cache is not None:
+        cache.invalidate(id_user)
+
+
+async def validate_token(
+    token: str,
+    session: AsyncSession,
+    cache: Optional[PrincipalCache] = None,
+) -> Optional[UserSuperSchemas]:
     """
     Валидация токена и возвращение данных об авторизованном клиенте
     """
@@ -24,9 +102,21 @@ async def validate_token(token: str, session: AsyncSession) -> Optional[User]:
         return None
 
     id_user: int = int(payload["sub"])
-    user: User = await get_user_by_id(session=session, id_user=id_user)
+    exp: int = payload["exp"]
+    if cache is not None:
+        principal: Optional[UserSuperSchemas] = cache.get(user_id=id_user, exp=exp)
+        if principal is not None:
+            return principal
+
+    # версия читается до запроса: сброс во время чтения из БД отменяет запись
+    version: Optional[float] = cache.version(id_user) if cache is not None else None
+    principal = await get_principal(session=session, id_user=id_user)
+    if principal is None:
+        return None
 
-    return user
+    if cache is not None:
+        cache.put(user_id=id_user, exp=exp, principal=principal, version=version)
+    return principal
 
 
 async def current_superuser_user(
@@ -38,7 +128,9 @@ async def current_superuser_user(
     """
 
     token = request.cookies.get(COOKIE_NAME)
-    user: Optional[User] = await validate_token(token=token, session=db_session)
+    user: Optional[UserSuperSchemas] = await validate_token(
+        token=token, session=db_session, cache=request.app.ctx.principal_cache
+    )
 
     if user is None:
         raise SanicException("User not authorized", status_code=401)
@@ -46,7 +138,7 @@ async def current_superuser_user(
     if not user.is_superuser:
         raise SanicException("Access denied", status_code=403)
 
-    return UserSuperSchemas(**user.__dict__)
+    return user
 
 
 async def current_user(
@@ -57,9 +149,11 @@ async def current_user(
     Проверка авторизации пользователя
     """
     token = request.cookies.get(COOKIE_NAME)
-    user: Optional[User] = await validate_token(token=token, session=db_session)
+    user: Optional[UserSuperSchemas] = await validate_token(
+        token=token, session=db_session, cache=request.app.ctx.principal_cache
+    )
 
     if user is None:
         raise SanicException("User not authorized", status_code=401)
 
-    return UserProtectedSchemas(**user.__dict__)
\ No newline at end of file
+    return UserProtectedSchemas(**user.model_dump())
\ No newline at end of file
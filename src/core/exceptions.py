@@ -20,3 +20,19 @@ class EmailInUse(Exception):
 
 class UniqueViolationError(Exception):
     pass
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class ServerOverloaded(Exception):
+    pass
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class ScoreVersionConflict(Exception):
+    pass
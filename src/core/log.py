@@ -0,0 +1,69 @@
+import atexit
+import logging
+import queue
+import random
+import sys
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional, Union
+
+LOG_FORMAT = "[%(asctime)s.%(msecs)03d] %(module)10s:%(lineno)-3d %(levelname)-7s - %(message)s"
+LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_listener: Optional[QueueListener] = None
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Передача записей журнала в очередь без форматирования: сообщение
+    с аргументами форматируется в потоке записи. Аргументы не должны
+    изменяться после вызова logger (строки, числа, Decimal, UUID)
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает долю rate записей уровня INFO и ниже, предупреждения и ошибки - все
+    """
+
+    def __init__(self, rate: float) -> None:
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.INFO or random.random() < self.rate
+
+
+def setup_logging(
+    level: Union[int, str] = logging.INFO,
+    levels: Optional[dict[str, str]] = None,
+    sample_rates: Optional[dict[str, float]] = None,
+) -> None:
+    """
+    Однократная настройка журнала процесса: записи передаются через очередь
+    в поток, который пишет их в stderr. levels - уровни отдельных логгеров,
+    sample_rates - доля записываемых INFO-записей отдельных логгеров
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT))
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = QueueListener(records, stream, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(records))
+    root.setLevel(level)
+    for name, logger_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(logger_level)
+    for name, rate in (sample_rates or {}).items():
+        logging.getLogger(name).addFilter(SamplingFilter(rate))
+
+    _listener.start()
+    atexit.register(_listener.stop)
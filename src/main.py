@@ -1,20 +1,128 @@
-from sanic import Request, Sanic, html, json
+import asyncio
+import math
+import multiprocessing
+import os
+from pathlib import Path
+from typing import Optional
+
+from pydantic import ValidationError
+from sanic import Request, Sanic, html, json, text
 from sanic.exceptions import SanicException
+from sanic.response import BaseHTTPResponse
 from sanic_ext import Extend, openapi
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.core.config import ConnectionsConfig
-from src.core.database import DatabaseConnection
-from src.core.depends import current_superuser_user, current_user
+from src.core.config import (
+    COOKIE_NAME,
+    AuthConfig,
+    ConnectionsConfig,
+    PaymentsConfig,
+    ServerConfig,
+    UsersConfig,
+    WebhookConfig,
+    configure_logging,
+)
+from src.core.database import DatabaseConnection, ReadOnlySession, is_transient_error
+from src.core.depends import (
+    close_db_session,
+    current_superuser_user,
+    current_user,
+    get_db_session,
+    get_read_session,
+)
 from src.core.exceptions import (
     ErrorInData,
     PaymentProcessed,
+    RateLimitExceeded,
+    ServerOverloaded,
 )
 from src.payments.schemas import TransactionInSchemas
 from src.payments.views import router as router_payments
 from src.users.schemas import UserProtectedSchemas, UserSuperSchemas
 from src.users.views import router as router_user
-from src.utils.processing import process_transaction
+from src.utils.admission import AdmissionController, Lane, TokenBuckets
+from src.utils.balance_cache import BalanceCache
+from src.utils.codec import fast_dumps, fast_loads, load_model, request_loads
+from src.utils.idempotency import IdempotencyFilter
+from src.utils.journal import PaymentJournal, drain_orphaned_journals
+from src.utils.jwt_utils import password_hasher
+from src.utils.ledger import run_ledger_compactor
+from src.utils.metrics import (
+    clear_snapshots,
+    count_webhook,
+    finish_request,
+    metrics,
+    read_snapshots,
+    start_request,
+    write_snapshot,
+)
+from src.utils.partitions import run_partition_maintenance
+from src.utils.principal_cache import (
+    PrincipalCache,
+    SharedPrincipalCache,
+    listen_invalidations,
+)
+from src.utils.processing import (
+    is_processed,
+    process_journal_records,
+    process_transaction,
+    process_transactions_batch,
+)
+from src.utils.shared_cache import (
+    STAMP_SLOT,
+    SharedCache,
+    SharedStamps,
+    create_shared_memory,
+)
+from src.utils.signature import signature_engine
+from src.utils.sql_profile import finish_profile, start_profile
+
+configure_logging()
+
+# JSON-схема платежа для документации /webhook и /webhook/batch
+TRANSACTION_SCHEMA = TransactionInSchemas.model_json_schema()
+
+# Фоновые задачи воркера, запускаемые через add_task
+BACKGROUND_TASKS = (
+    "journal_drain",
+    "journal_orphans",
+    "ledger_compactor",
+    "metrics_writer",
+    "payments_partitions",
+    "principal_invalidations",
+    "replica_health",
+)
+
+# Общие для воркеров хоста кеши, по таблице в разделяемой памяти на каждый
+SHARED_CACHES = ("balances", "idempotency", "principals")
+# Массивы отметок времени без вытеснения (сбросы кешей)
+SHARED_STAMPS = ("balances", "principals")
+
+# Классы маршрутов для контроля нагрузки: приоритет (0 - высший), доля лимита
+# одновременных запросов и зарезервированная доля. Резерв платежей
+# ограничивает остальные классы вместе 3/4 лимита
+ADMISSION_LANES = {
+    "webhook": (0, 1.0, 0.25),
+    "read": (1, 0.75, 0.0),
+    "admin": (2, 0.25, 0.0),
+    "login": (3, 0.25, 0.0),
+}
+# Класс маршрута - по первому подходящему префиксу пути; прочие маршруты не ограничиваются
+ADMISSION_ROUTES = (
+    ("webhook", "webhook"),
+    ("user/login", "login"),
+    ("user/me", "read"),
+    ("user/logout", "read"),
+    ("payments/", "read"),
+    ("user/", "admin"),
+)
+
+
+def admission_lane(path: str) -> Optional[str]:
+    for prefix, lane in ADMISSION_ROUTES:
+        if path.startswith(prefix):
+            return lane
+    return None
 
 
 class WebhookApp(Sanic):
@@ -22,6 +130,13 @@ class WebhookApp(Sanic):
         test_mode = kwargs.pop("test_mode", False)
         super().__init__(*args, **kwargs)
         self.ctx._test_mode = test_mode
+        self.ctx.journal = None
+        self.ctx.idempotency = None
+        self.ctx.principal_cache = None
+        self.ctx.shared_caches = dict()
+        self.ctx.shared_stamps = dict()
+        self.ctx.admission = None
+        self.ctx.balance_cache = None
 
     def setup_db(self, config=None):
         """Настройка подключения к БД с возможностью переопределения для тестов"""
@@ -34,16 +149,460 @@ class WebhookApp(Sanic):
             config.DB_PORT = 5432
             config.DB_NAME = "testdb"
 
-        db_conn = DatabaseConnection(config)
-        db_session: AsyncSession = db_conn.create_session()
-        self.ext.dependency(db_session)
+        self.ctx.db_config = config
+        self.register_listener(self._open_db_pool, "before_server_start")
+        self.register_listener(self._close_db_pool, "after_server_stop")
+        self.add_signal(close_db_session, "http.lifecycle.response")
+        self.ext.add_dependency(AsyncSession, get_db_session)
+        self.ext.add_dependency(ReadOnlySession, get_read_session)
+
+    def setup_replicas(self):
+        """Проверка реплик для чтения (DB_REPLICA_URLS)"""
+        self.register_listener(self._open_replicas, "before_server_start")
+
+    @staticmethod
+    async def _open_replicas(app: "WebhookApp") -> None:
+        """
+        Первая проверка - до приема запросов, затем периодически:
+        чтение идет только на реплики, прошедшие последнюю проверку
+        """
+        db: DatabaseConnection = app.ctx.db
+        if not db.replicas:
+            return
+        max_lag = app.config.DB_REPLICA_MAX_LAG
+        timeout = app.config.DB_REPLICA_CHECK_TIMEOUT
+        await db.check_replicas(max_lag, timeout)
+
+        async def check_replicas() -> None:
+            while True:
+                await asyncio.sleep(app.config.DB_REPLICA_CHECK_INTERVAL)
+                await db.check_replicas(max_lag, timeout)
+
+        app.add_task(check_replicas(), name="replica_health")
+
+    def setup_shared_caches(self):
+        """Кеши в разделяемой памяти, общие для воркеров хоста (SHARED_CACHE_SLOTS)"""
+        if self.config.SHARED_CACHE_SLOTS <= 0:
+            return
+        self.register_listener(self._create_shared_caches, "main_process_start")
+        self.register_listener(self._remove_shared_caches, "main_process_stop")
+        self.register_listener(self._open_shared_caches, "before_server_start")
+
+    @staticmethod
+    async def _create_shared_caches(app: "WebhookApp") -> None:
+        """Блоки памяти и блокировки создаются до запуска воркеров"""
+        for name in SHARED_CACHES:
+            memory = create_shared_memory(
+                app.config.SHARED_CACHE_SLOTS, app.config.SHARED_CACHE_SLOT_SIZE
+            )
+            setattr(app.shared_ctx, f"cache_{name}", (memory, multiprocessing.Lock()))
+        for name in SHARED_STAMPS:
+            memory = create_shared_memory(
+                app.config.SHARED_STAMP_SLOTS, STAMP_SLOT.size
+            )
+            setattr(app.shared_ctx, f"stamps_{name}", (memory, multiprocessing.Lock()))
+
+    @staticmethod
+    async def _remove_shared_caches(app: "WebhookApp") -> None:
+        for prefix, names in (("cache", SHARED_CACHES), ("stamps", SHARED_STAMPS)):
+            for name in names:
+                memory, _ = getattr(app.shared_ctx, f"{prefix}_{name}")
+                memory.close()
+                memory.unlink()
+
+    @staticmethod
+    async def _open_shared_caches(app: "WebhookApp") -> None:
+        """
+        Без главного процесса (тесты) общих кешей нет, и воркер
+        использует собственные
+        """
+        for name in SHARED_CACHES:
+            shared = getattr(app.shared_ctx, f"cache_{name}", None)
+            if shared is not None:
+                memory, lock = shared
+                app.ctx.shared_caches[name] = SharedCache(
+                    memory,
+                    lock,
+                    slots=app.config.SHARED_CACHE_SLOTS,
+                    slot_size=app.config.SHARED_CACHE_SLOT_SIZE,
+                )
+        for name in SHARED_STAMPS:
+            shared = getattr(app.shared_ctx, f"stamps_{name}", None)
+            if shared is not None:
+                memory, lock = shared
+                app.ctx.shared_stamps[name] = SharedStamps(
+                    memory, lock, slots=app.config.SHARED_STAMP_SLOTS
+                )
+
+    def setup_balance_cache(self):
+        """Кеш счетов для /payments/score в общем кеше хоста (PAYMENTS_BALANCE_CACHE_TTL)"""
+        self.register_listener(self._open_balance_cache, "before_server_start")
+
+    @staticmethod
+    async def _open_balance_cache(app: "WebhookApp") -> None:
+        shared = app.ctx.shared_caches.get("balances")
+        stamps = app.ctx.shared_stamps.get("balances")
+        if (
+            shared is not None
+            and stamps is not None
+            and app.config.PAYMENTS_BALANCE_CACHE_TTL > 0
+        ):
+            app.ctx.balance_cache = BalanceCache(
+                shared, stamps, ttl=app.config.PAYMENTS_BALANCE_CACHE_TTL
+            )
+
+    def setup_idempotency(self):
+        """Фильтр повторно поступающих платежей в памяти воркера"""
+        self.register_listener(self._open_idempotency, "before_server_start")
+
+    @staticmethod
+    async def _open_idempotency(app: "WebhookApp") -> None:
+        if app.config.WEBHOOK_IDEMPOTENCY_LRU_SIZE > 0:
+            app.ctx.idempotency = IdempotencyFilter(
+                lru_size=app.config.WEBHOOK_IDEMPOTENCY_LRU_SIZE,
+                shared=app.ctx.shared_caches.get("idempotency"),
+                shared_ttl=app.config.WEBHOOK_IDEMPOTENCY_SHARED_TTL,
+            )
+
+    def setup_journal(self):
+        """Асинхронный режим приема платежей через журнал (WEBHOOK_ASYNC_INGEST)"""
+        self.register_listener(self._open_journal, "before_server_start")
+        self.register_listener(self._close_journal, "after_server_stop")
+
+    @staticmethod
+    async def _open_journal(app: "WebhookApp") -> None:
+        """
+        Журнал воркера и фоновая задача проведения платежей из него; журналы
+        без владельца (прежних воркеров) проводятся отдельной задачей
+        """
+        if not app.config.WEBHOOK_ASYNC_INGEST:
+            return
+        directory = Path(app.config.WEBHOOK_JOURNAL_DIR)
+        name = os.environ.get("SANIC_WORKER_NAME", "main")
+        options = dict(
+            fsync_interval=app.config.WEBHOOK_JOURNAL_FSYNC_INTERVAL,
+            batch_size=app.config.WEBHOOK_JOURNAL_BATCH_SIZE,
+            poll_interval=app.config.WEBHOOK_JOURNAL_POLL_INTERVAL,
+            max_attempts=app.config.WEBHOOK_JOURNAL_MAX_ATTEMPTS,
+        )
+        app.ctx.journal = PaymentJournal(directory=directory, name=name, **options)
+
+        async def apply_records(records: list[bytes]) -> None:
+            async with app.ctx.db.create_session() as session:
+                await process_journal_records(
+                    session=session,
+                    records=records,
+                    idempotency=app.ctx.idempotency,
+                    balance_cache=app.ctx.balance_cache,
+                    ledger=app.config.WEBHOOK_LEDGER_MODE,
+                )
+
+        app.add_task(
+            app.ctx.journal.drain(apply_records, is_transient=is_transient_error),
+            name="journal_drain",
+        )
+        app.add_task(
+            drain_orphaned_journals(
+                directory, name, apply_records, is_transient_error, **options
+            ),
+            name="journal_orphans",
+        )
+
+    @staticmethod
+    async def _close_journal(app: "WebhookApp") -> None:
+        if app.ctx.journal is not None:
+            await app.ctx.journal.close()
+
+    def setup_ledger(self):
+        """Перенос проводок журнала в балансы счетов (WEBHOOK_LEDGER_MODE)"""
+        self.register_listener(self._open_ledger, "before_server_start")
+
+    @staticmethod
+    async def _open_ledger(app: "WebhookApp") -> None:
+        """
+        В режиме журнала проводок перенос выполняется постоянно, без него -
+        однократно для проводок, оставшихся после работы в этом режиме
+        """
+        app.add_task(
+            run_ledger_compactor(
+                db=app.ctx.db,
+                interval=app.config.WEBHOOK_LEDGER_COMPACT_INTERVAL,
+                batch_size=app.config.WEBHOOK_LEDGER_COMPACT_BATCH_SIZE,
+                until_empty=not app.config.WEBHOOK_LEDGER_MODE,
+            ),
+            name="ledger_compactor",
+        )
+
+    def setup_partitions(self):
+        """Создание месячных секций payments заранее"""
+        self.register_listener(self._open_partitions, "before_server_start")
+
+    @staticmethod
+    async def _open_partitions(app: "WebhookApp") -> None:
+        app.add_task(
+            run_partition_maintenance(
+                db=app.ctx.db,
+                months_ahead=app.config.PAYMENTS_PARTITIONS_AHEAD,
+                interval=app.config.PAYMENTS_PARTITIONS_CHECK_INTERVAL,
+            ),
+            name="payments_partitions",
+        )
+
+    def setup_principal_cache(self):
+        """Кеш авторизованных пользователей воркера со сбросом через NOTIFY"""
+        self.register_listener(self._open_principal_cache, "before_server_start")
+
+    @staticmethod
+    async def _open_principal_cache(app: "WebhookApp") -> None:
+        if app.config.AUTH_PRINCIPAL_CACHE_SIZE <= 0:
+            return
+        shared = app.ctx.shared_caches.get("principals")
+        stamps = app.ctx.shared_stamps.get("principals")
+        if shared is not None and stamps is not None:
+            app.ctx.principal_cache = SharedPrincipalCache(
+                shared, stamps, ttl=app.config.AUTH_PRINCIPAL_CACHE_TTL
+            )
+        else:
+            app.ctx.principal_cache = PrincipalCache(
+                size=app.config.AUTH_PRINCIPAL_CACHE_SIZE,
+                ttl=app.config.AUTH_PRINCIPAL_CACHE_TTL,
+            )
+        app.add_task(
+            listen_invalidations(db=app.ctx.db, cache=app.ctx.principal_cache),
+            name="principal_invalidations",
+        )
+
+    def setup_metrics(self):
+        """Метрики запросов, БД и обработки платежей для /metrics (METRICS_ENABLED)"""
+        if not self.config.METRICS_ENABLED:
+            return
+        self.register_listener(self._clear_metrics, "main_process_start")
+        self.register_listener(self._open_metrics, "before_server_start")
+        self.register_listener(self._close_metrics, "after_server_stop")
+        self.register_middleware(self._start_request_metrics, "request")
+        self.register_middleware(self._finish_request_metrics, "response")
+
+    @staticmethod
+    async def _clear_metrics(app: "WebhookApp") -> None:
+        """Снимки воркеров прошлого запуска не учитываются"""
+        clear_snapshots(Path(app.config.METRICS_DIR))
+
+    @staticmethod
+    async def _open_metrics(app: "WebhookApp") -> None:
+        """Периодическая запись снимка метрик воркера"""
+        directory = Path(app.config.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        app.ctx.metrics_worker = os.environ.get("SANIC_WORKER_NAME", "main")
+        pool = app.ctx.db.engine.pool
+        metrics.add_collector(
+            lambda: metrics.set("db_pool_checked_out", pool.checkedout())
+        )
+
+        async def write_metrics() -> None:
+            while True:
+                write_snapshot(metrics, directory, app.ctx.metrics_worker)
+                await asyncio.sleep(app.config.METRICS_WRITE_INTERVAL)
+
+        app.add_task(write_metrics(), name="metrics_writer")
+
+    @staticmethod
+    async def _close_metrics(app: "WebhookApp") -> None:
+        write_snapshot(metrics, Path(app.config.METRICS_DIR), app.ctx.metrics_worker)
+
+    @staticmethod
+    async def _start_request_metrics(request: Request) -> None:
+        route = f"/{request.route.path}" if request.route else "unmatched"
+        request.ctx.metrics = start_request(route)
+
+    @staticmethod
+    async def _finish_request_metrics(
+        request: Request, response: BaseHTTPResponse
+    ) -> None:
+        """Для потоковых ответов - время до начала отправки ответа"""
+        request_metrics = getattr(request.ctx, "metrics", None)
+        if request_metrics is not None:
+            finish_request(request_metrics, request.method, response.status)
+
+    def setup_sql_profile(self):
+        """Профилирование запросов к БД каждого HTTP-запроса (SQL_PROFILE_ENABLED)"""
+        if not self.config.SQL_PROFILE_ENABLED:
+            return
+        self.register_middleware(self._start_sql_profile, "request")
+        self.register_middleware(self._finish_sql_profile, "response")
+
+    @staticmethod
+    async def _start_sql_profile(request: Request) -> None:
+        route = f"/{request.route.path}" if request.route else "unmatched"
+        request.ctx.sql_profile = start_profile(route)
+
+    @staticmethod
+    async def _finish_sql_profile(request: Request, response: BaseHTTPResponse) -> None:
+        profile = getattr(request.ctx, "sql_profile", None)
+        if profile is not None:
+            finish_profile(
+                profile,
+                response.headers,
+                threshold=request.app.config.SQL_PROFILE_REPEAT_THRESHOLD,
+                sample_rate=request.app.config.SQL_PROFILE_LOG_SAMPLE_RATE,
+            )
+
+    def setup_admission(self):
+        """Контроль нагрузки: очередь по приоритету маршрутов и ограничение частоты"""
+        if self.config.ADMISSION_MAX_IN_FLIGHT <= 0:
+            return
+        self.register_listener(self._open_admission, "before_server_start")
+        self.register_middleware(self._admit_request, "request")
+        self.add_signal(self._release_admission, "http.lifecycle.response")
+
+    @staticmethod
+    async def _open_admission(app: "WebhookApp") -> None:
+        config = app.config
+        app.ctx.admission = AdmissionController(
+            max_in_flight=config.ADMISSION_MAX_IN_FLIGHT,
+            lanes={
+                name: Lane(
+                    priority,
+                    share,
+                    (
+                        config.ADMISSION_WEBHOOK_MAX_WAIT
+                        if name == "webhook"
+                        else config.ADMISSION_MAX_WAIT
+                    ),
+                    reserve,
+                )
+                for name, (priority, share, reserve) in ADMISSION_LANES.items()
+            },
+        )
+        app.ctx.ip_buckets = (
+            TokenBuckets(config.ADMISSION_IP_RATE, config.ADMISSION_IP_BURST)
+            if config.ADMISSION_IP_RATE > 0
+            else None
+        )
+        app.ctx.token_buckets = (
+            TokenBuckets(config.ADMISSION_TOKEN_RATE, config.ADMISSION_TOKEN_BURST)
+            if config.ADMISSION_TOKEN_RATE > 0
+            else None
+        )
+
+    @staticmethod
+    async def _admit_request(request: Request) -> None:
+        """
+        Место освобождается перед отправкой ответа, а при разрыве
+        соединения во время обработки - по завершении задачи соединения
+        """
+        lane = admission_lane(request.route.path) if request.route else None
+        if lane is None:
+            return
+        ctx = request.app.ctx
+        try:
+            if lane != "webhook":
+                if ctx.ip_buckets is not None:
+                    ctx.ip_buckets.take(request.remote_addr or request.ip)
+                token = request.cookies.get(COOKIE_NAME)
+                if token and ctx.token_buckets is not None:
+                    ctx.token_buckets.take(token)
+        except RateLimitExceeded as exc:
+            metrics.inc(
+                "http_requests_rejected_total", lane=lane, reason="rate_limited"
+            )
+            raise SanicException(
+                "Too many requests",
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(exc.args[0]))},
+            )
+        try:
+            await ctx.admission.acquire(lane)
+        except ServerOverloaded as exc:
+            metrics.inc("http_requests_rejected_total", lane=lane, reason="overloaded")
+            raise SanicException(
+                f"{exc}",
+                status_code=503,
+                headers={"Retry-After": str(request.app.config.ADMISSION_RETRY_AFTER)},
+            )
+        task = asyncio.current_task()
+
+        def release(_=None) -> None:
+            task.remove_done_callback(release)
+            ctx.admission.release(lane)
+
+        task.add_done_callback(release)
+        request.ctx.admission_release = release
+
+    @staticmethod
+    async def _release_admission(request: Request, **_) -> None:
+        release = getattr(request.ctx, "admission_release", None)
+        if release is not None:
+            request.ctx.admission_release = None
+            release()
+
+    def setup_background_tasks(self):
+        """Остановка фоновых задач до остановки цикла событий воркера"""
+        self.register_listener(self._stop_background_tasks, "before_server_stop")
+
+    @staticmethod
+    async def _stop_background_tasks(app: "WebhookApp") -> None:
+        """
+        Задачи, не завершенные к остановке цикла событий, Sanic ожидает
+        без ограничения времени, и процесс воркера не завершается
+        """
+        for name in BACKGROUND_TASKS:
+            await app.cancel_task(name, raise_exception=False)
+        app.purge_tasks()
+
+    def setup_codec(self):
+        """Быстрый JSON для запросов и ответов (FAST_JSON_CODEC), как Sanic(dumps, loads)"""
+        if self.config.FAST_JSON_CODEC:
+            BaseHTTPResponse._dumps = fast_dumps
+            Request._loads = fast_loads
+
+    def setup_passwords(self):
+        """Пул потоков bcrypt воркера закрывается при остановке"""
+        self.register_listener(self._close_password_hasher, "after_server_stop")
+
+    @staticmethod
+    async def _close_password_hasher(app: "WebhookApp") -> None:
+        password_hasher.close()
+
+    @staticmethod
+    async def _open_db_pool(app: "WebhookApp") -> None:
+        """Создание пула соединений в каждом воркере"""
+        app.ctx.db = DatabaseConnection(
+            app.ctx.db_config,
+            instrument=app.config.METRICS_ENABLED,
+            profile=app.config.SQL_PROFILE_ENABLED,
+        )
+
+    @staticmethod
+    async def _close_db_pool(app: "WebhookApp") -> None:
+        """Закрытие пула соединений при остановке воркера"""
+        await app.ctx.db.dispose()
 
 
 app = WebhookApp("WebhookApp", test_mode=False)
 Extend(app)
 
 app.update_config(ConnectionsConfig)
+app.update_config(WebhookConfig)
+app.update_config(PaymentsConfig)
+app.update_config(AuthConfig)
+app.update_config(UsersConfig)
+app.update_config(ServerConfig)
+app.config.load_environment_vars()
+app.setup_codec()
 app.setup_db()
+app.setup_replicas()
+app.setup_shared_caches()
+app.setup_balance_cache()
+app.setup_idempotency()
+app.setup_journal()
+app.setup_ledger()
+app.setup_partitions()
+app.setup_passwords()
+app.setup_principal_cache()
+app.setup_metrics()
+app.setup_sql_profile()
+app.setup_admission()
+app.setup_background_tasks()
 
 app.blueprint(router_user)
 app.blueprint(router_payments)
@@ -51,12 +610,20 @@ app.blueprint(router_payments)
 app.ext.add_dependency(UserSuperSchemas, current_superuser_user)
 app.ext.add_dependency(UserProtectedSchemas, current_user)
 
+metrics.add_collector(
+    lambda: metrics.set("password_hash_queue_depth", password_hasher.queue_depth)
+)
+metrics.add_collector(
+    lambda: metrics.set("password_hash_rejected_total", password_hasher.rejected)
+)
+
 
 @app.exception(SanicException)
 async def handle_sanic_exception(request, exception):
     return json(
         {"error": exception.message, "status": exception.status_code},
         status=exception.status_code,
+        headers=exception.headers,
     )
 
 
@@ -65,9 +632,25 @@ async def index(request):
     return html("<h2> * Transaction handler * </h2>")
 
 
+@app.get("/metrics")
+@openapi.exclude()
+async def metrics_view(request: Request):
+    """
+    Метрики всех воркеров в текстовом формате Prometheus
+    """
+    if not request.app.config.METRICS_ENABLED:
+        raise SanicException("Metrics are disabled", status_code=404)
+    directory = Path(request.app.config.METRICS_DIR)
+    write_snapshot(metrics, directory, request.app.ctx.metrics_worker)
+    return text(
+        metrics.render(metrics.merge(read_snapshots(directory))),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
 @app.post("/webhook")
 @openapi.definition(
-    body={"application/json": TransactionInSchemas.schema()},
+    body={"application/json": TRANSACTION_SCHEMA},
     response={
         200: {
             "description": "Успешная обработка поступившего платежа",
@@ -79,15 +662,52 @@ async def index(request):
                 }
             },
         },
+        202: {
+            "description": "Платеж принят в обработку (асинхронный режим)",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "result": "accepted",
+                    }
+                }
+            },
+        },
         400: {"description": "Неверные данные"},
         500: {"description": "Server error"},
     },
     tag="Webhook",
 )
 async def transaction(request: Request, db_session: AsyncSession):
-    data_request = TransactionInSchemas(**request.json)
+    data_request = load_model(request, TransactionInSchemas)
+    journal: Optional[PaymentJournal] = request.app.ctx.journal
+    idempotency: Optional[IdempotencyFilter] = request.app.ctx.idempotency
+    if journal is not None:
+        if not signature_engine.verify(
+            account_id=data_request.account_id,
+            amount=data_request.amount,
+            transaction_id=data_request.transaction_id,
+            user_id=data_request.user_id,
+            signature=data_request.signature,
+        ):
+            count_webhook("bad_signature")
+            raise SanicException("Error signature", status_code=400)
+        if is_processed(idempotency, data_request.transaction_id):
+            count_webhook("duplicate")
+            raise SanicException(
+                f"The payment #{data_request.transaction_id} is processed",
+                status_code=400,
+            )
+        await journal.append(data_request.model_dump_json().encode())
+        return json({"result": "accepted"}, status=202)
+
     try:
-        await process_transaction(session=db_session, data_request=data_request)
+        await process_transaction(
+            session=db_session,
+            data_request=data_request,
+            idempotency=idempotency,
+            ledger=request.app.config.WEBHOOK_LEDGER_MODE,
+            balance_cache=request.app.ctx.balance_cache,
+        )
     except ErrorInData as exp:
         raise SanicException(f"{exp}", status_code=400)
     except PaymentProcessed as exp:
@@ -95,5 +715,96 @@ async def transaction(request: Request, db_session: AsyncSession):
     return json({"result": "ok"})
 
 
+def parse_batch(request: Request) -> list:
+    """
+    Разбор тела пакетного запроса: JSON-массив или NDJSON (по строке на платеж)
+    """
+    loads = request_loads(request)
+    try:
+        if "ndjson" in request.content_type:
+            return [loads(line) for line in request.body.splitlines() if line.strip()]
+        items = loads(request.body)
+    except ValueError:
+        raise SanicException("Invalid JSON", status_code=400)
+    if not isinstance(items, list):
+        raise SanicException("Expected array of transactions", status_code=400)
+    return items
+
+
+@app.post("/webhook/batch")
+@openapi.definition(
+    body={
+        "application/json": {
+            "type": "array",
+            "items": TRANSACTION_SCHEMA,
+        }
+    },
+    response={
+        200: {
+            "description": "Результаты обработки пакета платежей",
+            "content": {
+                "application/json": {
+                    "example": {
+                        "results": [
+                            {
+                                "transaction_id": "c9827630-6111-4047-aa1e-2165f61d72ad",
+                                "result": "ok",
+                            },
+                            {
+                                "transaction_id": "f151f514-a6d9-489c-857b-12bde5779894",
+                                "result": "error",
+                                "error": "insufficient funds",
+                            },
+                        ]
+                    }
+                }
+            },
+        },
+        400: {"description": "Неверные данные"},
+        500: {"description": "Server error"},
+    },
+    tag="Webhook",
+)
+async def transaction_batch(request: Request, db_session: AsyncSession):
+    items: list = parse_batch(request)
+    if len(items) > request.app.config.WEBHOOK_BATCH_MAX_SIZE:
+        raise SanicException(
+            f"Batch size exceeds {request.app.config.WEBHOOK_BATCH_MAX_SIZE}",
+            status_code=400,
+        )
+
+    results: list[dict] = [dict() for _ in items]
+    data_requests: list[TransactionInSchemas] = list()
+    positions: list[int] = list()
+    for index, item in enumerate(items):
+        try:
+            data_requests.append(TransactionInSchemas(**item))
+        except (ValidationError, TypeError):
+            count_webhook("invalid")
+            transaction_id = (
+                item.get("transaction_id") if isinstance(item, dict) else None
+            )
+            results[index] = {
+                "transaction_id": transaction_id,
+                "result": "error",
+                "error": "Invalid transaction data",
+            }
+        else:
+            positions.append(index)
+
+    if data_requests:
+        processed = await process_transactions_batch(
+            session=db_session,
+            data_requests=data_requests,
+            idempotency=request.app.ctx.idempotency,
+            balance_cache=request.app.ctx.balance_cache,
+            ledger=request.app.config.WEBHOOK_LEDGER_MODE,
+        )
+        for index, result in zip(positions, processed):
+            results[index] = result
+
+    return json({"results": results})
+
+
 if __name__ == "__main__":
     app.run(port=8000, auto_reload=True)
@@ -0,0 +1,65 @@
+"""
+Сборка спецификации OpenAPI при развертывании:
+
+    python -m src.openapi_spec openapi.json
+
+Сервер с SANIC_OAS_CUSTOM_FILE=openapi.json отдает /docs/openapi.json из файла,
+не собирая спецификацию на каждый запрос
+"""
+
+import argparse
+import json
+import logging
+import warnings
+from pathlib import Path
+from typing import Any, Optional
+
+from sanic import Sanic
+from sanic_ext.config import PRIORITY
+from sanic_ext.extensions.openapi.builders import SpecificationBuilder
+
+from src.main import app
+
+logger = logging.getLogger(__name__)
+
+
+def build_openapi_spec(app: Sanic) -> dict[str, Any]:
+    """
+    Спецификация, которую sanic-ext собирает при запуске воркера: приложение
+    запускается в одном процессе и останавливается слушателем
+    before_server_start, выполняемым после слушателя blueprint openapi
+    (приоритет ниже PRIORITY sanic-ext), до приема запросов
+    """
+    specs: list[dict[str, Any]] = list()
+
+    async def capture_spec(app: Sanic) -> None:
+        specs.append(SpecificationBuilder().build(app).serialize())
+        app.stop()
+
+    app.register_listener(capture_spec, "before_server_start", priority=PRIORITY - 1)
+    app.prepare(
+        host="127.0.0.1", port=0, single_process=True, motd=False, access_log=False
+    )
+    with warnings.catch_warnings():
+        # фоновые задачи приложения добавлены, но не запускаются
+        warnings.filterwarnings("ignore", "coroutine .* was never awaited")
+        Sanic.serve_single(app)
+    return specs[0]
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.openapi_spec", description=__doc__.split("\n\n")[0]
+    )
+    parser.add_argument("output", type=Path)
+    args = parser.parse_args(argv)
+
+    spec = build_openapi_spec(app)
+    args.output.write_text(json.dumps(spec, ensure_ascii=False))
+    logger.info(
+        "OpenAPI spec with %d paths written to %s", len(spec["paths"]), args.output
+    )
+
+
+if __name__ == "__main__":
+    main()
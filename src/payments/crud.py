@@ -1,47 +1,271 @@
+import base64
 import logging
+import uuid
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Optional
 
-from sqlalchemy import select
-from sqlalchemy.engine import Result
+from sqlalchemy import (
+    DateTime,
+    Integer,
+    Numeric,
+    String,
+    column,
+    func,
+    select,
+    tuple_,
+)
+from sqlalchemy.engine import Result, Row
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import Label
 
-from src.core.config import configure_logging
-from src.payments.models import Payment, Score
-from src.payments.schemas import PaymentOutSchemas, ScoreBaseSchemas
-from src.users.crud import get_user_by_id
-from src.users.models import User
+from src.core.exceptions import ErrorInData
+from src.payments.models import LedgerEntry, Payment, Score
+from src.payments.schemas import (
+    PaymentsPageQuerySchemas,
+    payment_to_dict,
+    score_to_dict,
+)
+from src.utils.balance_cache import BalanceCache
+from src.utils.create_account_number import account_allocator
 
-configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Коды возврата функции БД apply_payment
+PAYMENT_APPLIED = 0
+PAYMENT_DUPLICATE = 1
+PAYMENT_USER_NOT_FOUND = 2
+PAYMENT_INSUFFICIENT_FUNDS = 3
+PAYMENT_ACCOUNT_NUMBER_REQUIRED = 4
 
-async def list_scopes(session: AsyncSession, id_user: int) -> list[dict[str, str]]:
+
+def score_balance() -> Label:
+    """
+    Баланс счета: перенесенный в scores.balance плюс проводки журнала,
+    ожидающие переноса
+    """
+    pending = (
+        select(func.coalesce(func.sum(LedgerEntry.amount), 0))
+        .where(LedgerEntry.score_id == Score.id)
+        .scalar_subquery()
+    )
+    return (Score.balance + pending).label("balance")
+
+
+async def list_scopes(
+    session: AsyncSession, id_user: int, cache: Optional[BalanceCache] = None
+) -> list[dict[str, str]]:
     """
-    Возвращает список счетов пользователя
+    Возвращает список счетов пользователя (из кеша, если он задан и
+    содержит все счета пользователя)
     """
-    user: User = await get_user_by_id(session=session, id_user=id_user)
+    if cache is not None:
+        scores: Optional[list[dict[str, str]]] = cache.get_scores(id_user)
+        if scores is not None:
+            return scores
+        started: float = cache.read_started()
 
-    stmt = select(Score).filter(Score.user_id == user.id)
+    stmt = (
+        select(
+            Score.account_id,
+            Score.account_number,
+            score_balance(),
+            Score.date_creation,
+            Score.version,
+        )
+        .where(Score.user_id == id_user)
+        .order_by(Score.id)
+    )
     result: Result = await session.execute(stmt)
-    scores = result.scalars().all()
-    list_scopes_user: list[dict[str, str]] = [
-        ScoreBaseSchemas(**i_scores.__dict__).model_dump() for i_scores in scores
-    ]
+    rows = result.all()
+    scores = [score_to_dict(row) for row in rows]
+    if cache is not None:
+        cache.put_scores(
+            id_user,
+            [(score, row.version) for score, row in zip(scores, rows)],
+            started=started,
+        )
+    return scores
 
-    return list_scopes_user
+
+async def refresh_balances(
+    session: AsyncSession, cache: BalanceCache, keys: set[tuple[int, int]]
+) -> None:
+    """
+    Запись в кеш счетов (account_id, user_id), измененных зафиксированной транзакцией
+    """
+    started: float = cache.read_started()
+    stmt = select(
+        Score.user_id,
+        Score.account_id,
+        Score.account_number,
+        score_balance(),
+        Score.date_creation,
+        Score.version,
+    ).where(tuple_(Score.account_id, Score.user_id).in_(keys))
+    result: Result = await session.execute(stmt)
+    for row in result:
+        cache.update(row.user_id, score_to_dict(row), row.version, started=started)
 
 
-async def list_payments(session: AsyncSession, user_id: int) -> list[dict[str, str]]:
+def encode_cursor(date_creation: datetime, transaction_id: uuid.UUID) -> str:
     """
-    Возвращает список платежей пользователя
+    Курсор страницы платежей: позиция платежа в порядке (date_creation, transaction_id)
     """
-    logger.info("Get list payments for user with id: %s" % user_id)
+    raw = f"{date_creation.isoformat()}|{transaction_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, uuid.UUID]:
+    try:
+        date_creation, transaction_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        return datetime.fromisoformat(date_creation), uuid.UUID(transaction_id)
+    except ValueError:
+        raise ErrorInData(f"Invalid cursor {cursor}")
 
-    stmt = select(Payment).filter(Payment.user_id == user_id)
+
+def payments_filters(user_id: int, query: PaymentsPageQuerySchemas) -> list:
+    """
+    Условия выборки платежей пользователя по фильтрам и курсору
+    """
+    filters = [Payment.user_id == user_id]
+    if query.date_from is not None:
+        filters.append(Payment.date_creation >= query.date_from)
+    if query.date_to is not None:
+        filters.append(Payment.date_creation < query.date_to)
+    if query.amount_min is not None:
+        filters.append(Payment.amount >= query.amount_min)
+    if query.amount_max is not None:
+        filters.append(Payment.amount <= query.amount_max)
+
+    position = tuple_(Payment.date_creation, Payment.transaction_id)
+    if query.after is not None:
+        filters.append(position > tuple_(*decode_cursor(query.after)))
+    if query.before is not None:
+        filters.append(position < tuple_(*decode_cursor(query.before)))
+    return filters
+
+
+async def list_payments(
+    session: AsyncSession, user_id: int, query: PaymentsPageQuerySchemas
+) -> dict:
+    """
+    Возвращает страницу платежей пользователя в порядке (date_creation, transaction_id)
+    и курсоры соседних страниц
+    """
+    logger.info("Get list payments for user with id: %s", user_id)
+
+    backward: bool = query.before is not None
+    order = (
+        (Payment.date_creation.desc(), Payment.transaction_id.desc())
+        if backward
+        else (Payment.date_creation, Payment.transaction_id)
+    )
+    stmt = (
+        select(
+            Payment.account_id,
+            Payment.amount,
+            Payment.date_creation,
+            Payment.transaction_id,
+        )
+        .where(*payments_filters(user_id=user_id, query=query))
+        .order_by(*order)
+        .limit(query.limit + 1)
+    )
     result: Result = await session.execute(stmt)
-    payments = result.scalars().all()
+    rows = result.all()
+
+    has_more: bool = len(rows) > query.limit
+    rows = rows[: query.limit]
+    if backward:
+        rows.reverse()
 
-    list_payment_user: list[dict[str, str]] = [
-        PaymentOutSchemas(**payment.__dict__).model_dump() for payment in payments
-    ]
+    has_prev: bool = has_more if backward else query.after is not None
+    has_next: bool = backward or has_more
+    prev_cursor: Optional[str] = None
+    next_cursor: Optional[str] = None
+    if rows and has_prev:
+        prev_cursor = encode_cursor(rows[0].date_creation, rows[0].transaction_id)
+    if rows and has_next:
+        next_cursor = encode_cursor(rows[-1].date_creation, rows[-1].transaction_id)
 
-    return list_payment_user
+    return {
+        "payments": [payment_to_dict(row) for row in rows],
+        "prev": prev_cursor,
+        "next": next_cursor,
+    }
+
+
+# Строка результата функции БД apply_payment: код возврата и счет после
+# изменения баланса
+APPLY_PAYMENT_COLUMNS = (
+    column("status", Integer),
+    column("account_id", Integer),
+    column("account_number", String),
+    column("balance", Numeric),
+    column("version", Integer),
+    column("date_creation", DateTime(timezone=True)),
+)
+
+
+async def call_apply_payment(
+    session: AsyncSession, ledger: bool, *args: Any
+) -> tuple[int, Optional[Row]]:
+    if ledger:
+        stmt = select(func.apply_payment_ledger(*args, type_=Integer))
+        result: Result = await session.execute(stmt)
+        return result.scalar_one(), None
+
+    stmt = select(func.apply_payment(*args).table_valued(*APPLY_PAYMENT_COLUMNS))
+    result = await session.execute(stmt)
+    row: Row = result.one()
+    return row.status, (row if row.account_id is not None else None)
+
+
+async def apply_payment(
+    session: AsyncSession,
+    transaction_id: uuid.UUID,
+    user_id: int,
+    account_id: int,
+    amount: Decimal,
+    ledger: bool = False,
+) -> tuple[int, Optional[Row]]:
+    """
+    Проведение платежа за один запрос к БД (функция apply_payment):
+    проверка на повтор, проверка средств, изменение баланса и запись платежа.
+    Возвращает код возврата и счет после изменения баланса (None, если
+    счет не изменен и не создан).
+    В режиме журнала проводок (apply_payment_ledger) баланс не изменяется,
+    платеж записывается в ledger_entries, счет не возвращается.
+    Для платежа на новый счет запрос повторяется с номером нового счета
+    """
+    args = (transaction_id, user_id, account_id, amount)
+    status, row = await call_apply_payment(session, ledger, *args)
+    if status != PAYMENT_ACCOUNT_NUMBER_REQUIRED:
+        return status, row
+
+    account_number: str = await account_allocator.allocate(session=session)
+    return await call_apply_payment(session, ledger, *args, account_number)
+
+
+async def compact_ledger(session: AsyncSession, limit: int) -> int:
+    """
+    Перенос проводок журнала в балансы счетов (функция compact_ledger),
+    возвращает количество перенесенных проводок
+    """
+    stmt = select(func.compact_ledger(limit, type_=Integer))
+    result: Result = await session.execute(stmt)
+    return result.scalar_one()
+
+
+async def create_payments_partitions(session: AsyncSession, months_ahead: int) -> int:
+    """
+    Создание недостающих месячных секций payments до текущего месяца
+    + months_ahead (функция create_payments_partitions), возвращает
+    количество созданных секций
+    """
+    stmt = select(func.create_payments_partitions(func.now(), months_ahead))
+    result: Result = await session.execute(stmt)
+    return result.scalar_one()
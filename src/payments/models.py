@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING
 from sqlalchemy import (
     NUMERIC,
     UUID,
+    BigInteger,
     DateTime,
     ForeignKey,
     Index,
@@ -36,7 +37,13 @@ class Score(Base):
     balance: Mapped[NUMERIC] = mapped_column(
         NUMERIC(15, 2), default=0.00, server_default=text("0.00")
     )
+    # Сумма списаний в журнале проводок, еще не перенесенных в balance (<= 0)
+    reserved: Mapped[NUMERIC] = mapped_column(
+        NUMERIC(15, 2), default=0.00, server_default=text("0.00")
+    )
     account_number: Mapped[str] = mapped_column(String(20), unique=True, nullable=False)
+    # Увеличивается триггером при каждом изменении balance или reserved
+    version: Mapped[int] = mapped_column(default=0, server_default=text("0"))
     date_creation: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True),
         server_default=func.now(),
@@ -48,17 +55,28 @@ class Score(Base):
 
 
 class Payment(Base):
+    """
+    Платеж. Таблица секционирована по месяцам date_creation (секции
+    payments_YYYY_MM), уникальность transaction_id во всех секциях
+    обеспечивает processed_transactions
+    """
+
     __tablename__ = "payments"
     __table_args__ = (
-        UniqueConstraint(
-            "transaction_id", "user_id", name="idx_unique_transaction_user"
+        Index(
+            "idx_payments_user_date_transaction",
+            "user_id",
+            "date_creation",
+            "transaction_id",
         ),
+        {"postgresql_partition_by": "RANGE (date_creation)"},
     )
 
     transaction_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
     amount: Mapped[NUMERIC] = mapped_column(NUMERIC(15, 2))
     date_creation: Mapped[DateTime] = mapped_column(
         DateTime(timezone=True),
+        primary_key=True,
         server_default=func.now(),
         default=lambda: datetime.now(timezone.utc),
     )
@@ -66,3 +84,32 @@ class Payment(Base):
     account_id: Mapped[int] = mapped_column(ForeignKey("scores.id", ondelete="CASCADE"))
 
     user: Mapped["User"] = relationship(back_populates="payments")
+
+
+class ProcessedTransaction(Base):
+    """
+    Идентификатор проведенного платежа. Запись добавляет триггер payments
+    перед вставкой платежа, повторный платеж не вставляется
+    """
+
+    __tablename__ = "processed_transactions"
+
+    transaction_id: Mapped[UUID] = mapped_column(UUID(as_uuid=True), primary_key=True)
+
+
+class LedgerEntry(Base):
+    """
+    Проводка по счету, еще не перенесенная в scores.balance
+    """
+
+    __tablename__ = "ledger_entries"
+    __table_args__ = (Index("idx_ledger_entries_score", "score_id"),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    score_id: Mapped[int] = mapped_column(ForeignKey("scores.id", ondelete="CASCADE"))
+    amount: Mapped[NUMERIC] = mapped_column(NUMERIC(15, 2))
+    date_creation: Mapped[DateTime] = mapped_column(
+        DateTime(timezone=True),
+        server_default=func.now(),
+        default=lambda: datetime.now(timezone.utc),
+    )
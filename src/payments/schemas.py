@@ -1,15 +1,53 @@
-from datetime import datetime
+from datetime import date, datetime, timezone
 from decimal import Decimal
-from uuid import uuid4
+from functools import lru_cache
+from typing import Any, Optional
+from uuid import UUID
 
 from pydantic import (
-    UUID4,
     BaseModel,
     ConfigDict,
     Field,
     field_serializer,
+    field_validator,
+    model_validator,
 )
 
+from src.utils.uuid7 import uuid7
+
+DATE_FORMAT = "%d-%b-%Y"
+
+
+@lru_cache(maxsize=4096)
+def format_date(day: date) -> str:
+    return day.strftime(DATE_FORMAT)
+
+
+def score_to_dict(row: Any) -> dict[str, Any]:
+    """
+    Счет из строки выборки (account_id, account_number, balance, date_creation)
+    в формате ScoreBaseSchemas без создания модели
+    """
+    return {
+        "account_id": row.account_id,
+        "account_number": row.account_number,
+        "balance": str(row.balance),
+        "date_creation": format_date(row.date_creation.date()),
+    }
+
+
+def payment_to_dict(row: Any) -> dict[str, Any]:
+    """
+    Платеж из строки выборки (account_id, amount, date_creation, transaction_id)
+    в формате PaymentOutSchemas без создания модели
+    """
+    return {
+        "account_id": row.account_id,
+        "amount": str(row.amount),
+        "date_creation": format_date(row.date_creation.date()),
+        "transaction_id": str(row.transaction_id),
+    }
+
 
 class ScoreBaseSchemas(BaseModel):
     account_id: int
@@ -19,11 +57,7 @@ class ScoreBaseSchemas(BaseModel):
 
     @field_serializer("date_creation")
     def serialize_date_of_issue(self, dt: datetime, _info):
-        return dt.strftime("%d-%b-%Y")
-
-    @field_serializer("balance")
-    def serialize_balance(self, bal: Decimal, _info):
-        return str(bal)
+        return format_date(dt.date())
 
 
 class ScoreOutSchemas(ScoreBaseSchemas):
@@ -37,21 +71,35 @@ class PaymentBaseSchemas(BaseModel):
 
     @field_serializer("date_creation")
     def serialize_date_creation(self, dt: datetime, _info):
-        return dt.strftime("%d-%b-%Y")
-
-    @field_serializer("amount")
-    def serialize_balance(self, amo: Decimal, _info):
-        return str(amo)
+        return format_date(dt.date())
 
 
 class PaymentOutSchemas(PaymentBaseSchemas):
-    transaction_id: UUID4 = Field(default_factory=uuid4)
+    transaction_id: UUID = Field(default_factory=uuid7)
 
     model_config = ConfigDict(from_attributes=True)
 
-    @field_serializer("transaction_id")
-    def serialize_id(self, tra: UUID4, _info):
-        return str(tra)
+
+class PaymentsPageQuerySchemas(BaseModel):
+    limit: int = Field(default=100, ge=1, le=1000)
+    after: Optional[str] = None
+    before: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    amount_min: Optional[Decimal] = None
+    amount_max: Optional[Decimal] = None
+
+    @field_validator("date_from", "date_to")
+    def validate_timezone(cls, value: Optional[datetime]) -> Optional[datetime]:
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
+    @model_validator(mode="after")
+    def validate_cursors(self) -> "PaymentsPageQuerySchemas":
+        if self.after is not None and self.before is not None:
+            raise ValueError("Use either after or before cursor")
+        return self
 
 
 class PaymentGenerateBaseSchemas(BaseModel):
@@ -1,11 +1,21 @@
+from pydantic import ValidationError
 from sanic import Blueprint, Request
+from sanic.exceptions import SanicException
 from sanic.response import json
 from sanic_ext import openapi
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src.core.database import ReadOnlySession
+from src.core.depends import get_db_session
+from src.core.exceptions import ErrorInData
 from src.payments.crud import list_payments, list_scopes
-from src.payments.schemas import PaymentGenerateBaseSchemas, PaymentGenerateOutSchemas
+from src.payments.schemas import (
+    PaymentGenerateBaseSchemas,
+    PaymentGenerateOutSchemas,
+    PaymentsPageQuerySchemas,
+)
 from src.users.schemas import UserProtectedSchemas
+from src.utils.codec import load_model
 from src.utils.processing import generate_payments
 
 router = Blueprint("payments", url_prefix="/payments")
@@ -37,13 +47,18 @@ router = Blueprint("payments", url_prefix="/payments")
     tag="Payments",
 )
 async def get_list_scores(
-    request: Request, db_session: AsyncSession, user: UserProtectedSchemas
+    request: Request, db_session: ReadOnlySession, user: UserProtectedSchemas
 ):
     """
     Получение пользователем информации о своих счетах
     """
+    cache = request.app.ctx.balance_cache
+    if cache is not None and request.app.config.WEBHOOK_LEDGER_MODE:
+        # проводки журнала не увеличивают версию счета, и чтение с отстающей
+        # реплики нельзя отличить от актуального: кеш заполняется с основного сервера
+        db_session = await get_db_session(request)
     list_scopes_user: list[dict[str, str]] = await list_scopes(
-        session=db_session, id_user=user.id
+        session=db_session, id_user=user.id, cache=cache
     )
     return json({"scores": list_scopes_user})
 
@@ -63,31 +78,49 @@ async def get_list_scores(
                                 "transaction_id": "f151f514-a6d9-489c-857b-12bde5779894"
                             }
                         ],
+                        "prev": None,
+                        "next": "MjAyNS0wNi0xOVQxMDowMDowMCswMDowMHxmMTUxZjUxNA==",
                     }
                 }
             },
         },
+        400: {"description": "Неверные параметры запроса"},
         401: {"description": "User not authorized"},
         403: {"description": "Access denied"},
         500: {"description": "Server error"},
     },
+    parameter=[
+        {"name": "limit", "schema": int, "location": "query"},
+        {"name": "after", "schema": str, "location": "query"},
+        {"name": "before", "schema": str, "location": "query"},
+        {"name": "date_from", "schema": str, "location": "query"},
+        {"name": "date_to", "schema": str, "location": "query"},
+        {"name": "amount_min", "schema": str, "location": "query"},
+        {"name": "amount_max", "schema": str, "location": "query"},
+    ],
     tag="Payments",
 )
 async def get_list_payments_for_user(
-    request: Request, db_session: AsyncSession, user: UserProtectedSchemas
+    request: Request, db_session: ReadOnlySession, user: UserProtectedSchemas
 ):
     """
-    Получение пользователем информации о своих платежах
+    Получение пользователем информации о своих платежах (постранично, по курсору)
     """
-    list_payments_user: list[dict[str, str]] = await list_payments(
-        session=db_session, user_id=user.id
-    )
-    return json({"payments": list_payments_user})
+    try:
+        query = PaymentsPageQuerySchemas(
+            **{name: request.args.get(name) for name in request.args}
+        )
+        page: dict = await list_payments(
+            session=db_session, user_id=user.id, query=query
+        )
+    except (ValidationError, ErrorInData) as exp:
+        raise SanicException(f"{exp}", status_code=400)
+    return json(page)
 
 
 @router.post("/create_payment")
 @openapi.definition(
-    body={"application/json": PaymentGenerateBaseSchemas.schema()},
+    body={"application/json": PaymentGenerateBaseSchemas.model_json_schema()},
     response={
         200: {
             "description": "Успешная генерация платежного поручения с подписью",
@@ -112,6 +145,6 @@ async def create_payment(request: Request, db_session: AsyncSession):
     """
     Генерация платежа по реквизитам (transaction_id генерируется системой)
     """
-    data_request = PaymentGenerateBaseSchemas(**request.json)
+    data_request = load_model(request, PaymentGenerateBaseSchemas)
     payment: PaymentGenerateOutSchemas = await generate_payments(data_request)
     return json(payment.model_dump())
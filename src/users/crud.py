@@ -1,32 +1,31 @@
 import logging
-from typing import Optional, Union
+from typing import Any, AsyncIterator, Optional, Union
 
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.engine import Result
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
 
-from src.core.config import configure_logging
 from src.core.exceptions import (
     EmailInUse,
     ErrorInData,
     NotFindUser,
     UniqueViolationError,
 )
+from src.payments.crud import score_balance
 from src.payments.models import Score
-from src.payments.schemas import ScoreBaseSchemas
+from src.payments.schemas import score_to_dict
 from src.users.models import User
 from src.users.schemas import (
-    OutUserSchemas,
     UserCreateSchemas,
+    UserSuperSchemas,
     UserUpdatePartialSchemas,
     UserUpdateSchemas,
 )
 from src.utils.create_account_number import bank_account
 from src.utils.jwt_utils import create_hash_password
+from src.utils.principal_cache import PRINCIPAL_INVALIDATE_CHANNEL
 
-configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -34,12 +33,12 @@ async def get_user_from_db(session: AsyncSession, email: str) -> User:
     """
     Поиск пользователя в БД по email (с вызовом исключения)
     """
-    logger.info("Start find user by username: %s" % email)
+    logger.info("Start find user by username: %s", email)
     stmt = select(User).where(User.email == email)
     res: Result = await session.execute(stmt)
     user: Optional[User] = res.scalars().one_or_none()
     if not user:
-        logger.info("User by name %s not find" % email)
+        logger.info("User by name %s not find", email)
         raise NotFindUser(f"Not find user by username {email}")
     logger.info("User has benn found")
     return user
@@ -49,15 +48,31 @@ async def get_user_by_id(session: AsyncSession, id_user: int) -> Optional[User]:
     """
     Поиск пользователя в БД по id
     """
-    logger.info("User request by id %d" % id_user)
+    logger.info("User request by id %d", id_user)
     return await session.get(User, id_user)
 
 
+async def get_principal(
+    session: AsyncSession, id_user: int
+) -> Optional[UserSuperSchemas]:
+    """
+    Данные пользователя для авторизации (только нужные столбцы)
+    """
+    stmt = select(User.id, User.full_name, User.email, User.is_superuser).where(
+        User.id == id_user
+    )
+    result: Result = await session.execute(stmt)
+    row = result.one_or_none()
+    if row is None:
+        return None
+    return UserSuperSchemas.model_validate(row, from_attributes=True)
+
+
 async def find_user_by_email(session: AsyncSession, email: str) -> Optional[User]:
     """
     Поиск пользователя в БД по email
     """
-    logger.info("User find by email %s" % email)
+    logger.info("User find by email %s", email)
     stmt = select(User).filter(User.email == email)
     result: Result = await session.execute(stmt)
     return result.scalar_one_or_none()
@@ -67,7 +82,7 @@ async def create_user(session: AsyncSession, user_data: UserCreateSchemas) -> Us
     """
     Создание нового пользователя
     """
-    logger.info("Start create user with email %s" % user_data.email)
+    logger.info("Start create user with email %s", user_data.email)
     result: Optional[User] = await find_user_by_email(
         session=session, email=user_data.email
     )
@@ -90,10 +105,18 @@ async def create_user(session: AsyncSession, user_data: UserCreateSchemas) -> Us
         session.add(new_score)
 
         await session.commit()
-        logger.info("User with email %s created" % user_data.email)
+        logger.info("User with email %s created", user_data.email)
         return new_user
 
 
+async def notify_user_changed(session: AsyncSession, id_user: int) -> None:
+    """
+    Уведомление воркеров об изменении пользователя (доставляется после commit)
+    """
+    stmt = select(func.pg_notify(PRINCIPAL_INVALIDATE_CHANNEL, str(id_user)))
+    await session.execute(stmt)
+
+
 async def update_user_db(
     session: AsyncSession,
     id_user: int,
@@ -112,6 +135,7 @@ async def update_user_db(
     try:
         for name, value in user_update.model_dump(exclude_unset=partial).items():
             setattr(user, name, value)
+        await notify_user_changed(session=session, id_user=id_user)
         await session.commit()
     except IntegrityError:
         await session.rollback()
@@ -127,34 +151,55 @@ async def delete_user_db(session: AsyncSession, id_user: int) -> None:
     """
     Удаление пользователя по id
     """
-    logger.info("Delete user by id %s" % id_user)
+    logger.info("Delete user by id %s", id_user)
     user: Optional[User] = await get_user_by_id(session=session, id_user=id_user)
     if user is None:
         raise NotFindUser(f"User with id {id_user} not found!")
     await session.delete(user)
+    await notify_user_changed(session=session, id_user=id_user)
     await session.commit()
 
 
-async def get_users(session: AsyncSession) -> list[dict[str, str]]:
+async def stream_users(
+    session: AsyncSession, chunk_size: int = 500
+) -> AsyncIterator[list[dict[str, Any]]]:
     """
-    Возвращает список пользователей со счетами
+    Возвращает пользователей со счетами (в формате OutUserSchemas) частями
+    по мере чтения серверного курсора
     """
     logger.info("Get list users")
 
-    stmt = select(User).options(selectinload(User.scores)).order_by(User.id)
-    result: Result = await session.execute(stmt)
-    users = result.scalars().all()
-
-    list_users = list()
-    for user in users:  # type: User
-        list_score = list()
-        for score in user.scores:  # type: Score
-            schema_score = ScoreBaseSchemas(**score.__dict__)
-            list_score.append(schema_score)
-
-        schema_user = OutUserSchemas(
-            id=user.id, full_name=user.full_name, email=user.email, score=list_score
+    stmt = (
+        select(
+            User.id,
+            User.full_name,
+            User.email,
+            Score.account_id,
+            Score.account_number,
+            score_balance(),
+            Score.date_creation,
         )
-        list_users.append(schema_user.model_dump())
-
-    return list_users
+        .outerjoin(Score, Score.user_id == User.id)
+        .order_by(User.id, Score.id)
+        .execution_options(yield_per=chunk_size)
+    )
+    result: AsyncResult = await session.stream(stmt)
+
+    chunk: list[dict[str, Any]] = list()
+    user: Optional[dict[str, Any]] = None
+    async for row in result:
+        if user is None or user["id"] != row.id:
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = list()
+            user = {
+                "full_name": row.full_name,
+                "email": row.email,
+                "id": row.id,
+                "score": [],
+            }
+            chunk.append(user)
+        if row.account_number is not None:
+            user["score"].append(score_to_dict(row))
+    if chunk:
+        yield chunk
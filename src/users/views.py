@@ -1,22 +1,25 @@
 from sanic import Blueprint, Request
 from sanic.exceptions import SanicException
+from sanic.helpers import json_dumps
 from sanic.response import HTTPResponse, json
 from sanic_ext import openapi
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from src.core.config import COOKIE_NAME
+from src.core.database import ReadOnlySession
+from src.core.depends import invalidate_principal
 from src.core.exceptions import (
     EmailInUse,
     ErrorInData,
     NotFindUser,
+    PasswordHasherBusy,
     UniqueViolationError,
 )
 from src.users.crud import (
     create_user,
     delete_user_db,
-    get_user_by_id,
     get_user_from_db,
-    get_users,
+    stream_users,
     update_user_db,
 )
 from src.users.models import User
@@ -29,6 +32,7 @@ from src.users.schemas import (
     UserUpdatePartialSchemas,
     UserUpdateSchemas,
 )
+from src.utils.codec import load_model
 from src.utils.jwt_utils import create_jwt, validate_password
 
 router = Blueprint("user", url_prefix="/user")
@@ -36,7 +40,7 @@ router = Blueprint("user", url_prefix="/user")
 
 @router.post("/login")
 @openapi.definition(
-    body={"application/json": LoginSchemas.schema()},
+    body={"application/json": LoginSchemas.model_json_schema()},
     response={
         200: {
             "description": "Успешный вход",
@@ -48,6 +52,7 @@ router = Blueprint("user", url_prefix="/user")
         },
         401: {"description": "Неверные данные"},
         500: {"description": "Server error"},
+        503: {"description": "Server busy"},
     },
     tag="User",
 )
@@ -55,7 +60,7 @@ async def login(request: Request, db_session: AsyncSession) -> HTTPResponse:
     """
     Обрабатывает вход пользователя в систему
     """
-    data_login = LoginSchemas(**request.json)
+    data_login = load_model(request, LoginSchemas)
     try:
         user: User = await get_user_from_db(session=db_session, email=data_login.email)
     except NotFindUser:
@@ -63,10 +68,17 @@ async def login(request: Request, db_session: AsyncSession) -> HTTPResponse:
             status=400,
             body=f"The user with the username: {data_login.email} not found",
         )
+    # соединение возвращается в пул до проверки пароля
+    await db_session.close()
 
-    if await validate_password(
-        password=data_login.password, hashed_password=user.hashed_password
-    ):
+    try:
+        is_valid: bool = await validate_password(
+            password=data_login.password, hashed_password=user.hashed_password
+        )
+    except PasswordHasherBusy as exp:
+        raise SanicException(f"{exp}", status_code=503)
+
+    if is_valid:
         access_token: str = await create_jwt(str(user.id))
         response = json(
             {"access_token": access_token, "token_type": "bearer"}, status=200
@@ -88,7 +100,7 @@ async def login(request: Request, db_session: AsyncSession) -> HTTPResponse:
 
 @router.post("/create")
 @openapi.definition(
-    body={"application/json": UserCreateSchemasIn.schema()},
+    body={"application/json": UserCreateSchemasIn.model_json_schema()},
     response={
         201: {
             "description": "Успешное создание пользователя",
@@ -106,6 +118,7 @@ async def login(request: Request, db_session: AsyncSession) -> HTTPResponse:
         401: {"description": "User not authorized"},
         403: {"description": "Access denied"},
         500: {"description": "Server error"},
+        503: {"description": "Server busy"},
     },
     tag="User",
 )
@@ -117,11 +130,12 @@ async def user_create(
     """
     Создание нового пользователя системы
     """
+    data_user = load_model(request, UserCreateSchemasIn)
     try:
         new_user = UserCreateSchemas(
-            full_name=request.json["username"],
-            email=request.json["email"],
-            hashed_password=request.json["password"],
+            full_name=data_user.username,
+            email=data_user.email,
+            hashed_password=data_user.password,
         )
         user: User = await create_user(session=db_session, user_data=new_user)
     except EmailInUse:
@@ -132,6 +146,8 @@ async def user_create(
 
     except (ErrorInData, ValueError) as exp:
         raise SanicException(f"{exp}", status_code=400)
+    except PasswordHasherBusy as exp:
+        raise SanicException(f"{exp}", status_code=503)
 
     return json(
         {"id": user.id, "full_name": user.full_name, "email": user.email},
@@ -162,7 +178,7 @@ def logout(request: Request) -> HTTPResponse:
 
 @router.put("/<id_user:int>/")
 @openapi.definition(
-    body={"application/json": UserUpdateSchemas.schema()},
+    body={"application/json": UserUpdateSchemas.model_json_schema()},
     response={
         200: {
             "description": "Успешное изменение данных пользователя",
@@ -193,7 +209,7 @@ async def update_user(
     Полное изменение данных пользователя
     """
     try:
-        data_user_update = UserUpdateSchemas(**request.json)
+        data_user_update = load_model(request, UserUpdateSchemas)
         user_update = await update_user_db(
             session=db_session, id_user=id_user, user_update=data_user_update
         )
@@ -210,6 +226,7 @@ async def update_user(
     except (ErrorInData, ValueError) as exp:
         raise SanicException(f"{exp}", status_code=400)
     else:
+        invalidate_principal(request=request, id_user=id_user)
         return json(
             {
                 "id": user_update.id,
@@ -222,7 +239,7 @@ async def update_user(
 
 @router.patch("/<id_user:int>/")
 @openapi.definition(
-    body={"application/json": UserUpdatePartialSchemas.schema()},
+    body={"application/json": UserUpdatePartialSchemas.model_json_schema()},
     response={
         200: {
             "description": "Успешное изменение данных пользователя",
@@ -253,7 +270,7 @@ async def update_user_partial(
     Частичное изменение данных пользователя
     """
     try:
-        data_user_update = UserUpdatePartialSchemas(**request.json)
+        data_user_update = load_model(request, UserUpdatePartialSchemas)
         user_update = await update_user_db(
             session=db_session,
             id_user=id_user,
@@ -273,6 +290,7 @@ async def update_user_partial(
     except (ErrorInData, ValueError) as exp:
         raise SanicException(f"{exp}", status_code=400)
     else:
+        invalidate_principal(request=request, id_user=id_user)
         return json(
             {
                 "id": user_update.id,
@@ -317,6 +335,7 @@ async def delete_user(
             body=f"User with id {id_user} not found!",
         )
     else:
+        invalidate_principal(request=request, id_user=id_user)
         return json({"result": "Ok"}, status=204)
 
 
@@ -353,13 +372,21 @@ async def delete_user(
     tag="User",
 )
 async def get_list_users(
-    request: Request, db_session: AsyncSession, user: UserSuperSchemas
+    request: Request, db_session: ReadOnlySession, user: UserSuperSchemas
 ) -> HTTPResponse:
     """
-    Получение списка пользователей с их счетами
+    Получение списка пользователей с их счетами (потоковый ответ частями)
     """
-    list_users = await get_users(session=db_session)
-    return json({"users": list_users})
+    response = await request.respond(content_type="application/json")
+    await response.send('{"users":[')
+    separator = ""
+    async for chunk in stream_users(
+        session=db_session, chunk_size=request.app.config.USER_LIST_CHUNK_SIZE
+    ):
+        await response.send(separator + json_dumps(chunk)[1:-1])
+        separator = ","
+    await response.send("]}")
+    await response.eof()
 
 
 @router.get("/me")
@@ -396,6 +423,4 @@ async def get_info_about_me(
     """
     Получение пользователем информации о себе
     """
-    user_data = await get_user_by_id(session=db_session, id_user=user.id)
-
-    return json(UserProtectedSchemas(**user_data.__dict__).model_dump())
+    return json(user.model_dump())
@@ -0,0 +1,154 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+from src.core.exceptions import RateLimitExceeded, ServerOverloaded
+
+
+class Lane(NamedTuple):
+    """
+    Класс маршрутов: приоритет (0 - высший), доля общего лимита
+    одновременных запросов, предельное время ожидания в очереди, сек,
+    и доля лимита, зарезервированная за классом
+    """
+
+    priority: int
+    share: float
+    max_wait: float
+    reserve: float = 0.0
+
+
+class AdmissionController:
+    """
+    Ограничение одновременно обрабатываемых запросов воркера.
+    Запрос сверх лимита ждет в очереди; освободившееся место получает
+    ожидающий запрос с наивысшим приоритетом, а запрос, не дождавшийся
+    места за max_wait своего класса, отклоняется. Классы с долей меньше 1
+    не занимают весь лимит, оставляя место запросам высшего приоритета;
+    незанятый резерв класса не достается остальным классам, сколько бы
+    их ни было
+    """
+
+    def __init__(self, max_in_flight: int, lanes: dict[str, Lane]) -> None:
+        self._max_in_flight = max_in_flight
+        self._lanes = lanes
+        self._limits = {
+            name: max(1, math.ceil(max_in_flight * lane.share))
+            for name, lane in lanes.items()
+        }
+        self._reserved = {
+            name: math.ceil(max_in_flight * lane.reserve)
+            for name, lane in lanes.items()
+            if lane.reserve > 0
+        }
+        self._in_flight = 0
+        self._lane_in_flight = dict.fromkeys(lanes, 0)
+        self._waiters: list[tuple[int, int, str, asyncio.Future]] = list()
+        self._order = itertools.count()
+        self.shed = dict.fromkeys(lanes, 0)
+
+    def _can_admit(self, lane: str) -> bool:
+        if (
+            self._in_flight >= self._max_in_flight
+            or self._lane_in_flight[lane] >= self._limits[lane]
+        ):
+            return False
+        unused_reserve = sum(
+            max(0, reserved - self._lane_in_flight[name])
+            for name, reserved in self._reserved.items()
+            if name != lane
+        )
+        return self._in_flight + unused_reserve < self._max_in_flight
+
+    def _admit(self, lane: str) -> None:
+        self._in_flight += 1
+        self._lane_in_flight[lane] += 1
+
+    async def acquire(self, lane: str) -> None:
+        """
+        Место для запроса класса lane; при ожидании дольше max_wait
+        класса - ServerOverloaded
+        """
+        priority = self._lanes[lane].priority
+        queued_ahead = self._waiters and self._waiters[0][0] <= priority
+        if not queued_ahead and self._can_admit(lane):
+            self._admit(lane)
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._order), lane, waiter)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(
+                asyncio.shield(waiter), timeout=self._lanes[lane].max_wait
+            )
+        except asyncio.TimeoutError:
+            if waiter.done():
+                return
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+            self.shed[lane] += 1
+            raise ServerOverloaded(f"Server is overloaded, {lane} request rejected")
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release(lane)
+            else:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+
+    def release(self, lane: str) -> None:
+        """
+        Освобождение места и передача его ожидающим запросам по приоритету
+        """
+        self._in_flight -= 1
+        self._lane_in_flight[lane] -= 1
+        waiting: list[tuple[int, int, str, asyncio.Future]] = list()
+        while self._waiters and self._in_flight < self._max_in_flight:
+            entry = heapq.heappop(self._waiters)
+            if self._can_admit(entry[2]):
+                self._admit(entry[2])
+                entry[3].set_result(None)
+            else:
+                waiting.append(entry)
+        for entry in waiting:
+            heapq.heappush(self._waiters, entry)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            **{f"shed_{lane}": count for lane, count in self.shed.items()},
+        }
+
+
+class TokenBuckets:
+    """
+    Ограничение частоты запросов по ключу (IP клиента, токен): rate
+    запросов в секунду с запасом burst. Хранятся последние size ключей
+    """
+
+    def __init__(self, rate: float, burst: float, size: int = 100_000) -> None:
+        self._rate = rate
+        self._burst = burst
+        self._size = size
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str) -> None:
+        """
+        Расход одного запроса; RateLimitExceeded с временем до
+        появления следующего, если запас исчерпан
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (self._burst, now))
+        tokens = min(self._burst, tokens + (now - updated) * self._rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            raise RateLimitExceeded((1 - tokens) / self._rate)
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self._size:
+            self._buckets.popitem(last=False)
@@ -0,0 +1,158 @@
+import json
+import struct
+import time
+from typing import Any, Optional
+
+from src.utils.metrics import metrics
+from src.utils.shared_cache import SharedCache, SharedStamps
+
+# Заголовок записи счета: версия (scores.version) и время начала чтения из БД
+_VERSION = struct.Struct("<qd")
+# Заголовок списка счетов: время начала чтения из БД
+_STARTED = struct.Struct("<d")
+
+
+class BalanceCache:
+    """
+    Счета пользователей для /payments/score в общем кеше хоста. Запись
+    счета хранит его версию (scores.version): более старая версия не
+    заменяет более новую, поэтому ни чтение с отстающей реплики, ни
+    запоздавшее обновление не возвращают прежний баланс. Список счетов
+    пользователя хранится отдельно и сбрасывается при появлении нового
+    счета. Записи живут не дольше ttl - на случай изменений, прошедших
+    мимо кеша (другие хосты, изменения в БД вручную).
+
+    Проводка журнала не увеличивает версию счета, поэтому после нее счета
+    пользователя сбрасываются, как в SharedPrincipalCache: время сброса
+    записывается в массив отметок, и запись действительна, только если
+    чтение из БД началось позже сброса
+    """
+
+    def __init__(
+        self, shared: SharedCache, stamps: SharedStamps, ttl: float = 10.0
+    ) -> None:
+        self._shared = shared
+        self._stamps = stamps
+        self._ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _score_key(user_id: int, account_id: int) -> bytes:
+        return b"balance:%d:%d" % (user_id, account_id)
+
+    @staticmethod
+    def _accounts_key(user_id: int) -> bytes:
+        return b"balance-accounts:%d" % user_id
+
+    def _reset_at(self, user_id: int) -> float:
+        return self._stamps.get(user_id % self._stamps.slots)
+
+    def _count(self, hit: bool) -> None:
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        metrics.inc("balance_cache_requests_total", result="hit" if hit else "miss")
+
+    def read_started(self) -> float:
+        """
+        Отметка начала чтения счетов из БД (до запроса): передается в
+        put_scores и update
+        """
+        return time.time()
+
+    def get_scores(self, user_id: int) -> Optional[list[dict[str, Any]]]:
+        """
+        Счета пользователя в порядке создания; None, если в кеше нет
+        списка счетов или хотя бы одного из них
+        """
+        reset_at = self._reset_at(user_id)
+        accounts = self._shared.get(self._accounts_key(user_id))
+        scores: list[dict[str, Any]] = list()
+        if accounts is not None and _STARTED.unpack_from(accounts)[0] > reset_at:
+            for account_id in json.loads(accounts[_STARTED.size :]):
+                value = self._shared.get(self._score_key(user_id, account_id))
+                if value is None or _VERSION.unpack_from(value)[1] <= reset_at:
+                    break
+                scores.append(json.loads(value[_VERSION.size :]))
+            else:
+                self._count(hit=True)
+                return scores
+        self._count(hit=False)
+        return None
+
+    def _put_score(
+        self,
+        user_id: int,
+        score: dict[str, Any],
+        version: int,
+        started: float,
+        block: bool = False,
+    ) -> bool:
+        """
+        Запись счета, если в кеше нет более новой версии (проверка и запись
+        под одной блокировкой общего кеша)
+        """
+        return self._shared.compare_and_put(
+            self._score_key(user_id, score["account_id"]),
+            _VERSION.pack(version, started) + json.dumps(score).encode(),
+            ttl=self._ttl,
+            replace=lambda cached: (
+                cached is None or _VERSION.unpack_from(cached)[0] <= version
+            ),
+            block=block,
+        )
+
+    def put_scores(
+        self, user_id: int, scores: list[tuple[dict[str, Any], int]], started: float
+    ) -> None:
+        """
+        Все счета пользователя, прочитанные из БД: (счет, версия);
+        started - отметка read_started перед чтением
+        """
+        for score, version in scores:
+            self._put_score(user_id, score, version, started)
+        self._shared.put(
+            self._accounts_key(user_id),
+            _STARTED.pack(started)
+            + json.dumps([score["account_id"] for score, _ in scores]).encode(),
+            ttl=self._ttl,
+        )
+
+    def update(
+        self,
+        user_id: int,
+        score: dict[str, Any],
+        version: int,
+        started: Optional[float] = None,
+    ) -> None:
+        """
+        Счет после изменения баланса (сразу после фиксации транзакции;
+        started - отметка read_started перед чтением счета, если он прочитан
+        отдельным запросом). Запись ждет блокировку общего кеша; если счет
+        все же не записан (не помещается в ячейку), прежняя версия удаляется
+        """
+        if started is None:
+            started = self.read_started()
+        key = self._score_key(user_id, score["account_id"])
+        if not self._put_score(user_id, score, version, started, block=True):
+            cached = self._shared.get(key)
+            if cached is None or _VERSION.unpack_from(cached)[0] < version:
+                self._shared.delete(key, block=True)
+        accounts = self._shared.get(self._accounts_key(user_id))
+        if accounts is not None and score["account_id"] not in json.loads(
+            accounts[_STARTED.size :]
+        ):
+            self._shared.delete(self._accounts_key(user_id), block=True)
+
+    def discard(self, user_id: int) -> None:
+        """
+        Сброс счетов пользователя, измененных без увеличения версии
+        (проводки журнала): записи, чтение которых началось до сброса,
+        не возвращаются
+        """
+        self._stamps.advance(user_id % self._stamps.slots, time.time())
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses}
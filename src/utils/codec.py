@@ -0,0 +1,62 @@
+import json as json_lib
+from decimal import Decimal
+from typing import Any, Callable, TypeVar
+
+from pydantic import BaseModel
+from sanic import Request
+from sanic.exceptions import SanicException
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson не установлен
+    orjson = None
+
+M = TypeVar("M", bound=BaseModel)
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return str(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def fast_dumps(obj: Any) -> bytes:
+    """
+    Сериализация ответа: orjson (datetime и UUID поддерживаются нативно,
+    Decimal выводится строкой), без orjson - стандартный json
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default)
+    return json_lib.dumps(obj, default=_default, separators=(",", ":")).encode()
+
+
+fast_loads: Callable[[bytes | str], Any] = (
+    orjson.loads if orjson is not None else json_lib.loads
+)
+
+
+def is_fast_codec(request: Request) -> bool:
+    return request.app.config.FAST_JSON_CODEC
+
+
+def request_loads(request: Request) -> Callable[[bytes | str], Any]:
+    """
+    Функция разбора JSON для тела запроса
+    """
+    return fast_loads if is_fast_codec(request) else json_lib.loads
+
+
+def load_model(request: Request, model: type[M]) -> M:
+    """
+    Валидация тела запроса моделью: при FAST_JSON_CODEC - из тела,
+    разобранного fast_loads, иначе через разобранный request.json.
+    Числа в обоих случаях разбираются как float: model_validate_json
+    превращал бы 100.0 в Decimal("100"), а json - в Decimal("100.0"),
+    и подпись платежа (str(amount)) зависела бы от FAST_JSON_CODEC
+    """
+    try:
+        if is_fast_codec(request):
+            return model.model_validate(fast_loads(request.body))
+        return model(**request.json)
+    except (ValueError, TypeError) as exc:
+        raise SanicException(f"{exc}", status_code=400)
@@ -1,47 +1,125 @@
 import asyncio
-import random
+import logging
+from collections import deque
 
-from sqlalchemy import exists, select
+from sqlalchemy import func, select
 from sqlalchemy.engine import Result
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.payments.models import Score
+from src.core.config import setting_conn
 
+logger = logging.getLogger(__name__)
 
-async def generate_bank_account(prefix: str = "40817", length: int = 20) -> str:
+ACCOUNT_NUMBER_SEQUENCE = "account_number_seq"
+
+
+def luhn_check_digit(digits: str) -> str:
+    """
+    Контрольный разряд номера по алгоритму Луна
+    """
+    total = 0
+    for index, digit in enumerate(reversed(digits)):
+        value = int(digit)
+        if index % 2 == 0:
+            value *= 2
+            if value > 9:
+                value -= 9
+        total += value
+    return str((10 - total % 10) % 10)
+
+
+def format_bank_account(
+    serial: int, prefix: str = "40817", length: int = 20, check_digit: bool = False
+) -> str:
     """
-    Генерирует номер банковского счета.
+    Номер банковского счета из порядкового номера.
 
+    :param serial: Порядковый номер счета (значение последовательности БД).
     :param prefix: Префикс счета (по умолчанию "40817" для рублевых счетов).
     :param length: Общая длина номера счета (по умолчанию 20 символов).
+    :param check_digit: Добавлять контрольный разряд в конец номера.
     :return: Строка с номером счета.
     """
-    unique_part_length = length - len(prefix)
-    unique_part = "".join(
-        [str(random.randint(0, 9)) for _ in range(unique_part_length)]
-    )
-    await asyncio.sleep(0.1)
-    account_number = prefix + unique_part
-
+    width = length - len(prefix) - int(check_digit)
+    if serial >= 10**width:
+        raise OverflowError(
+            "Account number serial %d exceeds %d digits" % (serial, width)
+        )
+    account_number = prefix + str(serial).zfill(width)
+    if check_digit:
+        account_number += luhn_check_digit(account_number)
     return account_number
 
 
-async def bank_account(
-    session: AsyncSession, prefix: str = "40817", length: int = 20
-) -> str:
+class AccountNumberAllocator:
     """
-    Генерирует уникального номер банковского счета.
+    Выдача уникальных номеров счетов.
+
+    Порядковые номера резервируются в последовательности БД блоками по
+    block_size одним запросом и выдаются из памяти воркера, поэтому создание
+    счета не требует проверки номера в БД. Неиспользованные номера блока
+    после перезапуска воркера пропускаются
     """
-    account_number = await generate_bank_account(prefix=prefix, length=length)
 
-    stmt = select(exists().where(Score.account_number == account_number))
-    res: Result = await session.execute(stmt)
-    is_exists: bool = res.scalar()
+    def __init__(
+        self,
+        prefix: str = "40817",
+        length: int = 20,
+        block_size: int = 100,
+        check_digit: bool = False,
+    ) -> None:
+        self._prefix = prefix
+        self._length = length
+        self._block_size = block_size
+        self._check_digit = check_digit
+        self._serials: deque[int] = deque()
+        self._lock = asyncio.Lock()
 
-    while is_exists:
-        account_number = await generate_bank_account(prefix=prefix, length=length)
-        stmt = select(exists().where(Score.account_number == account_number))
-        res: Result = await session.execute(stmt)
-        is_exists: bool = res.scalar()
+    async def _reserve(self, session: AsyncSession, count: int) -> None:
+        stmt = select(func.nextval(ACCOUNT_NUMBER_SEQUENCE)).select_from(
+            func.generate_series(1, count)
+        )
+        result: Result = await session.execute(stmt)
+        self._serials.extend(result.scalars())
+        logger.info("Reserved %d account numbers", count)
 
-    return account_number
+    async def allocate_many(self, session: AsyncSession, count: int) -> list[str]:
+        """
+        Выдача count номеров счетов
+        """
+        if len(self._serials) < count:
+            async with self._lock:
+                while len(self._serials) < count:
+                    await self._reserve(
+                        session=session,
+                        count=max(self._block_size, count - len(self._serials)),
+                    )
+        return [
+            format_bank_account(
+                serial=self._serials.popleft(),
+                prefix=self._prefix,
+                length=self._length,
+                check_digit=self._check_digit,
+            )
+            for _ in range(count)
+        ]
+
+    async def allocate(self, session: AsyncSession) -> str:
+        """
+        Выдача номера счета
+        """
+        account_numbers = await self.allocate_many(session=session, count=1)
+        return account_numbers[0]
+
+
+account_allocator = AccountNumberAllocator(
+    block_size=setting_conn.ACCOUNT_NUMBER_BLOCK_SIZE,
+    check_digit=setting_conn.ACCOUNT_NUMBER_CHECK_DIGIT,
+)
+
+
+async def bank_account(session: AsyncSession) -> str:
+    """
+    Генерирует уникального номер банковского счета.
+    """
+    return await account_allocator.allocate(session=session)
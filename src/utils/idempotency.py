@@ -0,0 +1,70 @@
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from src.utils.shared_cache import SharedCache
+
+
+class IdempotencyFilter:
+    """
+    Фильтр уже проведенных платежей в памяти воркера.
+
+    LRU хранит точные transaction_id последних проведенных платежей: повтор
+    такого платежа отклоняется без обращения к БД. Отсутствие платежа в
+    фильтре ничего не доказывает (его мог провести другой воркер или хост),
+    поэтому новый платеж всегда проверяется в БД.
+
+    С общим кешем хоста (shared) проведенные платежи запоминаются и в нем
+    на shared_ttl сек, и повтор отклоняется, каким бы воркером ни был
+    проведен платеж
+    """
+
+    def __init__(
+        self,
+        lru_size: int = 100_000,
+        shared: Optional[SharedCache] = None,
+        shared_ttl: float = 86400.0,
+    ) -> None:
+        self._lru_size = lru_size
+        self._shared = shared
+        self._shared_ttl = shared_ttl
+        self._recent: OrderedDict[uuid.UUID, None] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def seen(self, transaction_id: uuid.UUID) -> bool:
+        """
+        Платеж точно проведен (найден в LRU или общем кеше хоста)
+        """
+        if transaction_id in self._recent:
+            self._recent.move_to_end(transaction_id)
+            self.hits += 1
+            return True
+        if (
+            self._shared is not None
+            and self._shared.get(b"transaction:" + transaction_id.bytes) is not None
+        ):
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, transaction_id: uuid.UUID) -> None:
+        """
+        Запоминание проведенного платежа (после фиксации транзакции)
+        """
+        self._recent[transaction_id] = None
+        self._recent.move_to_end(transaction_id)
+        if self._shared is not None:
+            self._shared.put(
+                b"transaction:" + transaction_id.bytes, b"", ttl=self._shared_ttl
+            )
+        if len(self._recent) > self._lru_size:
+            self._recent.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._recent),
+        }
@@ -0,0 +1,269 @@
+import asyncio
+import fcntl
+import logging
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from src.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentJournal:
+    """
+    Журнал поступивших платежей: append-only файл, по одной записи в строке.
+    Записи сбрасываются на диск (fsync) группами, обработанная часть журнала
+    отмечается смещением в файле контрольной точки. Записи, которые не удается
+    провести, переносятся в файл отклоненных записей (<name>.dead).
+
+    Владелец журнала держит на файле журнала блокировку (flock) до закрытия:
+    по ней drain_orphaned_journals отличает журналы, оставшиеся без владельца
+    """
+
+    def __init__(
+        self,
+        directory: Path,
+        name: str,
+        fsync_interval: float = 0.005,
+        batch_size: int = 500,
+        poll_interval: float = 0.05,
+        max_attempts: int = 3,
+        wait: bool = True,
+    ) -> None:
+        """
+        wait=False - не ждать освобождения журнала другим владельцем,
+        а сразу вызвать BlockingIOError
+        """
+        directory.mkdir(parents=True, exist_ok=True)
+        self._path: Path = directory / f"{name}.log"
+        self._checkpoint_path: Path = directory / f"{name}.offset"
+        self._dead_path: Path = directory / f"{name}.dead"
+        self._fsync_interval = fsync_interval
+        self._batch_size = batch_size
+        self._poll_interval = poll_interval
+        self._max_attempts = max_attempts
+        self._pending: list[tuple[bytes, asyncio.Future]] = list()
+        self._flush_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        self._file = open(self._path, "ab")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | (0 if wait else fcntl.LOCK_NB))
+        except OSError:
+            self._file.close()
+            raise
+
+    async def append(self, record: bytes) -> None:
+        """
+        Добавление записи, возвращает управление после записи на диск
+        """
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._pending.append((record, future))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush(delay=True))
+        await future
+
+    async def _flush(self, delay: bool = False) -> None:
+        if delay:
+            await asyncio.sleep(self._fsync_interval)
+        async with self._lock:
+            pending, self._pending = self._pending, list()
+            self._flush_task = None
+            if not pending:
+                return
+            data = b"".join(record + b"\n" for record, _ in pending)
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._write, data
+                )
+            except OSError as exc:
+                logger.error("Journal write failed: %s", exc)
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+        for _, future in pending:
+            if not future.done():
+                future.set_result(None)
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def read_checkpoint(self) -> int:
+        """
+        Смещение первой необработанной записи
+        """
+        try:
+            offset = int(self._checkpoint_path.read_text())
+        except (FileNotFoundError, ValueError):
+            return 0
+        if offset > self._path.stat().st_size:
+            return 0
+        return offset
+
+    def write_checkpoint(self, offset: int) -> None:
+        tmp_path = self._checkpoint_path.with_suffix(".tmp")
+        with open(tmp_path, "w") as file:
+            file.write(str(offset))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, self._checkpoint_path)
+
+    def read(self, offset: int) -> tuple[list[bytes], int]:
+        """
+        Чтение до batch_size полных записей начиная со смещения,
+        возвращает записи и смещение следующей записи
+        """
+        records: list[bytes] = list()
+        with open(self._path, "rb") as file:
+            file.seek(offset)
+            while len(records) < self._batch_size:
+                line = file.readline()
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                if line.strip():
+                    records.append(line.rstrip(b"\n"))
+        return records, offset
+
+    def write_dead_letters(self, records: list[bytes]) -> None:
+        with open(self._dead_path, "ab") as file:
+            file.write(b"".join(record + b"\n" for record in records))
+            file.flush()
+            os.fsync(file.fileno())
+
+    async def _isolate(
+        self,
+        handler: Callable[[list[bytes]], Awaitable[None]],
+        records: list[bytes],
+        is_transient: Callable[[Exception], bool],
+    ) -> list[bytes]:
+        """
+        Проведение пакета частями (делением пополам), возвращает записи,
+        которые не удалось провести по отдельности. Временная ошибка
+        прерывает деление: пакет будет повторен целиком
+        """
+        try:
+            await handler(records)
+            return list()
+        except Exception as exc:
+            if is_transient(exc):
+                raise
+            if len(records) == 1:
+                logger.error("Journal record rejected: %s: %r", exc, records[0][:200])
+                return records
+        middle = len(records) // 2
+        return await self._isolate(
+            handler, records[:middle], is_transient
+        ) + await self._isolate(handler, records[middle:], is_transient)
+
+    async def _truncate_if_drained(self, offset: int) -> int:
+        async with self._lock:
+            if offset == 0 or self._pending or self._file.tell() != offset:
+                return offset
+            self.write_checkpoint(0)
+            self._file.truncate(0)
+            self._file.seek(0)
+        return 0
+
+    async def _apply(
+        self,
+        handler: Callable[[list[bytes]], Awaitable[None]],
+        records: list[bytes],
+        is_transient: Callable[[Exception], bool],
+        attempt: int,
+    ) -> None:
+        """
+        Проведение пакета. После max_attempts неудачных попыток пакет
+        проводится частями, а не проведенные записи переносятся в файл
+        отклоненных записей
+        """
+        if attempt < self._max_attempts:
+            await handler(records)
+            return
+        rejected = await self._isolate(handler, records, is_transient)
+        if rejected:
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.write_dead_letters, rejected
+            )
+            metrics.inc("webhook_journal_dead_letters_total", len(rejected))
+            logger.error(
+                "%d journal records moved to %s", len(rejected), self._dead_path
+            )
+
+    async def drain(
+        self,
+        handler: Callable[[list[bytes]], Awaitable[None]],
+        is_transient: Callable[[Exception], bool] = lambda exc: False,
+        until_empty: bool = False,
+    ) -> None:
+        """
+        Передача записей журнала обработчику пакетами, начиная с контрольной точки.
+        При ошибке обработчика пакет повторяется; временные ошибки (is_transient)
+        не учитываются в числе попыток. until_empty - завершиться, когда
+        необработанных записей не останется
+        """
+        loop = asyncio.get_running_loop()
+        offset = self.read_checkpoint()
+        logger.info("Start draining journal %s from offset %d", self._path, offset)
+        attempt = 0
+        while True:
+            records, next_offset = await loop.run_in_executor(None, self.read, offset)
+            if not records:
+                offset = await self._truncate_if_drained(next_offset)
+                if until_empty:
+                    return
+                await asyncio.sleep(self._poll_interval)
+                continue
+            try:
+                await self._apply(handler, records, is_transient, attempt)
+            except Exception as exc:
+                if is_transient(exc):
+                    logger.warning("Journal batch failed, retrying: %s", exc)
+                else:
+                    attempt += 1
+                    logger.exception("Journal batch failed (attempt %d)", attempt)
+                await asyncio.sleep(self._poll_interval)
+                continue
+            attempt = 0
+            offset = next_offset
+            await loop.run_in_executor(None, self.write_checkpoint, offset)
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            await self._flush_task
+        await self._flush()
+        self._file.close()
+
+
+async def drain_orphaned_journals(
+    directory: Path,
+    owner: str,
+    handler: Callable[[list[bytes]], Awaitable[None]],
+    is_transient: Callable[[Exception], bool] = lambda exc: False,
+    **options,
+) -> list[str]:
+    """
+    Проведение журналов без владельца: после смены числа или имен воркеров
+    записи их прежних журналов дальше контрольной точки иначе не проводятся.
+    Журналы, заблокированные работающим воркером, пропускаются. Возвращает
+    имена проведенных журналов
+    """
+    drained: list[str] = list()
+    for path in sorted(directory.glob("*.log")):
+        if path.stem == owner:
+            continue
+        try:
+            journal = PaymentJournal(directory, path.stem, wait=False, **options)
+        except BlockingIOError:
+            continue
+        try:
+            if journal.read(journal.read_checkpoint())[0]:
+                logger.info("Draining orphaned journal %s", path)
+                await journal.drain(handler, is_transient, until_empty=True)
+                drained.append(path.stem)
+        finally:
+            await journal.close()
+    return drained
@@ -1,21 +1,91 @@
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Callable, Optional, TypeVar
 
 import bcrypt
 import jwt
 
 from src.core.config import setting, setting_conn
+from src.core.exceptions import PasswordHasherBusy
+
+T = TypeVar("T")
+
+
+class PasswordHasher:
+    """
+    Хеширование и проверка паролей bcrypt в пуле потоков воркера.
+
+    bcrypt освобождает GIL, поэтому вычисления не блокируют цикл событий.
+    Количество ожидающих пула операций ограничено queue_limit: при
+    переполнении очереди запрос отклоняется, а не задерживает остальные
+    """
+
+    def __init__(self, workers: int = 2, queue_limit: int = 64, rounds: int = 12):
+        self._workers = workers
+        self._queue_limit = queue_limit
+        self._rounds = rounds
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+        self.rejected = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        Количество операций, ожидающих свободного потока
+        """
+        return max(0, self._in_flight - self._workers)
+
+    async def _run(self, func: Callable[..., T], *args) -> T:
+        if self.queue_depth >= self._queue_limit:
+            self.rejected += 1
+            raise PasswordHasherBusy("Too many password requests, try again later")
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._workers, thread_name_prefix="bcrypt"
+            )
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, func, *args
+            )
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> bytes:
+        salt = bcrypt.gensalt(rounds=self._rounds)
+        return await self._run(bcrypt.hashpw, password.encode(), salt)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(
+            bcrypt.checkpw, password.encode(), hashed_password.encode()
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "rejected": self.rejected,
+        }
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=setting_conn.PASSWORD_HASH_WORKERS,
+    queue_limit=setting_conn.PASSWORD_HASH_QUEUE_LIMIT,
+    rounds=setting_conn.PASSWORD_BCRYPT_ROUNDS,
+)
 
 
 async def create_hash_password(password: str) -> bytes:
     """
     Создание хеш пароля
     """
-    salt = bcrypt.gensalt()
-    pwd_bytes: bytes = password.encode()
-    await asyncio.sleep(0)
-    return bcrypt.hashpw(pwd_bytes, salt)
+    return await password_hasher.hash(password)
 
 
 async def validate_password(
@@ -25,10 +95,8 @@ async def validate_password(
     """
     Проверка валидности пароля. Сверяет пароль с хеш-значением правильного пароля
     """
-    await asyncio.sleep(0)
-    return bcrypt.checkpw(
-        password=password.encode(),
-        hashed_password=hashed_password.encode(),
+    return await password_hasher.verify(
+        password=password, hashed_password=hashed_password
     )
 
 
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.payments.crud import compact_ledger
+
+if TYPE_CHECKING:
+    from src.core.database import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+
+async def compact_once(db: "DatabaseConnection", batch_size: int) -> int:
+    """
+    Перенос одной порции проводок в отдельной транзакции
+    """
+    async with db.create_session() as session:
+        moved = await compact_ledger(session=session, limit=batch_size)
+        await session.commit()
+    return moved
+
+
+async def run_ledger_compactor(
+    db: "DatabaseConnection",
+    interval: float = 1.0,
+    batch_size: int = 5000,
+    until_empty: bool = False,
+) -> None:
+    """
+    Фоновый перенос проводок журнала в балансы счетов. Полная порция
+    переносится без паузы, при until_empty задача завершается, когда
+    проводок не осталось. Воркеры выбирают разные проводки (SKIP LOCKED)
+    """
+    while True:
+        try:
+            moved = await compact_once(db=db, batch_size=batch_size)
+        except (OSError, SQLAlchemyError) as exc:
+            logger.error("Ledger compaction failed: %s", exc)
+            await asyncio.sleep(interval)
+            continue
+        if moved:
+            logger.info("Compacted %d ledger entries", moved)
+        if moved < batch_size:
+            if until_empty:
+                return
+            await asyncio.sleep(interval)
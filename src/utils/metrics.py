@@ -0,0 +1,304 @@
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+from sqlalchemy import Engine, event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограмм длительности, сек
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# Границы корзин количества запросов к БД за один HTTP-запрос
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Метка маршрута для запросов к БД вне HTTP-запроса (фоновые задачи)
+BACKGROUND_ROUTE = "background"
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """
+    Метрики воркера: счетчики, показатели и гистограммы с метками.
+    Снимки метрик всех воркеров суммируются и выводятся в текстовом
+    формате Prometheus
+    """
+
+    def __init__(self) -> None:
+        self._meta: dict[str, tuple[str, str, tuple]] = dict()
+        self._values: dict[str, dict[Labels, Any]] = dict()
+        self._collectors: list[Callable[[], None]] = list()
+
+    def _describe(self, name: str, kind: str, help: str, buckets: tuple = ()) -> None:
+        self._meta[name] = (kind, help, buckets)
+        self._values[name] = dict()
+
+    def counter(self, name: str, help: str) -> None:
+        self._describe(name, "counter", help)
+
+    def gauge(self, name: str, help: str) -> None:
+        self._describe(name, "gauge", help)
+
+    def histogram(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS) -> None:
+        self._describe(name, "histogram", help, buckets)
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """
+        Функция, обновляющая показатели перед снятием снимка
+        """
+        self._collectors.append(collector)
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        series = self._values[name]
+        key = tuple(sorted(labels.items()))
+        series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        self._values[name][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        """
+        Значение гистограммы: счетчики корзин (последняя - +Inf) и сумма
+        """
+        buckets = self._meta[name][2]
+        series = self._values[name]
+        key = tuple(sorted(labels.items()))
+        state = series.get(key)
+        if state is None:
+            state = series[key] = [0] * (len(buckets) + 1) + [0.0]
+        state[bisect_left(buckets, value)] += 1
+        state[-1] += value
+
+    def snapshot(self) -> dict[str, list]:
+        for collector in self._collectors:
+            collector()
+        return {
+            name: [[list(labels), value] for labels, value in series.items()]
+            for name, series in self._values.items()
+        }
+
+    def merge(self, snapshots: list[dict[str, list]]) -> dict[str, dict[Labels, Any]]:
+        """
+        Сумма снимков воркеров по каждой метрике и набору меток
+        """
+        merged: dict[str, dict[Labels, Any]] = {name: dict() for name in self._meta}
+        for snapshot in snapshots:
+            for name, series in snapshot.items():
+                if name not in merged:
+                    continue
+                for labels, value in series:
+                    key = tuple(tuple(pair) for pair in labels)
+                    current = merged[name].get(key)
+                    if current is None:
+                        merged[name][key] = value
+                    elif isinstance(value, list):
+                        merged[name][key] = [a + b for a, b in zip(current, value)]
+                    else:
+                        merged[name][key] = current + value
+        return merged
+
+    def render(self, values: dict[str, dict[Labels, Any]]) -> str:
+        """
+        Текстовый формат Prometheus (text exposition format 0.0.4)
+        """
+        lines: list[str] = list()
+        for name, (kind, help, buckets) in self._meta.items():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(values.get(name, {}).items()):
+                if kind != "histogram":
+                    lines.append(f"{name}{format_labels(labels)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip((*buckets, "+Inf"), value[:-1]):
+                    cumulative += count
+                    le = format_labels((*labels, ("le", str(bound))))
+                    lines.append(f"{name}_bucket{le} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {value[-1]}")
+                lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+def write_snapshot(registry: MetricsRegistry, directory: Path, worker: str) -> None:
+    """
+    Запись снимка метрик воркера (с заменой файла целиком)
+    """
+    path = directory / f"{worker}.json"
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps(registry.snapshot()))
+    os.replace(temporary, path)
+
+
+def read_snapshots(directory: Path) -> list[dict[str, list]]:
+    snapshots: list[dict[str, list]] = list()
+    for path in directory.glob("*.json"):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError) as exc:
+            logger.warning("Skip metrics snapshot %s: %s", path, exc)
+    return snapshots
+
+
+def clear_snapshots(directory: Path) -> None:
+    directory.mkdir(parents=True, exist_ok=True)
+    for path in directory.glob("*.json"):
+        path.unlink(missing_ok=True)
+
+
+metrics = MetricsRegistry()
+metrics.histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP-запроса (для потоковых ответов - до начала ответа)",
+)
+metrics.histogram(
+    "http_request_db_queries",
+    "Количество запросов к БД за один HTTP-запрос",
+    QUERY_COUNT_BUCKETS,
+)
+metrics.histogram("db_query_duration_seconds", "Длительность запроса к БД")
+metrics.histogram(
+    "db_pool_checkout_wait_seconds",
+    "Получение соединения из пула БД (ожидание и установка нового соединения)",
+)
+metrics.gauge("db_pool_checked_out", "Соединения пула БД, выданные сессиям")
+metrics.counter("webhook_payments_total", "Результаты обработки платежей webhook")
+metrics.counter(
+    "webhook_journal_dead_letters_total",
+    "Записи журнала асинхронного приема, перенесенные в файл отклоненных записей",
+)
+metrics.counter(
+    "balance_update_conflicts_total",
+    "Конфликты при пакетном проведении платежей (version, deadlock, serialization)",
+)
+metrics.counter(
+    "balance_update_retries_total",
+    "Повторы пакетного проведения после конфликта (lock - с блокировкой счетов)",
+)
+metrics.counter(
+    "balance_cache_requests_total",
+    "Чтения счетов /payments/score из кеша (hit) и из БД (miss)",
+)
+metrics.counter(
+    "http_requests_rejected_total",
+    "Запросы, отклоненные контролем нагрузки (overloaded - 503, rate_limited - 429)",
+)
+metrics.gauge(
+    "password_hash_queue_depth", "Операции bcrypt, ожидающие свободного потока"
+)
+metrics.counter(
+    "password_hash_rejected_total",
+    "Операции bcrypt, отклоненные из-за переполнения очереди",
+)
+
+
+class RequestMetrics:
+    """
+    Метрики обрабатываемого HTTP-запроса
+    """
+
+    __slots__ = ("route", "started", "queries")
+
+    def __init__(self, route: str) -> None:
+        self.route = route
+        self.started = time.perf_counter()
+        self.queries = 0
+
+
+_request_metrics: ContextVar[Optional[RequestMetrics]] = ContextVar(
+    "request_metrics", default=None
+)
+
+
+def start_request(route: str) -> RequestMetrics:
+    request_metrics = RequestMetrics(route)
+    _request_metrics.set(request_metrics)
+    return request_metrics
+
+
+def finish_request(request_metrics: RequestMetrics, method: str, status: int) -> None:
+    metrics.observe(
+        "http_request_duration_seconds",
+        time.perf_counter() - request_metrics.started,
+        route=request_metrics.route,
+        method=method,
+        status=str(status),
+    )
+    metrics.observe(
+        "http_request_db_queries", request_metrics.queries, route=request_metrics.route
+    )
+
+
+def count_webhook(result: str, count: int = 1) -> None:
+    """
+    Результат обработки платежа: ok, bad_signature, invalid, duplicate,
+    user_not_found, insufficient_funds
+    """
+    metrics.inc("webhook_payments_total", count, result=result)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    request_metrics = _request_metrics.get()
+    if request_metrics is not None:
+        request_metrics.queries += 1
+    metrics.observe(
+        "db_query_duration_seconds",
+        time.perf_counter() - context.metrics_started,
+        route=request_metrics.route if request_metrics else BACKGROUND_ROUTE,
+    )
+
+
+def instrument_engine(engine: Engine) -> None:
+    """
+    Замер длительности и количества запросов к БД (события SQLAlchemy)
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений с замером ожидания свободного соединения
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.observe(
+                "db_pool_checkout_wait_seconds", time.perf_counter() - started
+            )
@@ -0,0 +1,33 @@
+import asyncio
+import logging
+from typing import TYPE_CHECKING
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.payments.crud import create_payments_partitions
+
+if TYPE_CHECKING:
+    from src.core.database import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+
+async def run_partition_maintenance(
+    db: "DatabaseConnection", months_ahead: int = 3, interval: float = 3600.0
+) -> None:
+    """
+    Фоновое создание месячных секций payments на months_ahead месяцев вперед.
+    Старые секции отсоединяются вручную (DETACH PARTITION ... CONCURRENTLY)
+    """
+    while True:
+        try:
+            async with db.create_session() as session:
+                created = await create_payments_partitions(
+                    session=session, months_ahead=months_ahead
+                )
+                await session.commit()
+            if created:
+                logger.info("Created %d payments partitions", created)
+        except (OSError, SQLAlchemyError) as exc:
+            logger.error("Payments partition maintenance failed: %s", exc)
+        await asyncio.sleep(interval)
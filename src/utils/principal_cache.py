@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import struct
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+import asyncpg
+
+from src.users.schemas import UserSuperSchemas
+from src.utils.shared_cache import SharedCache, SharedStamps
+
+if TYPE_CHECKING:
+    from src.core.database import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+# Канал PostgreSQL NOTIFY с id измененных и удаленных пользователей
+PRINCIPAL_INVALIDATE_CHANNEL = "principal_invalidate"
+
+
+class PrincipalCache:
+    """
+    Кеш авторизованных пользователей воркера: (sub, exp) токена -> данные
+    пользователя. Записи живут не дольше ttl и срока действия токена,
+    при переполнении вытесняются давно не использованные. Изменение или
+    удаление пользователя удаляет все его записи, а данные, прочитанные
+    из БД до сброса (version), в кеш не записываются
+    """
+
+    def __init__(self, size: int = 10_000, ttl: float = 60.0) -> None:
+        self._size = size
+        self._ttl = ttl
+        self._entries: OrderedDict[tuple[int, int], tuple[float, UserSuperSchemas]] = (
+            OrderedDict()
+        )
+        self._user_entries: dict[int, set[int]] = dict()
+        # Номер сброса: увеличивается при каждом сбросе пользователя или кеша.
+        # Для последних size сброшенных пользователей хранится номер сброса,
+        # более ранние учитываются в _floor вместе с очисткой кеша
+        self._generation = 0
+        self._invalidated: OrderedDict[int, int] = OrderedDict()
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _remove(self, key: tuple[int, int]) -> None:
+        del self._entries[key]
+        exps = self._user_entries[key[0]]
+        exps.discard(key[1])
+        if not exps:
+            del self._user_entries[key[0]]
+
+    def get(self, user_id: int, exp: int) -> Optional[UserSuperSchemas]:
+        key = (user_id, exp)
+        entry = self._entries.get(key)
+        if entry is not None:
+            deadline, principal = entry
+            if deadline > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return principal
+            self._remove(key)
+        self.misses += 1
+        return None
+
+    def version(self, user_id: int) -> float:
+        """
+        Версия данных пользователя, читается до запроса к БД и передается в put
+        """
+        return self._generation
+
+    def put(
+        self, user_id: int, exp: int, principal: UserSuperSchemas, version: float
+    ) -> None:
+        if version < max(self._floor, self._invalidated.get(user_id, 0)):
+            return
+        lifetime = min(self._ttl, exp - time.time())
+        if lifetime <= 0:
+            return
+        key = (user_id, exp)
+        self._entries[key] = (time.monotonic() + lifetime, principal)
+        self._entries.move_to_end(key)
+        self._user_entries.setdefault(user_id, set()).add(exp)
+        if len(self._entries) > self._size:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, user_id: int) -> None:
+        """
+        Сброс всех записей пользователя
+        """
+        self._generation += 1
+        self._invalidated[user_id] = self._generation
+        self._invalidated.move_to_end(user_id)
+        if len(self._invalidated) > self._size:
+            _, generation = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, generation)
+        for exp in self._user_entries.pop(user_id, ()):
+            del self._entries[(user_id, exp)]
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._floor = self._generation
+        self._entries.clear()
+        self._user_entries.clear()
+        self._invalidated.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+_TIMESTAMP = struct.Struct("<d")
+
+
+class SharedPrincipalCache(PrincipalCache):
+    """
+    Кеш авторизованных пользователей, общий для воркеров хоста (в SharedCache).
+    Вместо счетчика версий сброс записывает время сброса пользователя или
+    всего кеша в отдельный массив отметок (SharedStamps, без вытеснения):
+    запись действительна, если данные прочитаны из БД позже сброса. Ячейка
+    отметки общая для пользователей с одинаковым остатком id, поэтому сброс
+    одного может отменить записи другого, но не наоборот
+    """
+
+    # Ячейка отметки очистки всего кеша, остальные - сбросы пользователей
+    CLEARED_INDEX = 0
+
+    def __init__(
+        self, shared: SharedCache, stamps: SharedStamps, ttl: float = 60.0
+    ) -> None:
+        super().__init__(size=0, ttl=ttl)
+        self._shared = shared
+        self._stamps = stamps
+
+    def _reset_at(self, user_id: int) -> float:
+        return max(
+            self._stamps.get(self.CLEARED_INDEX),
+            self._stamps.get(1 + user_id % (self._stamps.slots - 1)),
+        )
+
+    def get(self, user_id: int, exp: int) -> Optional[UserSuperSchemas]:
+        value = self._shared.get(b"principal:%d:%d" % (user_id, exp))
+        if value is not None:
+            saved_at = _TIMESTAMP.unpack_from(value)[0]
+            if saved_at > self._reset_at(user_id):
+                self.hits += 1
+                return UserSuperSchemas.model_validate_json(value[_TIMESTAMP.size :])
+        self.misses += 1
+        return None
+
+    def version(self, user_id: int) -> float:
+        return time.time()
+
+    def put(
+        self, user_id: int, exp: int, principal: UserSuperSchemas, version: float
+    ) -> None:
+        if version <= self._reset_at(user_id):
+            return
+        self._shared.put(
+            b"principal:%d:%d" % (user_id, exp),
+            _TIMESTAMP.pack(version) + principal.model_dump_json().encode(),
+            ttl=min(self._ttl, exp - time.time()),
+        )
+
+    def invalidate(self, user_id: int) -> None:
+        self._stamps.advance(1 + user_id % (self._stamps.slots - 1), time.time())
+
+    def clear(self) -> None:
+        self._stamps.advance(self.CLEARED_INDEX, time.time())
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, **self._shared.stats()}
+
+
+async def listen_invalidations(
+    db: "DatabaseConnection", cache: PrincipalCache, retry_interval: float = 1.0
+) -> None:
+    """
+    Получение уведомлений об изменении пользователей от всех воркеров.
+    На время потери соединения уведомления могут быть пропущены,
+    поэтому после переподключения кеш очищается
+    """
+
+    def on_notify(connection, pid, channel, payload: str) -> None:
+        cache.invalidate(int(payload))
+
+    while True:
+        connection = None
+        try:
+            closed = asyncio.Event()
+            connection = await db.listen(PRINCIPAL_INVALIDATE_CHANNEL, on_notify)
+            connection.add_termination_listener(lambda _: closed.set())
+            cache.clear()
+            await closed.wait()
+            logger.warning("Principal invalidation connection lost")
+        except (OSError, asyncpg.PostgresError) as exc:
+            logger.error("Principal invalidation listener failed: %s", exc)
+        finally:
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        cache.clear()
+        await asyncio.sleep(retry_interval)
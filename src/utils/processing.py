@@ -1,31 +1,58 @@
 import asyncio
 import decimal
-import hashlib
 import logging
+import random
 import uuid
+from collections import defaultdict
 from typing import Optional
 
-from sqlalchemy import and_, select
-from sqlalchemy.engine import Result
+from sqlalchemy import NUMERIC, Integer, column, select, tuple_, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Result, Row
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.core.config import configure_logging, setting_conn
+from src.core.database import db_error_code
 from src.core.exceptions import (
     ErrorInData,
     PaymentProcessed,
+    ScoreVersionConflict,
 )
-from src.users.models import User
-from src.utils.create_account_number import bank_account
-from src.payments.models import Payment, Score
+from src.payments.crud import (
+    PAYMENT_APPLIED,
+    PAYMENT_DUPLICATE,
+    PAYMENT_INSUFFICIENT_FUNDS,
+    PAYMENT_USER_NOT_FOUND,
+    apply_payment,
+    refresh_balances,
+)
+from src.payments.models import Payment, ProcessedTransaction, Score
 from src.payments.schemas import (
     PaymentGenerateBaseSchemas,
     PaymentGenerateOutSchemas,
     TransactionInSchemas,
+    score_to_dict,
 )
+from src.users.models import User
+from src.utils.balance_cache import BalanceCache
+from src.utils.create_account_number import account_allocator
+from src.utils.idempotency import IdempotencyFilter
+from src.utils.metrics import count_webhook, metrics
+from src.utils.signature import signature_engine
+from src.utils.uuid7 import uuid7
 
-configure_logging(logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Попытки пакетного проведения без блокировки счетов (с проверкой версии);
+# после них счета блокируются до конца транзакции и конфликт невозможен
+BATCH_OPTIMISTIC_ATTEMPTS = 3
+# Задержка перед повтором после конфликта, сек: случайная, до
+# BATCH_RETRY_DELAY * 2 ** номер попытки
+BATCH_RETRY_DELAY = 0.005
+# Ошибки БД, после которых пакет повторяется как после конфликта версий
+# (транзакция уже отменена сервером)
+BATCH_RETRY_SQLSTATES = {"40P01": "deadlock", "40001": "serialization"}
+
 
 async def generate_payments(
     data_request: PaymentGenerateBaseSchemas,
@@ -36,15 +63,13 @@ async def generate_payments(
     if data_request.transaction_id:
         transaction_id = data_request.transaction_id
     else:
-        transaction_id = str(uuid.uuid4())
-    payload = (
-        str(data_request.account_id)
-        + str(data_request.amount)
-        + transaction_id
-        + str(data_request.user_id)
-        + setting_conn.SECRET_KEY
-    )
-    signature = hashlib.sha256(payload.encode()).hexdigest()
+        transaction_id = str(uuid7())
+    signature = signature_engine.sign(
+        account_id=data_request.account_id,
+        amount=data_request.amount,
+        transaction_id=transaction_id,
+        user_id=data_request.user_id,
+    )
     await asyncio.sleep(0)
 
     result = PaymentGenerateOutSchemas(
@@ -58,81 +83,586 @@ async def generate_payments(
     return result
 
 
+def update_balance_cache(
+    cache: BalanceCache,
+    user_id: int,
+    status: int,
+    score: Optional[Row],
+    ledger: bool,
+) -> None:
+    """
+    Запись в кеш счета, возвращенного apply_payment (после фиксации
+    транзакции; при недостатке средств на новый счет счет создается с
+    нулевым балансом). Проводка журнала не увеличивает версию счета,
+    поэтому после нее счета пользователя в кеше сбрасываются
+    """
+    if score is not None:
+        cache.update(user_id, score_to_dict(score), score.version)
+    elif ledger and status in (PAYMENT_APPLIED, PAYMENT_INSUFFICIENT_FUNDS):
+        cache.discard(user_id)
+
+
 async def process_transaction(
-    session: AsyncSession, data_request: TransactionInSchemas
+    session: AsyncSession,
+    data_request: TransactionInSchemas,
+    idempotency: Optional[IdempotencyFilter] = None,
+    ledger: bool = False,
+    balance_cache: Optional[BalanceCache] = None,
 ) -> None:
     """
     Обработка поступившего платежа
     """
-    data: PaymentGenerateBaseSchemas = PaymentGenerateBaseSchemas(
-        **data_request.model_dump()
-    )
-    data_generate: PaymentGenerateOutSchemas = await generate_payments(
-        data_request=data
-    )
-
-    if data_request.signature != data_generate.signature:
+    if not signature_engine.verify(
+        account_id=data_request.account_id,
+        amount=data_request.amount,
+        transaction_id=data_request.transaction_id,
+        user_id=data_request.user_id,
+        signature=data_request.signature,
+    ):
+        count_webhook("bad_signature")
         raise ErrorInData("Error signature")
 
-    account_id = data.account_id
-    user_id = data.user_id
-    transaction_id = data.transaction_id
-    amount = decimal.Decimal(data.amount)
+    account_id = data_request.account_id
+    user_id = data_request.user_id
+    transaction_id = data_request.transaction_id
+    amount = decimal.Decimal(data_request.amount)
 
-    logger.info("Start transaction with id %s" % transaction_id)
+    try:
+        transaction_uuid = uuid.UUID(transaction_id)
+    except ValueError:
+        count_webhook("invalid")
+        raise ErrorInData(f"Invalid transaction id {transaction_id}")
 
-    stmt = select(Payment).filter(Payment.transaction_id == transaction_id)
-    result: Result = await session.execute(stmt)
-    payment: Payment = result.scalars().first()
-    if payment:
-        logger.info("The payment #%s is processed" % transaction_id)
+    if idempotency is not None and idempotency.seen(transaction_uuid):
+        logger.info("The payment #%s is processed", transaction_id)
+        count_webhook("duplicate")
         raise PaymentProcessed(f"The payment #{transaction_id} is processed")
 
-    user: Optional[User] = await session.get(User, user_id)
-    if user is None:
+    logger.info("Start transaction with id %s", transaction_id)
+
+    status, score = await apply_payment(
+        session=session,
+        transaction_id=transaction_uuid,
+        user_id=user_id,
+        account_id=account_id,
+        amount=amount,
+        ledger=ledger,
+    )
+    await session.commit()
+
+    if idempotency is not None and status in (PAYMENT_APPLIED, PAYMENT_DUPLICATE):
+        idempotency.add(transaction_uuid)
+    if balance_cache is not None:
+        update_balance_cache(
+            cache=balance_cache,
+            user_id=user_id,
+            status=status,
+            score=score,
+            ledger=ledger,
+        )
+
+    if status == PAYMENT_DUPLICATE:
+        logger.info("The payment #%s is processed", transaction_id)
+        count_webhook("duplicate")
+        raise PaymentProcessed(f"The payment #{transaction_id} is processed")
+    if status == PAYMENT_USER_NOT_FOUND:
+        count_webhook("user_not_found")
         raise PaymentProcessed(f"User by id: #{user_id} not found")
+    if status == PAYMENT_INSUFFICIENT_FUNDS:
+        count_webhook("insufficient_funds")
+        raise PaymentProcessed("insufficient funds")
+    count_webhook("ok")
+
+    logger.info("The score #%s for the user with id:%s change", account_id, user_id)
+
 
-    stmt = select(Score).filter(
-        and_(
-            Score.account_id == account_id,
-            Score.user_id == user_id,
+def is_processed(idempotency: Optional[IdempotencyFilter], transaction_id: str) -> bool:
+    """
+    Платеж уже проведен воркером (проверка без обращения к БД)
+    """
+    if idempotency is None:
+        return False
+    try:
+        return idempotency.seen(uuid.UUID(transaction_id))
+    except ValueError:
+        return False
+
+
+def batch_error(item: TransactionInSchemas, error: str, outcome: str) -> dict[str, str]:
+    """
+    Результат обработки платежа из пакета с ошибкой (outcome - метка метрики)
+    """
+    count_webhook(outcome)
+    return {"transaction_id": item.transaction_id, "result": "error", "error": error}
+
+
+def check_batch(
+    data_requests: list[TransactionInSchemas],
+    results: list[dict[str, str]],
+    idempotency: Optional[IdempotencyFilter] = None,
+) -> dict[uuid.UUID, int]:
+    """
+    Проверка подписей и повторов внутри пакета и среди недавно проведенных.
+    Возвращает принятые платежи: transaction_id -> индекс в пакете
+    """
+    verified: list[bool] = signature_engine.verify_batch(
+        (
+            item.account_id,
+            item.amount,
+            item.transaction_id,
+            item.user_id,
+            item.signature,
+        )
+        for item in data_requests
+    )
+    accepted: dict[uuid.UUID, int] = dict()
+    for index, item in enumerate(data_requests):
+        if not verified[index]:
+            results[index] = batch_error(item, "Error signature", "bad_signature")
+            continue
+        try:
+            transaction_uuid = uuid.UUID(item.transaction_id)
+        except ValueError:
+            results[index] = batch_error(
+                item, f"Invalid transaction id {item.transaction_id}", "invalid"
+            )
+            continue
+        if transaction_uuid in accepted or (
+            idempotency is not None and idempotency.seen(transaction_uuid)
+        ):
+            results[index] = batch_error(
+                item, f"The payment #{item.transaction_id} is processed", "duplicate"
+            )
+            continue
+        accepted[transaction_uuid] = index
+    return accepted
+
+
+async def read_scores(
+    session: AsyncSession, keys: set[tuple[int, int]], lock: bool = False
+) -> dict[tuple[int, int], tuple[int, decimal.Decimal, int]]:
+    """
+    Счета (account_id, user_id): id, доступный баланс (с учетом резерва
+    журнала проводок) и версия. С lock - с блокировкой до конца транзакции
+    """
+    stmt = (
+        select(
+            Score.account_id,
+            Score.user_id,
+            Score.id,
+            Score.balance + Score.reserved,
+            Score.version,
         )
+        .where(tuple_(Score.account_id, Score.user_id).in_(keys))
+        .order_by(Score.id)
     )
+    if lock:
+        stmt = stmt.with_for_update()
     result: Result = await session.execute(stmt)
-    scores: Score = result.scalars().first()
+    return {
+        (account_id, user_id): (score_id, balance, version)
+        for account_id, user_id, score_id, balance, version in result.all()
+    }
 
-    if scores is None:
-        logger.info(
-            "The score #%s was not found for the user with id:%s"
-            % (account_id, user_id)
+
+async def read_or_create_scores(
+    session: AsyncSession, keys: set[tuple[int, int]], lock: bool = False
+) -> dict[tuple[int, int], tuple[int, decimal.Decimal, int]]:
+    """
+    Чтение счетов с созданием отсутствующих одним запросом
+    """
+    scores = await read_scores(session=session, keys=keys, lock=lock)
+    missing = keys - scores.keys()
+    if not missing:
+        return scores
+
+    logger.info("Create %d new scores", len(missing))
+    account_numbers: list[str] = await account_allocator.allocate_many(
+        session=session, count=len(missing)
+    )
+    stmt = insert(Score).values(
+        [
+            {
+                "account_id": account_id,
+                "user_id": user_id,
+                "account_number": account_number,
+            }
+            for (account_id, user_id), account_number in zip(missing, account_numbers)
+        ]
+    )
+    await session.execute(stmt.on_conflict_do_nothing())
+    return await read_scores(session=session, keys=keys, lock=lock)
+
+
+async def insert_payments(
+    session: AsyncSession, payments: list[dict]
+) -> set[uuid.UUID]:
+    """
+    Запись платежей одним запросом, возвращает transaction_id записанных
+    (уже существующие платежи пропускаются)
+    """
+    if not payments:
+        return set()
+    stmt = (
+        insert(Payment)
+        .values(payments)
+        .on_conflict_do_nothing()
+        .returning(Payment.transaction_id)
+    )
+    result: Result = await session.execute(stmt)
+    return set(result.scalars())
+
+
+async def add_scores_deltas(
+    session: AsyncSession,
+    deltas: dict[int, decimal.Decimal],
+    versions: dict[int, int],
+) -> None:
+    """
+    Изменение балансов счетов на суммы платежей (score id -> сумма) одним
+    запросом, если версия счета не изменилась с чтения (versions) и баланс
+    остается неотрицательным; иначе - ScoreVersionConflict
+    """
+    if not deltas:
+        return
+    scores = Score.__table__
+    changes = values(
+        column("score_id", Integer),
+        column("version", Integer),
+        column("delta", NUMERIC(15, 2)),
+        name="changes",
+    ).data(
+        # порядок блокировки счетов - по id, как при чтении с блокировкой
+        [
+            (score_id, versions[score_id], deltas[score_id])
+            for score_id in sorted(deltas)
+        ]
+    )
+    stmt = (
+        update(scores)
+        .where(
+            scores.c.id == changes.c.score_id,
+            scores.c.version == changes.c.version,
+            scores.c.balance + scores.c.reserved + changes.c.delta >= 0,
         )
-        new_account_number = await bank_account(session=session)
-        scores: Score = Score(
-            account_number=new_account_number,
-            user=user,
-            account_id=account_id,
-            balance=decimal.Decimal(0.0),
+        .values(balance=scores.c.balance + changes.c.delta)
+        .returning(scores.c.id)
+    )
+    result: Result = await session.execute(stmt)
+    updated = len(result.all())
+    if updated != len(deltas):
+        raise ScoreVersionConflict(
+            f"{len(deltas) - updated} of {len(deltas)} scores changed concurrently"
         )
-        session.add(scores)
-        await session.commit()
-        await session.flush()
 
-        logger.info(
-            "The score #%s for the user with id:%s created" % (account_id, user_id)
+
+async def reject_known(
+    session: AsyncSession,
+    data_requests: list[TransactionInSchemas],
+    accepted: dict[uuid.UUID, int],
+    results: list[dict[str, str]],
+) -> set[uuid.UUID]:
+    """
+    Отклонение уже проведенных платежей и платежей несуществующих пользователей
+    (по одному запросу к БД), возвращает transaction_id уже проведенных
+    """
+    user_ids = {data_requests[index].user_id for index in accepted.values()}
+    result: Result = await session.execute(select(User.id).where(User.id.in_(user_ids)))
+    existing_users: set[int] = set(result.scalars())
+
+    result: Result = await session.execute(
+        select(ProcessedTransaction.transaction_id).where(
+            ProcessedTransaction.transaction_id.in_(accepted)
         )
+    )
+    processed: set[uuid.UUID] = set(result.scalars())
 
-    if float(amount) < 0 and (scores.balance < abs(amount)):
-        raise PaymentProcessed("insufficient funds")
+    for transaction_uuid, index in list(accepted.items()):
+        item = data_requests[index]
+        if transaction_uuid in processed:
+            error = f"The payment #{item.transaction_id} is processed"
+            outcome = "duplicate"
+        elif item.user_id not in existing_users:
+            error = f"User by id: #{item.user_id} not found"
+            outcome = "user_not_found"
+        else:
+            continue
+        results[index] = batch_error(item, error, outcome)
+        del accepted[transaction_uuid]
 
-    async with session.begin_nested():
-        logger.info(f"float(amount) {float(amount)}  {float(amount) < 0}")
-        scores.balance += decimal.Decimal(amount)
-        payment: Payment = Payment(
-            transaction_id=transaction_id,
-            amount=amount,
-            user_id=user_id,
-            account_id=scores.account_id,
+    return processed
+
+
+def plan_payments(
+    data_requests: list[TransactionInSchemas],
+    accepted: dict[uuid.UUID, int],
+    scores: dict[tuple[int, int], tuple[int, decimal.Decimal, int]],
+) -> tuple[list[dict], set[int]]:
+    """
+    Проверка достаточности средств в порядке поступления платежей,
+    возвращает платежи для записи в БД и индексы платежей, для которых
+    недостаточно средств
+    """
+    balances = {key: balance for key, (_, balance, _) in scores.items()}
+    new_payments: list[dict] = list()
+    insufficient: set[int] = set()
+    for transaction_uuid, index in accepted.items():
+        item = data_requests[index]
+        key = (item.account_id, item.user_id)
+        amount = decimal.Decimal(item.amount)
+        if amount < 0 and balances[key] < abs(amount):
+            insufficient.add(index)
+            continue
+        balances[key] += amount
+        new_payments.append(
+            {
+                "transaction_id": transaction_uuid,
+                "amount": amount,
+                "user_id": item.user_id,
+                "account_id": item.account_id,
+            }
+        )
+    return new_payments, insufficient
+
+
+async def apply_batch_payments(
+    session: AsyncSession,
+    data_requests: list[TransactionInSchemas],
+    accepted: dict[uuid.UUID, int],
+    lock: bool = False,
+) -> tuple[set[uuid.UUID], set[int]]:
+    """
+    Проверка средств, запись платежей и изменение балансов в текущей
+    транзакции. Возвращает записанные платежи и индексы платежей, для
+    которых недостаточно средств. Без lock счета читаются без блокировки,
+    и при их изменении другим запросом - ScoreVersionConflict
+    """
+    keys = {
+        (data_requests[index].account_id, data_requests[index].user_id)
+        for index in accepted.values()
+    }
+    scores = await read_or_create_scores(session=session, keys=keys, lock=lock)
+    new_payments, insufficient = plan_payments(
+        data_requests=data_requests, accepted=accepted, scores=scores
+    )
+    inserted: set[uuid.UUID] = await insert_payments(
+        session=session, payments=new_payments
+    )
+
+    deltas: dict[int, decimal.Decimal] = defaultdict(decimal.Decimal)
+    for payment in new_payments:
+        if payment["transaction_id"] in inserted:
+            item = data_requests[accepted[payment["transaction_id"]]]
+            score_id, _, _ = scores[(item.account_id, item.user_id)]
+            deltas[score_id] += payment["amount"]
+    await add_scores_deltas(
+        session=session,
+        deltas=deltas,
+        versions={score_id: version for score_id, _, version in scores.values()},
+    )
+    return inserted, insufficient
+
+
+async def apply_ledger_payments(
+    session: AsyncSession,
+    data_requests: list[TransactionInSchemas],
+    accepted: dict[uuid.UUID, int],
+) -> tuple[set[uuid.UUID], set[int]]:
+    """
+    Проведение пакета через журнал проводок (WEBHOOK_LEDGER_MODE): функцией
+    apply_payment_ledger для каждого платежа в порядке поступления, как
+    в /webhook. Счета создаются и блокируются заранее в порядке id, как
+    при переносе проводок, поэтому пакеты и перенос не блокируют друг друга
+    взаимно. Возвращает записанные платежи и индексы платежей, для которых
+    недостаточно средств
+    """
+    keys = {
+        (data_requests[index].account_id, data_requests[index].user_id)
+        for index in accepted.values()
+    }
+    await read_or_create_scores(session=session, keys=keys, lock=True)
+    inserted: set[uuid.UUID] = set()
+    insufficient: set[int] = set()
+    for transaction_uuid, index in accepted.items():
+        item = data_requests[index]
+        status, _ = await apply_payment(
+            session=session,
+            transaction_id=transaction_uuid,
+            user_id=item.user_id,
+            account_id=item.account_id,
+            amount=decimal.Decimal(item.amount),
+            ledger=True,
         )
-        session.add(payment)
+        if status == PAYMENT_APPLIED:
+            inserted.add(transaction_uuid)
+        elif status == PAYMENT_INSUFFICIENT_FUNDS:
+            insufficient.add(index)
+    return inserted, insufficient
+
+
+def batch_conflict_reason(exc: Exception) -> Optional[str]:
+    """
+    Причина конфликта, после которого пакет можно повторить
+    (None - ошибка не связана с параллельными изменениями счетов)
+    """
+    if isinstance(exc, ScoreVersionConflict):
+        return "version"
+    if isinstance(exc, DBAPIError):
+        return BATCH_RETRY_SQLSTATES.get(db_error_code(exc))
+    return None
+
+
+async def apply_batch_payments_with_retry(
+    session: AsyncSession,
+    data_requests: list[TransactionInSchemas],
+    accepted: dict[uuid.UUID, int],
+) -> tuple[set[uuid.UUID], set[int]]:
+    """
+    Проведение без блокировки счетов с повтором после конфликта версий,
+    deadlock или serialization failure (откат транзакции и случайная
+    задержка), последняя попытка - с блокировкой
+    """
+    for attempt in range(BATCH_OPTIMISTIC_ATTEMPTS):
+        try:
+            return await apply_batch_payments(
+                session=session, data_requests=data_requests, accepted=accepted
+            )
+        except (ScoreVersionConflict, DBAPIError) as exc:
+            reason = batch_conflict_reason(exc)
+            if reason is None:
+                raise
+            await session.rollback()
+            mode = "lock" if attempt + 1 == BATCH_OPTIMISTIC_ATTEMPTS else "optimistic"
+            metrics.inc("balance_update_conflicts_total", reason=reason)
+            metrics.inc("balance_update_retries_total", mode=mode)
+            logger.info("Batch retry %d (%s): %s", attempt + 1, mode, exc)
+            await asyncio.sleep(random.uniform(0, BATCH_RETRY_DELAY * 2**attempt))
+    return await apply_batch_payments(
+        session=session, data_requests=data_requests, accepted=accepted, lock=True
+    )
+
+
+async def refresh_batch_balances(
+    session: AsyncSession,
+    data_requests: list[TransactionInSchemas],
+    accepted: dict[uuid.UUID, int],
+    balance_cache: Optional[BalanceCache],
+    ledger: bool = False,
+) -> None:
+    """
+    Обновление кеша счетов, затронутых пакетом (после фиксации транзакции).
+    Проводки журнала не увеличивают версию счета, поэтому в этом режиме
+    счета пользователей в кеше сбрасываются
+    """
+    if balance_cache is None:
+        return
+    if ledger:
+        for user_id in {data_requests[index].user_id for index in accepted.values()}:
+            balance_cache.discard(user_id)
+        return
+    await refresh_balances(
+        session=session,
+        cache=balance_cache,
+        keys={
+            (data_requests[index].account_id, data_requests[index].user_id)
+            for index in accepted.values()
+        },
+    )
+
+
+async def process_transactions_batch(
+    session: AsyncSession,
+    data_requests: list[TransactionInSchemas],
+    idempotency: Optional[IdempotencyFilter] = None,
+    balance_cache: Optional[BalanceCache] = None,
+    ledger: bool = False,
+) -> list[dict[str, str]]:
+    """
+    Пакетная обработка поступивших платежей в одной транзакции БД
+    (в режиме журнала проводок - через apply_payment_ledger).
+    Возвращает результат обработки для каждого платежа в порядке поступления
+    """
+    logger.info("Start batch of %d transactions", len(data_requests))
+
+    results: list[dict[str, str]] = [
+        {"transaction_id": item.transaction_id, "result": "ok"}
+        for item in data_requests
+    ]
+    accepted: dict[uuid.UUID, int] = check_batch(data_requests, results, idempotency)
+    if not accepted:
+        return results
+
+    processed: set[uuid.UUID] = await reject_known(
+        session=session,
+        data_requests=data_requests,
+        accepted=accepted,
+        results=results,
+    )
+    if idempotency is not None:
+        for transaction_uuid in processed:
+            idempotency.add(transaction_uuid)
+
+    if not accepted:
+        return results
+
+    apply = apply_ledger_payments if ledger else apply_batch_payments_with_retry
+    inserted, insufficient = await apply(
+        session=session, data_requests=data_requests, accepted=accepted
+    )
     await session.commit()
-    logger.info("The score #%s for the user with id:%s change" % (account_id, user_id))
+
+    for transaction_uuid, index in accepted.items():
+        item = data_requests[index]
+        if index in insufficient:
+            results[index] = batch_error(
+                item, "insufficient funds", "insufficient_funds"
+            )
+        elif transaction_uuid not in inserted:
+            # платеж параллельно проведен другим запросом
+            results[index] = batch_error(
+                item, f"The payment #{item.transaction_id} is processed", "duplicate"
+            )
+    count_webhook("ok", len(inserted))
+
+    if idempotency is not None:
+        for transaction_uuid in inserted:
+            idempotency.add(transaction_uuid)
+    await refresh_batch_balances(
+        session=session,
+        data_requests=data_requests,
+        accepted=accepted,
+        balance_cache=balance_cache,
+        ledger=ledger,
+    )
+    logger.info("Batch of %d transactions processed", len(data_requests))
+
+    return results
+
+
+async def process_journal_records(
+    session: AsyncSession,
+    records: list[bytes],
+    idempotency: Optional[IdempotencyFilter] = None,
+    balance_cache: Optional[BalanceCache] = None,
+    ledger: bool = False,
+) -> None:
+    """
+    Проведение пакета платежей из журнала (асинхронный режим приема)
+    """
+    data_requests: list[TransactionInSchemas] = [
+        TransactionInSchemas.model_validate_json(record) for record in records
+    ]
+    results = await process_transactions_batch(
+        session=session,
+        data_requests=data_requests,
+        idempotency=idempotency,
+        balance_cache=balance_cache,
+        ledger=ledger,
+    )
+    for result in results:
+        if result["result"] != "ok":
+            logger.info(
+                "Journal payment #%s rejected: %s",
+                result["transaction_id"],
+                result["error"],
+            )
@@ -0,0 +1,258 @@
+import hashlib
+import struct
+import time
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Iterator, Optional
+
+# Заголовок ячейки: версия (нечетная - идет запись), хеш ключа (0 - ячейка
+# свободна), срок действия (time.time()), длина ключа, длина значения
+SLOT_HEADER = struct.Struct("<QQdHI")
+SLOT_VERSION = struct.Struct("<Q")
+
+# Попытки чтения ячейки, которую в этот момент изменяет другой процесс
+READ_RETRIES = 3
+
+
+def key_hash(key: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little") | 1
+
+
+def create_shared_memory(slots: int, slot_size: int) -> SharedMemory:
+    """
+    Блок разделяемой памяти под таблицу (создается главным процессом)
+    """
+    return SharedMemory(create=True, size=slots * slot_size)
+
+
+class SharedCache:
+    """
+    Хеш-таблица фиксированного размера в разделяемой памяти, общая для
+    воркеров хоста. Ячейки одинакового размера, ключ ищется в probe ячейках
+    подряд; при отсутствии свободной вытесняется запись с ближайшим сроком
+    действия. Запись выполняется под межпроцессной блокировкой, чтение -
+    без нее: версия ячейки увеличивается до и после записи, и чтение,
+    заставшее запись, повторяется
+    """
+
+    def __init__(
+        self,
+        memory: SharedMemory,
+        lock: Any,
+        slots: int,
+        slot_size: int = 512,
+        probe: int = 8,
+        lock_timeout: float = 0.05,
+    ) -> None:
+        if memory.size < slots * slot_size:
+            raise ValueError("Shared memory block is smaller than the table")
+        self._memory = memory
+        self._buffer = memory.buf
+        self._lock = lock
+        self._slots = slots
+        self._slot_size = slot_size
+        self._capacity = slot_size - SLOT_HEADER.size
+        self._probe = min(probe, slots)
+        self._lock_timeout = lock_timeout
+        self.hits = 0
+        self.misses = 0
+        self.skipped_writes = 0
+
+    def _window(self, hashed: int) -> Iterator[int]:
+        start = hashed % self._slots
+        for step in range(self._probe):
+            yield ((start + step) % self._slots) * self._slot_size
+
+    def _read(self, offset: int, hashed: int, key: bytes) -> Optional[bytes]:
+        """
+        Значение ячейки с ключом key; None - ячейка занята другим ключом
+        или изменялась на всех попытках чтения
+        """
+        buffer = self._buffer
+        for _ in range(READ_RETRIES):
+            version, slot_hash, expires, key_len, value_len = SLOT_HEADER.unpack_from(
+                buffer, offset
+            )
+            if version & 1:
+                continue
+            if slot_hash != hashed:
+                return None
+            if key_len + value_len > self._capacity:
+                continue
+            start = offset + SLOT_HEADER.size
+            data = bytes(buffer[start : start + key_len + value_len])
+            if SLOT_VERSION.unpack_from(buffer, offset)[0] != version:
+                continue
+            if data[:key_len] != key or expires <= time.time():
+                return None
+            return data[key_len:]
+        return None
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        hashed = key_hash(key)
+        for offset in self._window(hashed):
+            value = self._read(offset, hashed, key)
+            if value is not None:
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def _find_slot(self, hashed: int, key: bytes, now: float) -> tuple[int, bool]:
+        """
+        Ячейка для записи (под блокировкой): с тем же ключом, иначе
+        свободная или просроченная, иначе с ближайшим сроком действия.
+        Второе значение - найдена ячейка с этим ключом
+        """
+        buffer = self._buffer
+        free: Optional[int] = None
+        victim, victim_expires = 0, float("inf")
+        for offset in self._window(hashed):
+            _, slot_hash, expires, key_len, _ = SLOT_HEADER.unpack_from(buffer, offset)
+            if slot_hash == hashed:
+                start = offset + SLOT_HEADER.size
+                if bytes(buffer[start : start + key_len]) == key:
+                    return offset, True
+            if slot_hash == 0 or expires <= now:
+                if free is None:
+                    free = offset
+            elif expires < victim_expires:
+                victim, victim_expires = offset, expires
+        return (free if free is not None else victim), False
+
+    def _write(
+        self, offset: int, hashed: int, expires: float, key: bytes, value: bytes
+    ) -> None:
+        buffer = self._buffer
+        version = SLOT_VERSION.unpack_from(buffer, offset)[0]
+        SLOT_VERSION.pack_into(buffer, offset, version + 1)
+        start = offset + SLOT_HEADER.size
+        buffer[start : start + len(key) + len(value)] = key + value
+        SLOT_HEADER.pack_into(
+            buffer, offset, version + 1, hashed, expires, len(key), len(value)
+        )
+        SLOT_VERSION.pack_into(buffer, offset, version + 2)
+
+    def _acquire(self, block: bool) -> bool:
+        if block:
+            return self._lock.acquire()
+        return self._lock.acquire(timeout=self._lock_timeout)
+
+    def _value_at(self, offset: int, now: float) -> Optional[bytes]:
+        """
+        Значение ячейки с найденным ключом (под блокировкой); None - срок
+        действия истек
+        """
+        _, _, expires, key_len, value_len = SLOT_HEADER.unpack_from(
+            self._buffer, offset
+        )
+        if expires <= now:
+            return None
+        start = offset + SLOT_HEADER.size + key_len
+        return bytes(self._buffer[start : start + value_len])
+
+    def compare_and_put(
+        self,
+        key: bytes,
+        value: bytes,
+        ttl: float,
+        replace: Callable[[Optional[bytes]], bool],
+        block: bool = False,
+    ) -> bool:
+        """
+        Запись значения на ttl сек., если replace(текущее значение) истинно;
+        проверка и запись выполняются под одной блокировкой. Значение, не
+        помещающееся в ячейку, и запись при занятой дольше lock_timeout
+        блокировке (если не block) пропускаются
+        """
+        if len(key) + len(value) > self._capacity or ttl <= 0:
+            self.skipped_writes += 1
+            return False
+        hashed = key_hash(key)
+        if not self._acquire(block):
+            self.skipped_writes += 1
+            return False
+        try:
+            now = time.time()
+            offset, found = self._find_slot(hashed, key, now)
+            if not replace(self._value_at(offset, now) if found else None):
+                return False
+            self._write(offset, hashed, now + ttl, key, value)
+        finally:
+            self._lock.release()
+        return True
+
+    def put(self, key: bytes, value: bytes, ttl: float) -> bool:
+        """
+        Запись значения на ttl сек. Значение, не помещающееся в ячейку,
+        и запись при занятой дольше lock_timeout блокировке пропускаются
+        """
+        return self.compare_and_put(key, value, ttl, replace=lambda current: True)
+
+    def delete(self, key: bytes, block: bool = False) -> None:
+        hashed = key_hash(key)
+        if not self._acquire(block):
+            self.skipped_writes += 1
+            return
+        try:
+            offset, found = self._find_slot(hashed, key, time.time())
+            if found:
+                self._write(offset, 0, 0.0, b"", b"")
+        finally:
+            self._lock.release()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped_writes": self.skipped_writes,
+            "slots": self._slots,
+        }
+
+
+# Ячейка отметок времени: версия (нечетная - идет запись) и время
+STAMP_SLOT = struct.Struct("<Qd")
+
+
+class SharedStamps:
+    """
+    Массив отметок времени в разделяемой памяти (например, времени сброса
+    кеша пользователя): ячейка по индексу, без вытеснения. Значение ячейки
+    только увеличивается, запись ждет межпроцессную блокировку, а не
+    пропускается. Чтение без блокировки, как в SharedCache; чтение, не
+    получившее целого значения, возвращает inf
+    """
+
+    def __init__(self, memory: SharedMemory, lock: Any, slots: int) -> None:
+        if memory.size < slots * STAMP_SLOT.size:
+            raise ValueError("Shared memory block is smaller than the stamps")
+        self._memory = memory
+        self._buffer = memory.buf
+        self._lock = lock
+        self._slots = slots
+
+    @property
+    def slots(self) -> int:
+        return self._slots
+
+    def get(self, index: int) -> float:
+        offset = index * STAMP_SLOT.size
+        for _ in range(READ_RETRIES):
+            version, stamp = STAMP_SLOT.unpack_from(self._buffer, offset)
+            if version & 1:
+                continue
+            if SLOT_VERSION.unpack_from(self._buffer, offset)[0] == version:
+                return stamp
+        return float("inf")
+
+    def advance(self, index: int, stamp: float) -> None:
+        """
+        Запись отметки, если она позже текущей
+        """
+        offset = index * STAMP_SLOT.size
+        with self._lock:
+            version, current = STAMP_SLOT.unpack_from(self._buffer, offset)
+            if stamp <= current:
+                return
+            SLOT_VERSION.pack_into(self._buffer, offset, version + 1)
+            STAMP_SLOT.pack_into(self._buffer, offset, version + 1, stamp)
+            SLOT_VERSION.pack_into(self._buffer, offset, version + 2)
@@ -0,0 +1,91 @@
+import hashlib
+import hmac
+from decimal import Decimal
+from typing import Iterable, Optional
+
+from src.core.config import setting_conn
+
+
+def payment_message(
+    account_id: int, amount: Decimal, transaction_id: str, user_id: int
+) -> bytes:
+    """
+    Подписываемое сообщение: реквизиты платежа через разделитель
+    """
+    return f"{account_id}|{amount}|{transaction_id}|{user_id}".encode()
+
+
+def legacy_payment_message(
+    account_id: int, amount: Decimal, transaction_id: str, user_id: int
+) -> bytes:
+    """
+    Сообщение прежнего формата подписи sha256(реквизиты + ключ)
+    """
+    return f"{account_id}{amount}{transaction_id}{user_id}".encode()
+
+
+class SignatureEngine:
+    """
+    Подпись платежей HMAC-SHA256.
+
+    Состояние HMAC для каждого ключа вычисляется один раз и копируется для
+    каждого сообщения. Подписывает первый (текущий) ключ, проверка выполняется
+    всеми активными ключами, что позволяет менять ключ без остановки приема.
+    Сравнение подписей выполняется за постоянное время
+    """
+
+    def __init__(self, keys: list[str], legacy_key: Optional[str] = None) -> None:
+        if not keys:
+            raise ValueError("At least one signature key is required")
+        self._states = [
+            hmac.new(key.encode(), digestmod=hashlib.sha256) for key in keys
+        ]
+        self._legacy_key: Optional[bytes] = legacy_key.encode() if legacy_key else None
+
+    def sign(
+        self, account_id: int, amount: Decimal, transaction_id: str, user_id: int
+    ) -> str:
+        message = payment_message(account_id, amount, transaction_id, user_id)
+        state = self._states[0].copy()
+        state.update(message)
+        return state.hexdigest()
+
+    def verify(
+        self,
+        account_id: int,
+        amount: Decimal,
+        transaction_id: str,
+        user_id: int,
+        signature: str,
+    ) -> bool:
+        signature_bytes = signature.encode()
+        message = payment_message(account_id, amount, transaction_id, user_id)
+        for key_state in self._states:
+            state = key_state.copy()
+            state.update(message)
+            if hmac.compare_digest(state.hexdigest().encode(), signature_bytes):
+                return True
+
+        if self._legacy_key is not None:
+            legacy = hashlib.sha256(
+                legacy_payment_message(account_id, amount, transaction_id, user_id)
+                + self._legacy_key
+            ).hexdigest()
+            return hmac.compare_digest(legacy.encode(), signature_bytes)
+        return False
+
+    def verify_batch(
+        self, items: Iterable[tuple[int, Decimal, str, int, str]]
+    ) -> list[bool]:
+        """
+        Проверка подписей пакета: (account_id, amount, transaction_id, user_id, signature)
+        """
+        return [self.verify(*item) for item in items]
+
+
+signature_engine = SignatureEngine(
+    keys=[setting_conn.SECRET_KEY, *setting_conn.SIGNATURE_PREVIOUS_KEYS],
+    legacy_key=(
+        setting_conn.SECRET_KEY if setting_conn.SIGNATURE_ACCEPT_LEGACY else None
+    ),
+)
@@ -0,0 +1,118 @@
+import logging
+import random
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import Engine, event
+
+logger = logging.getLogger(__name__)
+
+# Заголовок ответа со сводкой запросов к БД
+SQL_PROFILE_HEADER = "X-SQL-Profile"
+
+# Списки параметров переменной длины (IN ($1, $2, ...)) сворачиваются,
+# чтобы запросы одной формы с разным количеством значений совпадали
+_PARAMS_LIST = re.compile(r"\$\d+(?:\s*,\s*\$\d+)+")
+_SPACES = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Форма запроса: текст без различий в пробелах и длине списков параметров
+    """
+    return _PARAMS_LIST.sub("$n, ...", _SPACES.sub(" ", statement).strip())
+
+
+class QueryProfile:
+    """
+    Запросы к БД, выполненные при обработке HTTP-запроса:
+    форма запроса, длительность и количество строк
+    """
+
+    __slots__ = ("route", "queries")
+
+    def __init__(self, route: str) -> None:
+        self.route = route
+        self.queries: list[tuple[str, float, int]] = list()
+
+    def add(self, statement: str, duration: float, rows: int) -> None:
+        self.queries.append((statement_shape(statement), duration, rows))
+
+    @property
+    def duration(self) -> float:
+        return sum(duration for _, duration, _ in self.queries)
+
+    def repeated(self, threshold: int = 2) -> dict[str, int]:
+        """
+        Формы запросов, выполненных не менее threshold раз (признак N+1)
+        """
+        counts = Counter(shape for shape, _, _ in self.queries)
+        return {shape: count for shape, count in counts.items() if count >= threshold}
+
+    def summary(self, threshold: int = 2) -> str:
+        return "queries=%d; time_ms=%.2f; repeated=%d" % (
+            len(self.queries),
+            self.duration * 1000,
+            len(self.repeated(threshold)),
+        )
+
+    def report(self, threshold: int = 2) -> str:
+        """
+        Подробный отчет для журнала: запросы по порядку, повторы отмечены
+        """
+        repeated = self.repeated(threshold)
+        lines = ["SQL profile %s: %s" % (self.route, self.summary(threshold))]
+        for shape, duration, rows in self.queries:
+            lines.append(
+                "  %s %8.2f ms %6d rows  %s"
+                % ("N+1" if shape in repeated else "   ", duration * 1000, rows, shape)
+            )
+        return "\n".join(lines)
+
+
+_query_profile: ContextVar[Optional[QueryProfile]] = ContextVar(
+    "query_profile", default=None
+)
+
+
+def start_profile(route: str) -> QueryProfile:
+    profile = QueryProfile(route)
+    _query_profile.set(profile)
+    return profile
+
+
+def finish_profile(
+    profile: QueryProfile, headers, threshold: int, sample_rate: float
+) -> None:
+    """
+    Сводка в заголовок ответа; подробный отчет в журнал для доли запросов
+    sample_rate, в которых есть запросы к БД
+    """
+    headers[SQL_PROFILE_HEADER] = profile.summary(threshold)
+    if profile.queries and random.random() < sample_rate:
+        logger.info(profile.report(threshold))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _query_profile.get()
+    if profile is not None:
+        profile.add(
+            statement,
+            time.perf_counter() - context.profile_started,
+            cursor.rowcount,
+        )
+
+
+def profile_engine(engine: Engine) -> None:
+    """
+    Сбор запросов к БД в профиль текущего HTTP-запроса (события SQLAlchemy)
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,49 @@
+import secrets
+import threading
+import time
+import uuid
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+# Максимальное значение 12-битного счетчика в пределах миллисекунды
+_COUNTER_MAX = 0xFFF
+
+
+def uuid7() -> uuid.UUID:
+    """
+    UUID версии 7 (RFC 9562): 48 бит времени Unix в мс, 12-битный счетчик
+    и 62 случайных бита. Идентификаторы процесса строго возрастают, в том числе
+    в пределах одной мс и при переводе системных часов назад, поэтому новые
+    записи добавляются в конец индекса B-tree
+    """
+    global _last_ms, _counter
+    with _lock:
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > _last_ms:
+            _last_ms = now_ms
+            # старший бит счетчика свободен для переполнения в пределах мс
+            _counter = secrets.randbits(11)
+        else:
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                _last_ms += 1
+                _counter = 0
+        timestamp, counter = _last_ms, _counter
+
+    value = (
+        (timestamp << 80)
+        | (0x7 << 76)
+        | (counter << 64)
+        | (0b10 << 62)
+        | secrets.randbits(62)
+    )
+    return uuid.UUID(int=value)
+
+
+def uuid7_timestamp(value: uuid.UUID) -> float:
+    """
+    Время создания UUIDv7 (секунды Unix)
+    """
+    return (value.int >> 80) / 1000
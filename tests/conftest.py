@@ -45,10 +45,7 @@ def event_loop(request) -> Generator[asyncio.AbstractEventLoop, None, None]:
 async def app(test_config):
     _app = WebhookApp("TestWebhookApp", test_mode=True)
     _app.update_config(test_config)
-
-    @_app.before_server_start
-    async def setup_db(app, _):
-        _app.setup_db(test_config)
+    _app.setup_db(test_config)
 
     yield _app
 
@@ -0,0 +1,19 @@
+import pytest
+
+from src.utils.create_account_number import format_bank_account, luhn_check_digit
+
+
+def test_format_bank_account():
+    assert format_bank_account(serial=42) == "40817000000000000042"
+    assert len(format_bank_account(serial=10**15 - 1)) == 20
+    with pytest.raises(OverflowError):
+        format_bank_account(serial=10**15)
+
+
+def test_format_bank_account_check_digit():
+    account_number = format_bank_account(serial=42, check_digit=True)
+
+    assert len(account_number) == 20
+    assert account_number[:-1] == "4081700000000000042"
+    assert account_number[-1] == luhn_check_digit(account_number[:-1])
+    assert luhn_check_digit("7992739871") == "3"
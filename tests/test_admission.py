@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from src.core.exceptions import RateLimitExceeded, ServerOverloaded
+from src.utils.admission import AdmissionController, Lane, TokenBuckets
+
+LANES = {
+    "webhook": Lane(priority=0, share=1.0, max_wait=1.0),
+    "admin": Lane(priority=2, share=0.5, max_wait=0.05),
+}
+
+
+async def test_admission_priority_and_shedding():
+    controller = AdmissionController(max_in_flight=2, lanes=LANES)
+    await controller.acquire("admin")
+    with pytest.raises(ServerOverloaded):
+        await controller.acquire("admin")
+    await controller.acquire("webhook")
+
+    admitted: list[str] = list()
+
+    async def request(lane: str) -> None:
+        await controller.acquire(lane)
+        admitted.append(lane)
+
+    waiters = [
+        asyncio.create_task(request("admin")),
+        asyncio.create_task(request("webhook")),
+    ]
+    await asyncio.sleep(0)
+    controller.release("webhook")
+    await asyncio.sleep(0.01)
+    assert admitted == ["webhook"]
+
+    await asyncio.gather(*waiters, return_exceptions=True)
+    assert controller.stats() == {
+        "in_flight": 2,
+        "waiting": 0,
+        "shed_webhook": 0,
+        "shed_admin": 2,
+    }
+
+
+def test_token_buckets():
+    buckets = TokenBuckets(rate=10.0, burst=2)
+    buckets.take("127.0.0.1")
+    buckets.take("127.0.0.1")
+    with pytest.raises(RateLimitExceeded) as exc:
+        buckets.take("127.0.0.1")
+    assert 0 < exc.value.args[0] <= 0.1
+    buckets.take("127.0.0.2")
+
+
+async def test_admission_reserve():
+    lanes = {
+        "webhook": Lane(priority=0, share=1.0, max_wait=1.0, reserve=0.5),
+        "read": Lane(priority=1, share=0.75, max_wait=0.05),
+        "admin": Lane(priority=2, share=0.75, max_wait=0.05),
+    }
+    controller = AdmissionController(max_in_flight=4, lanes=lanes)
+    # прочие классы вместе занимают не больше лимита без резерва платежей
+    await controller.acquire("read")
+    await controller.acquire("admin")
+    with pytest.raises(ServerOverloaded):
+        await controller.acquire("read")
+    await controller.acquire("webhook")
+    await controller.acquire("webhook")
+    assert controller.stats()["in_flight"] == 4
+
+    # занятый платежами резерв не ограничивает остальные классы
+    controller.release("read")
+    controller.release("admin")
+    await controller.acquire("read")
+    await controller.acquire("admin")
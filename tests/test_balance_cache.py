@@ -0,0 +1,77 @@
+import multiprocessing
+
+import pytest
+
+from src.utils.balance_cache import BalanceCache
+from src.utils.shared_cache import (
+    STAMP_SLOT,
+    SharedCache,
+    SharedStamps,
+    create_shared_memory,
+)
+
+
+def score(account_id: int, balance: str) -> dict[str, str]:
+    return {
+        "account_id": account_id,
+        "account_number": f"4081781{account_id:013d}",
+        "balance": balance,
+        "date_creation": "17.10.2026",
+    }
+
+
+@pytest.fixture
+def cache():
+    memory = create_shared_memory(slots=64, slot_size=256)
+    stamps = create_shared_memory(slots=8, slot_size=STAMP_SLOT.size)
+    yield BalanceCache(
+        SharedCache(memory, multiprocessing.Lock(), slots=64, slot_size=256),
+        SharedStamps(stamps, multiprocessing.Lock(), slots=8),
+        ttl=60,
+    )
+    for block in (memory, stamps):
+        block.close()
+        block.unlink()
+
+
+def test_balance_cache_versions(cache):
+    assert cache.get_scores(1) is None
+    cache.put_scores(
+        1, [(score(10, "100.00"), 3), (score(11, "5.00"), 1)], cache.read_started()
+    )
+    assert cache.get_scores(1) == [score(10, "100.00"), score(11, "5.00")]
+
+    cache.update(1, score(10, "150.00"), 4)
+    # запоздавшее чтение более старой версии не возвращает прежний баланс
+    cache.put_scores(
+        1, [(score(10, "100.00"), 3), (score(11, "5.00"), 1)], cache.read_started()
+    )
+    assert cache.get_scores(1)[0]["balance"] == "150.00"
+
+    # новый счет сбрасывает список счетов пользователя
+    cache.update(1, score(12, "20.00"), 0)
+    assert cache.get_scores(1) is None
+    assert cache.stats() == {"hits": 2, "misses": 2}
+
+
+def test_balance_cache_update_not_stored(cache):
+    cache.put_scores(1, [(score(10, "100.00"), 3)], cache.read_started())
+    # счет, не помещающийся в ячейку, удаляет прежнюю версию
+    cache.update(1, {**score(10, "150.00"), "account_number": "x" * 256}, 4)
+    assert cache.get_scores(1) is None
+
+
+def test_balance_cache_ledger_discard(cache):
+    cache.put_scores(1, [(score(10, "100.00"), 3)], cache.read_started())
+    # чтение началось до проводки журнала (версия счета не изменилась),
+    # а записывается в кеш после ее сброса
+    started = cache.read_started()
+    cache.discard(1)
+    cache.put_scores(1, [(score(10, "100.00"), 3)], started)
+    assert cache.get_scores(1) is None
+
+    cache.put_scores(1, [(score(10, "150.00"), 3)], cache.read_started())
+    assert cache.get_scores(1) == [score(10, "150.00")]
+    # сброс другого пользователя с другой ячейкой отметки не влияет
+    cache.discard(2)
+    assert cache.get_scores(1) == [score(10, "150.00")]
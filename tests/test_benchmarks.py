@@ -0,0 +1,37 @@
+from collections import Counter
+
+from benchmarks.compare import compare
+from benchmarks.load import percentile, summarize
+
+
+def test_summarize_percentiles():
+    latencies = [i / 1000 for i in range(1, 101)]
+    result = summarize(latencies, Counter({200: 98, 503: 1, 0: 1}), elapsed=2.0)
+    assert result["throughput"] == 50.0
+    assert result["errors"] == 2
+    assert result["latency_ms"]["p50"] == 50.0
+    assert result["latency_ms"]["p99"] == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_compare_detects_regression():
+    def report(throughput, p95):
+        latency = {"p50": 1.0, "p95": p95, "p99": p95}
+        return {
+            "scenarios": {
+                "webhook": {
+                    "throughput": throughput,
+                    "latency_ms": latency,
+                    "errors": 0,
+                }
+            }
+        }
+
+    rows = compare(report(1000.0, 10.0), report(950.0, 10.5), threshold=0.1)
+    assert not any(row["regression"] for row in rows)
+    rows = compare(report(1000.0, 10.0), report(800.0, 12.0), threshold=0.1)
+    assert {row["metric"] for row in rows if row["regression"]} == {
+        "throughput",
+        "latency_ms.p95",
+        "latency_ms.p99",
+    }
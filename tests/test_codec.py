@@ -0,0 +1,77 @@
+import json
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pytest
+
+from src.payments.schemas import TransactionInSchemas
+from src.utils.codec import fast_dumps, fast_loads, load_model
+from src.utils.signature import signature_engine
+
+
+def test_fast_dumps_native_types():
+    transaction_id = uuid.uuid4()
+    data = {
+        "amount": Decimal("100.50"),
+        "date_creation": datetime(2026, 10, 17, 12, 30, tzinfo=timezone.utc),
+        "transaction_id": transaction_id,
+    }
+
+    assert json.loads(fast_dumps(data)) == {
+        "amount": "100.50",
+        "date_creation": "2026-10-17T12:30:00+00:00",
+        "transaction_id": str(transaction_id),
+    }
+
+
+def test_model_validate_json_matches_dict_path():
+    body = fast_dumps(
+        {
+            "transaction_id": str(uuid.uuid4()),
+            "account_id": 1,
+            "user_id": 2,
+            "amount": "100.50",
+            "signature": "0" * 64,
+        }
+    )
+
+    assert TransactionInSchemas.model_validate_json(body) == TransactionInSchemas(
+        **fast_loads(body)
+    )
+
+
+def request_with(body: bytes, fast: bool) -> SimpleNamespace:
+    return SimpleNamespace(
+        app=SimpleNamespace(config=SimpleNamespace(FAST_JSON_CODEC=fast)),
+        body=body,
+        json=json.loads(body),
+    )
+
+
+@pytest.mark.parametrize("amount", ["100.0", "1e2", "100", "1.005e2", '"100.50"'])
+def test_load_model_codecs_match(amount):
+    transaction_id = str(uuid.uuid4())
+    signature = signature_engine.sign(
+        account_id=1,
+        amount=Decimal(str(json.loads(amount))),
+        transaction_id=transaction_id,
+        user_id=2,
+    )
+    body = (
+        '{"transaction_id":"%s","account_id":1,"user_id":2,"amount":%s,'
+        '"signature":"%s"}' % (transaction_id, amount, signature)
+    ).encode()
+
+    std = load_model(request_with(body, fast=False), TransactionInSchemas)
+    fast = load_model(request_with(body, fast=True), TransactionInSchemas)
+    assert str(fast.amount) == str(std.amount)
+    assert fast == std
+    assert signature_engine.verify(
+        account_id=fast.account_id,
+        amount=fast.amount,
+        transaction_id=fast.transaction_id,
+        user_id=fast.user_id,
+        signature=fast.signature,
+    )
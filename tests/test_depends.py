@@ -0,0 +1,49 @@
+import asyncio
+from types import SimpleNamespace
+
+from src.core.depends import close_db_session, get_db_session
+
+
+class Session:
+    closed = 0
+
+    async def close(self) -> None:
+        self.closed += 1
+
+
+def make_request() -> SimpleNamespace:
+    db = SimpleNamespace(create_session=Session)
+    return SimpleNamespace(
+        ctx=SimpleNamespace(), app=SimpleNamespace(ctx=SimpleNamespace(db=db))
+    )
+
+
+async def test_session_closed_on_disconnect():
+    request = make_request()
+    started = asyncio.Event()
+
+    async def handler() -> None:
+        await get_db_session(request)
+        started.set()
+        await asyncio.sleep(10)
+
+    task = asyncio.create_task(handler())
+    await started.wait()
+    session = request.ctx.db_session
+    task.cancel()
+    await asyncio.sleep(0.01)
+    assert session.closed == 1
+    assert request.ctx.db_session is None
+
+
+async def test_session_closed_once_on_response():
+    request = make_request()
+
+    async def handler() -> Session:
+        session = await get_db_session(request)
+        await close_db_session(request)
+        return session
+
+    session = await asyncio.create_task(handler())
+    await asyncio.sleep(0.01)
+    assert session.closed == 1
@@ -0,0 +1,19 @@
+import uuid
+
+from src.utils.idempotency import IdempotencyFilter
+
+
+def test_idempotency_filter_lru():
+    idempotency = IdempotencyFilter(lru_size=2)
+    first, second, third = (uuid.uuid4() for _ in range(3))
+
+    assert not idempotency.seen(first)
+    idempotency.add(first)
+    idempotency.add(second)
+    idempotency.add(third)
+
+    assert idempotency.seen(third)
+    assert not idempotency.seen(first)
+    assert idempotency.stats()["hits"] == 1
+    assert idempotency.stats()["misses"] == 2
+    assert idempotency.stats()["size"] == 2
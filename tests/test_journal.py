@@ -0,0 +1,105 @@
+import asyncio
+
+from src.utils.journal import PaymentJournal, drain_orphaned_journals
+
+
+async def test_journal_append_and_read(tmp_path):
+    journal = PaymentJournal(directory=tmp_path, name="test", batch_size=2)
+    await asyncio.gather(*(journal.append(f"{i}".encode()) for i in range(3)))
+
+    records, offset = journal.read(0)
+    assert records == [b"0", b"1"]
+    records, offset = journal.read(offset)
+    assert records == [b"2"]
+    await journal.close()
+
+
+async def test_journal_drain_from_checkpoint(tmp_path):
+    journal = PaymentJournal(directory=tmp_path, name="test", poll_interval=0.01)
+    for i in range(3):
+        await journal.append(f"{i}".encode())
+    journal.write_checkpoint(2)
+
+    drained: list[bytes] = list()
+
+    async def handler(records: list[bytes]) -> None:
+        drained.extend(records)
+
+    task = asyncio.create_task(journal.drain(handler))
+    await asyncio.sleep(0.1)
+    task.cancel()
+
+    assert drained == [b"1", b"2"]
+    assert journal.read_checkpoint() == 0
+    assert journal.read(0) == ([], 0)
+    await journal.close()
+
+
+async def test_journal_dead_letters_poison_record(tmp_path):
+    journal = PaymentJournal(
+        directory=tmp_path, name="test", poll_interval=0.01, max_attempts=2
+    )
+    for record in (b"1", b"bad", b"2", b"3"):
+        await journal.append(record)
+
+    applied: list[bytes] = list()
+
+    async def handler(records: list[bytes]) -> None:
+        if b"bad" in records:
+            raise ValueError("bad record")
+        applied.extend(records)
+
+    task = asyncio.create_task(journal.drain(handler))
+    await asyncio.sleep(0.2)
+    task.cancel()
+
+    assert sorted(applied) == [b"1", b"2", b"3"]
+    assert (tmp_path / "test.dead").read_bytes() == b"bad\n"
+    assert journal.read(0) == ([], 0)
+    await journal.close()
+
+
+async def test_journal_retries_transient_errors(tmp_path):
+    journal = PaymentJournal(
+        directory=tmp_path, name="test", poll_interval=0.01, max_attempts=1
+    )
+    await journal.append(b"1")
+    failures = [ConnectionError("db is down")] * 3
+
+    async def handler(records: list[bytes]) -> None:
+        if failures:
+            raise failures.pop()
+
+    task = asyncio.create_task(
+        journal.drain(handler, is_transient=lambda exc: isinstance(exc, OSError))
+    )
+    await asyncio.sleep(0.2)
+    task.cancel()
+
+    assert not failures
+    assert not (tmp_path / "test.dead").exists()
+    assert journal.read(0) == ([], 0)
+    await journal.close()
+
+
+async def test_drain_orphaned_journals(tmp_path):
+    orphan = PaymentJournal(directory=tmp_path, name="old-worker")
+    for i in range(3):
+        await orphan.append(f"{i}".encode())
+    orphan.write_checkpoint(2)
+    await orphan.close()
+    live = PaymentJournal(directory=tmp_path, name="live-worker")
+    await live.append(b"live")
+
+    drained: list[bytes] = list()
+
+    async def handler(records: list[bytes]) -> None:
+        drained.extend(records)
+
+    names = await drain_orphaned_journals(tmp_path, "main", handler, poll_interval=0.01)
+
+    assert names == ["old-worker"]
+    assert drained == [b"1", b"2"]
+    assert (tmp_path / "old-worker.log").read_bytes() == b""
+    assert await drain_orphaned_journals(tmp_path, "main", handler) == []
+    await live.close()
@@ -0,0 +1,25 @@
+import logging
+import queue
+
+from src.core.log import DeferredQueueHandler, SamplingFilter
+
+
+def make_record(level: int) -> logging.LogRecord:
+    return logging.LogRecord(
+        "src.utils.processing", level, __file__, 1, "Payment #%s", ("1",), None
+    )
+
+
+def test_sampling_filter_keeps_warnings():
+    sampling = SamplingFilter(rate=0.0)
+    assert not sampling.filter(make_record(logging.INFO))
+    assert sampling.filter(make_record(logging.WARNING))
+    assert SamplingFilter(rate=1.0).filter(make_record(logging.INFO))
+
+
+def test_queue_handler_defers_formatting():
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    DeferredQueueHandler(records).handle(make_record(logging.INFO))
+    record = records.get_nowait()
+    assert record.args == ("1",)
+    assert record.getMessage() == "Payment #1"
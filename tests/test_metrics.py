@@ -0,0 +1,36 @@
+from src.utils.metrics import MetricsRegistry
+
+
+def make_registry() -> MetricsRegistry:
+    registry = MetricsRegistry()
+    registry.counter("payments_total", "Платежи")
+    registry.histogram("duration_seconds", "Длительность", (0.1, 1.0))
+    return registry
+
+
+def test_metrics_merge_workers():
+    first, second = make_registry(), make_registry()
+    first.inc("payments_total", result="ok")
+    second.inc("payments_total", 2, result="ok")
+    first.observe("duration_seconds", 0.05, route="/webhook")
+    second.observe("duration_seconds", 0.5, route="/webhook")
+    second.observe("duration_seconds", 5, route="/webhook")
+
+    merged = first.merge([first.snapshot(), second.snapshot()])
+    assert merged["payments_total"] == {(("result", "ok"),): 3}
+    assert merged["duration_seconds"][(("route", "/webhook"),)] == [1, 1, 1, 5.55]
+
+
+def test_metrics_render():
+    registry = make_registry()
+    registry.inc("payments_total", result='bad"signature')
+    registry.observe("duration_seconds", 0.1, route="/webhook")
+    registry.observe("duration_seconds", 2, route="/webhook")
+
+    lines = registry.render(registry.merge([registry.snapshot()])).splitlines()
+    assert "# TYPE duration_seconds histogram" in lines
+    assert 'payments_total{result="bad\\"signature"} 1' in lines
+    assert 'duration_seconds_bucket{route="/webhook",le="0.1"} 1' in lines
+    assert 'duration_seconds_bucket{route="/webhook",le="1.0"} 1' in lines
+    assert 'duration_seconds_bucket{route="/webhook",le="+Inf"} 2' in lines
+    assert 'duration_seconds_count{route="/webhook"} 2' in lines
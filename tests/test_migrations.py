@@ -0,0 +1,70 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from tests.conftest import SQLALCHEMY_DATABASE_URL
+
+MIGRATIONS_DB = "testdb_migrations"
+
+
+@pytest.fixture
+async def empty_database():
+    """
+    Пустая БД на сервере тестовой БД (удаляется после теста)
+    """
+    engine = create_async_engine(SQLALCHEMY_DATABASE_URL, isolation_level="AUTOCOMMIT")
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text(f"DROP DATABASE IF EXISTS {MIGRATIONS_DB}"))
+            await connection.execute(text(f"CREATE DATABASE {MIGRATIONS_DB}"))
+    except OSError as exc:
+        await engine.dispose()
+        pytest.skip(f"Test database is unavailable: {exc!r}")
+
+    database = create_async_engine(
+        SQLALCHEMY_DATABASE_URL.rsplit("/", 1)[0] + f"/{MIGRATIONS_DB}"
+    )
+    yield database
+
+    await database.dispose()
+    async with engine.connect() as connection:
+        await connection.execute(text(f"DROP DATABASE {MIGRATIONS_DB} WITH (FORCE)"))
+    await engine.dispose()
+
+
+async def test_upgrade_head_on_empty_database(empty_database):
+    """
+    Все миграции, включая заполнение начальными данными, применяются к пустой БД
+    """
+    url = empty_database.url
+    env = {
+        **os.environ,
+        "POSTGRES_USER": url.username,
+        "POSTGRES_PASSWORD": url.password,
+        "POSTGRES_HOST": url.host,
+        "POSTGRES_PORT": str(url.port),
+        "POSTGRES_DB": MIGRATIONS_DB,
+    }
+    result = subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=Path(__file__).parent.parent,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0, result.stderr
+
+    async with empty_database.connect() as connection:
+        scores = await connection.execute(
+            text(
+                "SELECT u.email, s.account_id, s.balance, s.reserved, s.version"
+                " FROM scores s JOIN users u ON u.id = s.user_id"
+            )
+        )
+        assert [tuple(row) for row in scores] == [("elene@corp.com", 1, 0, 0, 0)]
+        assert await connection.scalar(text("SELECT count(*) FROM users")) == 2
@@ -0,0 +1,21 @@
+import json
+import subprocess
+import sys
+
+from src.main import app
+
+
+async def test_built_spec_matches_served(tmp_path):
+    """
+    Спецификация из python -m src.openapi_spec совпадает с /docs/openapi.json,
+    который sanic-ext собирает при запуске воркера
+    """
+    output = tmp_path / "openapi.json"
+    subprocess.run(
+        [sys.executable, "-m", "src.openapi_spec", str(output)],
+        check=True,
+        capture_output=True,
+    )
+    _, response = await app.asgi_client.get("/docs/openapi.json")
+    assert response.status == 200
+    assert json.loads(output.read_text()) == response.json
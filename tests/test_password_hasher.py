@@ -0,0 +1,30 @@
+import asyncio
+
+import pytest
+
+from src.core.exceptions import PasswordHasherBusy
+from src.utils.jwt_utils import PasswordHasher
+
+
+async def test_password_hasher_hash_verify():
+    hasher = PasswordHasher(workers=1, queue_limit=4, rounds=4)
+    hashed_password = await hasher.hash("1qaz!QAZ")
+
+    assert await hasher.verify("1qaz!QAZ", hashed_password.decode())
+    assert not await hasher.verify("2wsx@WSX", hashed_password.decode())
+    assert hasher.stats()["in_flight"] == 0
+    hasher.close()
+
+
+async def test_password_hasher_queue_limit():
+    hasher = PasswordHasher(workers=1, queue_limit=1, rounds=10)
+    tasks = [asyncio.create_task(hasher.hash("1qaz!QAZ")) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    assert hasher.queue_depth == 1
+    with pytest.raises(PasswordHasherBusy):
+        await hasher.hash("1qaz!QAZ")
+    assert hasher.stats()["rejected"] == 1
+
+    await asyncio.gather(*tasks)
+    hasher.close()
@@ -0,0 +1,28 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from src.core.exceptions import ErrorInData
+from src.payments.crud import decode_cursor, encode_cursor
+from src.payments.schemas import PaymentsPageQuerySchemas
+
+
+def test_payments_cursor_round_trip():
+    date_creation = datetime(2026, 10, 17, 12, 30, 15, 123456, tzinfo=timezone.utc)
+    transaction_id = uuid.uuid4()
+
+    cursor = encode_cursor(date_creation, transaction_id)
+
+    assert decode_cursor(cursor) == (date_creation, transaction_id)
+    with pytest.raises(ErrorInData):
+        decode_cursor("zzz")
+
+
+def test_payments_page_query():
+    query = PaymentsPageQuerySchemas(limit="10", date_from="2026-10-01")
+
+    assert query.limit == 10
+    assert query.date_from.tzinfo == timezone.utc
+    with pytest.raises(ValueError):
+        PaymentsPageQuerySchemas(after="a", before="b")
@@ -0,0 +1,35 @@
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from types import SimpleNamespace
+
+from src.payments.schemas import (
+    PaymentOutSchemas,
+    ScoreBaseSchemas,
+    payment_to_dict,
+    score_to_dict,
+)
+
+DATE_CREATION = datetime(2026, 10, 17, 12, 30, tzinfo=timezone.utc)
+
+
+def test_payment_to_dict_matches_schema():
+    row = SimpleNamespace(
+        account_id=1,
+        amount=Decimal("100.50"),
+        date_creation=DATE_CREATION,
+        transaction_id=uuid.uuid4(),
+    )
+
+    assert payment_to_dict(row) == PaymentOutSchemas(**vars(row)).model_dump(mode="json")
+
+
+def test_score_to_dict_matches_schema():
+    row = SimpleNamespace(
+        account_id=1,
+        account_number="40817000000000000001",
+        balance=Decimal("0.00"),
+        date_creation=DATE_CREATION,
+    )
+
+    assert score_to_dict(row) == ScoreBaseSchemas(**vars(row)).model_dump(mode="json")
@@ -0,0 +1,65 @@
+import time
+
+from src.users.schemas import UserSuperSchemas
+from src.utils.principal_cache import PrincipalCache
+
+PRINCIPAL = UserSuperSchemas(
+    id=1, full_name="Sergey Petrov", email="admin@corp.com", is_superuser=True
+)
+
+
+def test_principal_cache_invalidate():
+    cache = PrincipalCache(size=10, ttl=60)
+    exp = int(time.time()) + 600
+    cache.put(user_id=1, exp=exp, principal=PRINCIPAL, version=cache.version(1))
+
+    assert cache.get(user_id=1, exp=exp) is PRINCIPAL
+    assert cache.get(user_id=1, exp=exp + 1) is None
+
+    cache.invalidate(1)
+    assert cache.get(user_id=1, exp=exp) is None
+    cache.put(user_id=1, exp=exp, principal=PRINCIPAL, version=cache.version(1))
+    assert cache.get(user_id=1, exp=exp) is PRINCIPAL
+
+
+def test_principal_cache_expired_token_and_lru():
+    cache = PrincipalCache(size=1, ttl=60)
+    cache.put(
+        user_id=1,
+        exp=int(time.time()) - 1,
+        principal=PRINCIPAL,
+        version=cache.version(1),
+    )
+    assert cache.stats()["size"] == 0
+
+    exp = int(time.time()) + 600
+    cache.put(user_id=1, exp=exp, principal=PRINCIPAL, version=cache.version(1))
+    cache.put(user_id=2, exp=exp, principal=PRINCIPAL, version=cache.version(2))
+    assert cache.get(user_id=1, exp=exp) is None
+    assert cache.get(user_id=2, exp=exp) is PRINCIPAL
+
+
+def test_principal_cache_invalidated_during_read():
+    cache = PrincipalCache(size=10, ttl=60)
+    exp = int(time.time()) + 600
+    version = cache.version(1)
+    cache.invalidate(1)
+    cache.put(user_id=1, exp=exp, principal=PRINCIPAL, version=version)
+    assert cache.get(user_id=1, exp=exp) is None
+
+    version = cache.version(1)
+    cache.clear()
+    cache.put(user_id=1, exp=exp, principal=PRINCIPAL, version=version)
+    assert cache.get(user_id=1, exp=exp) is None
+
+
+def test_principal_cache_invalidations_bounded():
+    cache = PrincipalCache(size=2, ttl=60)
+    exp = int(time.time()) + 600
+    version = cache.version(1)
+    for user_id in range(1, 100):
+        cache.invalidate(user_id)
+    assert len(cache._invalidated) == 2
+    # сброс, вытесненный из таблицы сбросов, по-прежнему отменяет запись
+    cache.put(user_id=1, exp=exp, principal=PRINCIPAL, version=version)
+    assert cache.get(user_id=1, exp=exp) is None
@@ -0,0 +1,96 @@
+import uuid
+from decimal import Decimal
+
+from sqlalchemy.exc import DBAPIError
+
+from src.core.exceptions import ScoreVersionConflict
+from src.payments.crud import (
+    PAYMENT_APPLIED,
+    PAYMENT_DUPLICATE,
+    PAYMENT_INSUFFICIENT_FUNDS,
+)
+from src.payments.schemas import TransactionInSchemas
+from src.utils import processing
+from src.utils.processing import (
+    apply_ledger_payments,
+    batch_conflict_reason,
+    plan_payments,
+)
+
+
+def make_payment(amount: str) -> TransactionInSchemas:
+    return TransactionInSchemas(
+        transaction_id=str(uuid.uuid4()),
+        account_id=1,
+        user_id=2,
+        amount=Decimal(amount),
+        signature="",
+    )
+
+
+def test_plan_payments_in_order():
+    data_requests = [make_payment(amount) for amount in ("-60", "-50", "30", "-70")]
+    accepted = {
+        uuid.UUID(item.transaction_id): i for i, item in enumerate(data_requests)
+    }
+    scores = {(1, 2): (7, Decimal("100"), 3)}
+
+    new_payments, insufficient = plan_payments(data_requests, accepted, scores)
+
+    assert insufficient == {1}
+    assert [payment["amount"] for payment in new_payments] == [
+        Decimal("-60"),
+        Decimal("30"),
+        Decimal("-70"),
+    ]
+
+
+def test_batch_conflict_reason():
+    class PostgresError(Exception):
+        def __init__(self, sqlstate: str) -> None:
+            self.sqlstate = sqlstate
+
+    def db_error(sqlstate: str) -> DBAPIError:
+        return DBAPIError("UPDATE scores", {}, PostgresError(sqlstate))
+
+    assert batch_conflict_reason(ScoreVersionConflict("1 of 2")) == "version"
+    assert batch_conflict_reason(db_error("40P01")) == "deadlock"
+    assert batch_conflict_reason(db_error("40001")) == "serialization"
+    assert batch_conflict_reason(db_error("23503")) is None
+    assert batch_conflict_reason(ValueError()) is None
+
+
+async def test_apply_ledger_payments(monkeypatch):
+    data_requests = [make_payment(amount) for amount in ("30", "-50", "10")]
+    accepted = {
+        uuid.UUID(item.transaction_id): i for i, item in enumerate(data_requests)
+    }
+    statuses = [PAYMENT_APPLIED, PAYMENT_INSUFFICIENT_FUNDS, PAYMENT_DUPLICATE]
+    calls: list[tuple[Decimal, bool]] = list()
+    locked: list[set] = list()
+
+    async def read_or_create_scores(session, keys, lock):
+        assert lock
+        locked.append(keys)
+
+    async def apply_payment(
+        session, transaction_id, user_id, account_id, amount, ledger
+    ):
+        calls.append((amount, ledger))
+        return statuses[len(calls) - 1], None
+
+    monkeypatch.setattr(processing, "read_or_create_scores", read_or_create_scores)
+    monkeypatch.setattr(processing, "apply_payment", apply_payment)
+
+    inserted, insufficient = await apply_ledger_payments(
+        session=None, data_requests=data_requests, accepted=accepted
+    )
+    # счета блокируются до проводок, платежи проводятся в порядке поступления
+    assert locked == [{(1, 2)}]
+    assert calls == [
+        (Decimal("30"), True),
+        (Decimal("-50"), True),
+        (Decimal("10"), True),
+    ]
+    assert inserted == {uuid.UUID(data_requests[0].transaction_id)}
+    assert insufficient == {1}
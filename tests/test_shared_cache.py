@@ -0,0 +1,129 @@
+import multiprocessing
+import time
+from multiprocessing.shared_memory import SharedMemory
+
+import pytest
+
+from src.users.schemas import UserSuperSchemas
+from src.utils.principal_cache import SharedPrincipalCache
+from src.utils.shared_cache import (
+    STAMP_SLOT,
+    SharedCache,
+    SharedStamps,
+    create_shared_memory,
+)
+
+PRINCIPAL = UserSuperSchemas(
+    id=1, full_name="Sergey Petrov", email="admin@corp.com", is_superuser=True
+)
+
+
+@pytest.fixture
+def workers():
+    """
+    Две таблицы над одним блоком памяти, как в двух воркерах
+    """
+    memory = create_shared_memory(slots=16, slot_size=256)
+    attached = SharedMemory(name=memory.name)
+    lock = multiprocessing.Lock()
+    yield (
+        SharedCache(memory, lock, slots=16, slot_size=256, probe=4),
+        SharedCache(attached, lock, slots=16, slot_size=256, probe=4),
+    )
+    attached.close()
+    memory.close()
+    memory.unlink()
+
+
+def test_shared_cache_between_workers(workers):
+    first, second = workers
+    assert first.put(b"key", b"value", ttl=60)
+    assert second.get(b"key") == b"value"
+
+    second.put(b"key", b"updated", ttl=60)
+    assert first.get(b"key") == b"updated"
+    first.put(b"expired", b"value", ttl=0.01)
+    time.sleep(0.02)
+    assert second.get(b"expired") is None
+
+    second.delete(b"key")
+    assert first.get(b"key") is None
+    assert not first.put(b"large", b"x" * 256, ttl=60)
+
+
+def newer(current):
+    return current is None or current < b"2"
+
+
+def test_shared_cache_compare_and_put(workers):
+    first, second = workers
+    assert first.compare_and_put(b"key", b"2", ttl=60, replace=newer)
+    assert not second.compare_and_put(b"key", b"1", ttl=60, replace=newer)
+    assert first.get(b"key") == b"2"
+
+    # блокировка занята другим воркером: запись пропускается или ждет
+    with first._lock:
+        assert not second.compare_and_put(b"key", b"0", ttl=60, replace=newer)
+    assert second.compare_and_put(
+        b"key", b"3", ttl=60, replace=lambda current: True, block=True
+    )
+    assert first.get(b"key") == b"3"
+
+
+def test_shared_cache_evicts_nearest_expiry(workers):
+    first, second = workers
+    for number in range(64):
+        first.put(b"key-%d" % number, b"value", ttl=60 + number)
+    first.put(b"last", b"value", ttl=3600)
+    assert second.get(b"last") == b"value"
+    assert second.get(b"key-63") == b"value"
+    assert sum(second.get(b"key-%d" % number) is not None for number in range(64)) < 16
+
+
+@pytest.fixture
+def stamps():
+    memory = create_shared_memory(slots=8, slot_size=STAMP_SLOT.size)
+    yield SharedStamps(memory, multiprocessing.Lock(), slots=8)
+    memory.close()
+    memory.unlink()
+
+
+def test_shared_principal_cache_invalidate(workers, stamps):
+    first = SharedPrincipalCache(workers[0], stamps)
+    second = SharedPrincipalCache(workers[1], stamps)
+    exp = int(time.time()) + 600
+    first.put(user_id=1, exp=exp, principal=PRINCIPAL, version=first.version(1))
+    assert second.get(user_id=1, exp=exp) == PRINCIPAL
+
+    second.invalidate(1)
+    assert first.get(user_id=1, exp=exp) is None
+    time.sleep(0.001)
+    first.put(user_id=1, exp=exp, principal=PRINCIPAL, version=first.version(1))
+    assert second.get(user_id=1, exp=exp) == PRINCIPAL
+
+    first.clear()
+    assert second.get(user_id=1, exp=exp) is None
+
+
+def test_shared_principal_cache_invalidated_during_read(workers, stamps):
+    first = SharedPrincipalCache(workers[0], stamps)
+    second = SharedPrincipalCache(workers[1], stamps)
+    exp = int(time.time()) + 600
+    version = first.version(1)
+    time.sleep(0.001)
+    second.invalidate(1)
+    first.put(user_id=1, exp=exp, principal=PRINCIPAL, version=version)
+    assert second.get(user_id=1, exp=exp) is None
+
+    # заполнение таблицы кеша не вытесняет отметки сброса
+    for number in range(64):
+        workers[0].put(b"key-%d" % number, b"value", ttl=60)
+    first.put(user_id=1, exp=exp, principal=PRINCIPAL, version=version)
+    assert second.get(user_id=1, exp=exp) is None
+
+
+def test_shared_stamps_only_advance(stamps):
+    stamps.advance(3, 10.0)
+    stamps.advance(3, 5.0)
+    assert stamps.get(3) == 10.0
+    assert stamps.get(4) == 0.0
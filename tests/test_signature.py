@@ -0,0 +1,58 @@
+import hashlib
+from decimal import Decimal
+
+from src.utils.signature import SignatureEngine
+
+PAYMENT = dict(
+    account_id=1,
+    amount=Decimal("100.50"),
+    transaction_id="5eae174f-7cd0-472c-bd36-35660f00132b",
+    user_id=1,
+)
+
+
+def test_signature_sign_verify():
+    engine = SignatureEngine(keys=["current"])
+    signature = engine.sign(**PAYMENT)
+
+    assert engine.verify(**PAYMENT, signature=signature)
+    assert not engine.verify(
+        **{**PAYMENT, "amount": Decimal("1005.0")}, signature=signature
+    )
+    assert not engine.verify(**{**PAYMENT, "user_id": 11}, signature=signature)
+
+
+def test_signature_key_rotation():
+    old_signature = SignatureEngine(keys=["old"]).sign(**PAYMENT)
+    engine = SignatureEngine(keys=["current", "old"])
+
+    assert engine.verify(**PAYMENT, signature=old_signature)
+    assert engine.sign(**PAYMENT) == SignatureEngine(keys=["current"]).sign(**PAYMENT)
+    assert not SignatureEngine(keys=["current"]).verify(
+        **PAYMENT, signature=old_signature
+    )
+
+
+def test_signature_legacy_format():
+    legacy_signature = hashlib.sha256(
+        f"{PAYMENT['account_id']}{PAYMENT['amount']}"
+        f"{PAYMENT['transaction_id']}{PAYMENT['user_id']}current".encode()
+    ).hexdigest()
+
+    assert SignatureEngine(keys=["current"], legacy_key="current").verify(
+        **PAYMENT, signature=legacy_signature
+    )
+    assert not SignatureEngine(keys=["current"]).verify(
+        **PAYMENT, signature=legacy_signature
+    )
+
+
+def test_signature_verify_batch():
+    engine = SignatureEngine(keys=["current"])
+    signature = engine.sign(**PAYMENT)
+    items = [
+        (1, PAYMENT["amount"], PAYMENT["transaction_id"], 1, signature),
+        (1, PAYMENT["amount"], PAYMENT["transaction_id"], 1, "0" * 64),
+    ]
+
+    assert engine.verify_batch(items) == [True, False]
@@ -0,0 +1,19 @@
+from src.utils.sql_profile import QueryProfile, statement_shape
+
+
+def test_statement_shape_collapses_params_lists():
+    assert statement_shape(
+        "SELECT users.id FROM users\n  WHERE users.id IN ($1, $2, $3)"
+    ) == statement_shape("SELECT users.id FROM users WHERE users.id IN ($1, $2)")
+
+
+def test_profile_repeated_statements():
+    profile = QueryProfile("/user/me")
+    profile.add("SELECT * FROM users WHERE users.id = $1", 0.002, 1)
+    profile.add("SELECT * FROM scores WHERE scores.user_id = $1", 0.001, 2)
+    profile.add("SELECT * FROM users WHERE users.id = $1", 0.002, 1)
+
+    assert profile.repeated() == {"SELECT * FROM users WHERE users.id = $1": 2}
+    assert profile.repeated(threshold=3) == {}
+    assert profile.summary() == "queries=3; time_ms=5.00; repeated=1"
+    assert "N+1" in profile.report().splitlines()[1]
@@ -0,0 +1,17 @@
+import time
+import uuid
+
+from src.utils.uuid7 import uuid7, uuid7_timestamp
+
+
+def test_uuid7_format():
+    value = uuid7()
+    assert value.version == 7
+    assert value.variant == uuid.RFC_4122
+    assert abs(uuid7_timestamp(value) - time.time()) < 1
+
+
+def test_uuid7_monotonic():
+    values = [uuid7() for _ in range(10_000)]
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)